@@ -24,18 +24,25 @@ import zipfile
 from datetime import datetime
 
 # Import our modules
-from pdf_handler import PDFHandler
+from pdf_handler import PDFHandler, PYMUPDF_AVAILABLE, STREAMING_MERGE_BYTES
 from exhibit_processor import ExhibitProcessor
 from google_drive import GoogleDriveHandler
 from archive_handler import ArchiveHandler
+from build_manifest import BuildManifest
+from page_map import build_page_map, outline_from_page_map
+from stamping import bates_text, package_stamps
 
 # Check if compression is available
 try:
-    from compress_handler import USCISPDFCompressor, compress_pdf_batch
+    from compress_handler import USCISPDFCompressor, compress_pdf_batch, CHUNK_PAGE_THRESHOLD
+    from compression_cache import CompressionCache
     COMPRESSION_AVAILABLE = True
 except ImportError:
     COMPRESSION_AVAILABLE = False
 
+# Packages with at least this many exhibits are stamped in worker processes
+PARALLEL_STAMP_EXHIBITS = 8
+
 # Page config
 st.set_page_config(
     page_title="Visa Exhibit Generator",
@@ -113,6 +120,18 @@ if 'compression_stats' not in st.session_state:
     st.session_state.compression_stats = None
 if 'exhibit_list' not in st.session_state:
     st.session_state.exhibit_list = []
+if 'package_stats' not in st.session_state:
+    st.session_state.package_stats = None
+if 'stage_stats' not in st.session_state:
+    st.session_state.stage_stats = None
+if 'rebuild_stats' not in st.session_state:
+    st.session_state.rebuild_stats = None
+if 'volumes' not in st.session_state:
+    st.session_state.volumes = None
+if 'bates_range' not in st.session_state:
+    st.session_state.bates_range = None
+if 'build_dir' not in st.session_state:
+    st.session_state.build_dir = tempfile.mkdtemp(prefix="exhibit_build_")
 
 def main():
     """Main application"""
@@ -157,6 +176,7 @@ def main():
         if not COMPRESSION_AVAILABLE:
             st.warning("⚠️ Compression not available. Install PyMuPDF: `pip install PyMuPDF`")
             enable_compression = False
+            split_large_files = False
         else:
             enable_compression = st.checkbox(
                 "Enable PDF Compression",
@@ -192,6 +212,13 @@ def main():
                 }
                 st.caption(quality_info[quality_code])
 
+                split_large_files = st.checkbox(
+                    "Split Large PDFs",
+                    value=False,
+                    help=f"Compress PDFs over {CHUNK_PAGE_THRESHOLD} pages in parallel page ranges "
+                         "(faster on multi-core machines)"
+                )
+
                 # Compression method display
                 with st.expander("ℹ️ Compression Methods"):
                     st.write("**3-Tier Fallback System:**")
@@ -220,6 +247,7 @@ def main():
             else:
                 quality_code = "high"
                 smallpdf_key = None
+                split_large_files = False
 
         st.divider()
 
@@ -244,6 +272,38 @@ def main():
             help="Combine all exhibits into one file"
         )
 
+        split_volumes = st.checkbox(
+            "Split into volumes",
+            value=False,
+            disabled=not merge_pdfs,
+            help="Write the package as several PDFs, each under an upload size limit"
+        )
+
+        max_volume_mb = None
+        if merge_pdfs and split_volumes:
+            max_volume_mb = st.number_input(
+                "Max volume size (MB)",
+                min_value=1,
+                value=25,
+                step=1,
+                help="Volumes break between exhibits; larger exhibits are split by pages"
+            )
+
+        bates_numbering = st.checkbox(
+            "Package-wide Bates numbers",
+            value=False,
+            disabled=not merge_pdfs or split_volumes,
+            help="Stamp the merged package once: exhibit labels plus a sequential number on every page"
+        )
+
+        bates_prefix = None
+        if bates_numbering and merge_pdfs and not split_volumes:
+            bates_prefix = st.text_input(
+                "Bates prefix",
+                value="",
+                help="Text before each number, e.g. SMITH- gives SMITH-000001"
+            )
+
         st.divider()
 
         # Documentation reference
@@ -345,7 +405,10 @@ def main():
                     smallpdf_key if enable_compression else None,
                     add_toc,
                     add_archive,
-                    merge_pdfs
+                    merge_pdfs,
+                    max_volume_mb * 1024 * 1024 if max_volume_mb else None,
+                    bates_prefix,
+                    split_large_files
                 )
 
     # ==========================================
@@ -464,21 +527,93 @@ def main():
                         stats.get('quality', 'Unknown').title()
                     )
 
+            if st.session_state.package_stats:
+                package_stats = st.session_state.package_stats
+                st.caption(
+                    f"Package built in {package_stats['seconds']:.1f}s, "
+                    f"peak memory {package_stats['peak_memory_mb']:.0f} MB"
+                )
+
+            if st.session_state.bates_range:
+                st.caption(f"🔢 Bates numbered {st.session_state.bates_range}")
+
+            # Stage reuse
+            if st.session_state.stage_stats:
+                st.divider()
+                st.subheader("♻️ Pipeline Stages")
+
+                stage_columns = st.columns(len(st.session_state.stage_stats))
+                for column, (stage, counts) in zip(stage_columns, st.session_state.stage_stats.items()):
+                    with column:
+                        st.metric(
+                            stage.title(),
+                            f"{counts['produced']} produced",
+                            delta=f"{counts['reused']} reused",
+                            delta_color="off"
+                        )
+
+            # Incremental rebuild
+            rebuild = st.session_state.rebuild_stats
+            if rebuild and rebuild['reused']:
+                st.caption(
+                    f"♻️ Rebuild reused {rebuild['reused']} of {rebuild['exhibits']} exhibits "
+                    f"({rebuild['pages_skipped']} pages not recompressed or restamped)"
+                )
+
             # Exhibit list
             st.divider()
             st.subheader("📋 Exhibit List")
 
+            unreadable = [exhibit['filename'] for exhibit in st.session_state.exhibit_list
+                          if not exhibit.get('readable', True)]
+            if unreadable:
+                st.warning(f"⚠️ Left out of the package (password-protected or unreadable): "
+                           f"{', '.join(unreadable)}")
+
             for exhibit in st.session_state.exhibit_list:
                 with st.expander(f"Exhibit {exhibit['number']}: {exhibit['title']}"):
                     st.write(f"**Original File**: {exhibit['filename']}")
                     st.write(f"**Pages**: {exhibit.get('pages', 'Unknown')}")
+                    if exhibit.get('start_page'):
+                        st.write(f"**Starts on Page**: {exhibit['start_page']}")
+                    if 'size' in exhibit:
+                        st.write(f"**Size**: {exhibit['size'] / (1024*1024):.2f} MB")
+                        st.write(f"**Text Layer**: {'Yes' if exhibit['has_text_layer'] else 'No (scanned)'}")
+                    if exhibit.get('encrypted'):
+                        st.write("**Encrypted**: Yes")
                     if 'compression' in exhibit and exhibit['compression']:
                         st.write(f"**Compressed**: {exhibit['compression']['reduction']:.1f}% reduction")
                         st.write(f"**Method**: {exhibit['compression']['method']}")
 
             # Download button
             st.divider()
-            if 'output_file' in st.session_state:
+            if st.session_state.volumes:
+                volumes = st.session_state.volumes
+                st.subheader(f"📚 Volumes ({len(volumes['volumes'])})")
+
+                for volume in volumes['volumes']:
+                    numbers = [exhibit['number'] for exhibit in volume['exhibits']]
+                    with open(volume['path'], 'rb') as f:
+                        st.download_button(
+                            label=f"📥 Volume {volume['volume']}: Exhibits {numbers[0]}–{numbers[-1]} "
+                                  f"({volume['bytes'] / (1024*1024):.1f} MB)"
+                                  + (" ⚠️ over limit" if volume['over_cap'] else ""),
+                            data=f,
+                            file_name=os.path.basename(volume['path']),
+                            mime="application/pdf",
+                            key=f"volume_{volume['volume']}",
+                            use_container_width=True
+                        )
+
+                with open(volumes['manifest_path'], 'rb') as f:
+                    st.download_button(
+                        label="📄 Download Volume Manifest (JSON)",
+                        data=f,
+                        file_name=os.path.basename(volumes['manifest_path']),
+                        mime="application/json",
+                        use_container_width=True
+                    )
+            elif 'output_file' in st.session_state:
                 with open(st.session_state.output_file, 'rb') as f:
                     st.download_button(
                         label="📥 Download Exhibit Package",
@@ -500,17 +635,25 @@ def generate_exhibits(
     smallpdf_api_key: Optional[str],
     add_toc: bool,
     add_archive: bool,
-    merge_pdfs: bool
+    merge_pdfs: bool,
+    max_volume_bytes: Optional[int] = None,
+    bates_prefix: Optional[str] = None,
+    split_large_files: bool = False
 ):
     """Generate exhibit package from uploaded files"""
 
+    pdf_handler = None
+
     with st.spinner("🔄 Processing files..."):
         try:
             # Create PDF handler with compression settings
             pdf_handler = PDFHandler(
                 enable_compression=enable_compression,
                 quality_preset=quality_preset,
-                smallpdf_api_key=smallpdf_api_key
+                smallpdf_api_key=smallpdf_api_key,
+                compression_cache=CompressionCache() if enable_compression else None,
+                persistent_ghostscript=enable_compression,
+                chunk_page_threshold=CHUNK_PAGE_THRESHOLD if split_large_files else None
             )
 
             # Create temporary directory for processing
@@ -536,8 +679,41 @@ def generate_exhibits(
 
                 status_text.text("✓ All files saved")
 
-                # Compression phase
-                compression_results = []
+                # Number exhibits
+                exhibit_numbers = []
+                for i in range(len(file_paths)):
+                    if numbering_style == "letters":
+                        exhibit_numbers.append(chr(65 + i))  # A, B, C...
+                    elif numbering_style == "numbers":
+                        exhibit_numbers.append(str(i + 1))  # 1, 2, 3...
+                    else:  # roman
+                        exhibit_numbers.append(to_roman(i + 1))  # I, II, III...
+
+                # Bates mode stamps the merged package once instead of each exhibit
+                bates = bates_prefix is not None and merge_pdfs and not max_volume_bytes
+
+                # Compress, stamp and merge in one pass when building a package;
+                # very large packages stream to disk to keep memory flat instead
+                # (decided by size, as no file has been parsed yet). The fused
+                # pass keeps compressed exhibits in memory, not in temp files
+                streaming = sum(os.path.getsize(file_path) for file_path in file_paths) > STREAMING_MERGE_BYTES
+                fused = merge_pdfs and PYMUPDF_AVAILABLE and not streaming and not max_volume_bytes
+                pdf_handler.in_memory = fused
+
+                # Reuse exhibits stamped by an earlier build this session when
+                # their content, number and settings are unchanged (files are
+                # only hashed here; the stages below parse them)
+                manifest = BuildManifest(st.session_state.build_dir)
+                pdf_handler.temp_dir = st.session_state.build_dir
+                build_plan = manifest.plan([] if bates else [
+                    {'sha256': pdf_handler.metadata.content_hash(file_path),
+                     'params': pdf_handler._stamp_params(exhibit_num)}
+                    for file_path, exhibit_num in zip(file_paths, exhibit_numbers)
+                ])
+                manifest.seed(pdf_handler.artifacts, file_paths, build_plan)
+
+                # Compression phase (results are registered for the later stages)
+                compression_results = [None] * len(file_paths)  # Aligned with file_paths
                 total_original_size = 0
                 total_compressed_size = 0
 
@@ -545,10 +721,13 @@ def generate_exhibits(
                     status_text.text("🗜️ Compressing PDFs...")
 
                     for i, file_path in enumerate(file_paths):
-                        result = pdf_handler.compressor.compress(file_path) if pdf_handler.compressor else {'success': False}
+                        if i in build_plan['reuse']:
+                            result = build_plan['reuse'][i]['compression']
+                        else:
+                            result = pdf_handler.compress_exhibit(file_path)
 
-                        if result['success']:
-                            compression_results.append(result)
+                        if result and result['success']:
+                            compression_results[i] = result
                             total_original_size += result['original_size']
                             total_compressed_size += result['compressed_size']
 
@@ -560,82 +739,210 @@ def generate_exhibits(
                         progress_bar.progress((i + 1) / len(file_paths))
 
                     # Calculate average compression
-                    if compression_results:
+                    succeeded = [result for result in compression_results if result]
+                    if succeeded:
                         avg_reduction = (1 - total_compressed_size / total_original_size) * 100 if total_original_size > 0 else 0
 
                         st.session_state.compression_stats = {
                             'original_size': total_original_size,
                             'compressed_size': total_compressed_size,
                             'avg_reduction': avg_reduction,
-                            'method': compression_results[0]['method'] if compression_results else 'none',
+                            'method': succeeded[0]['method'],
                             'quality': quality_preset
                         }
 
                         status_text.text(f"✓ Compression complete: {avg_reduction:.1f}% average reduction")
 
-                # Number exhibits
                 status_text.text("📝 Numbering exhibits...")
 
                 exhibit_list = []
                 numbered_files = []
 
-                for i, file_path in enumerate(file_paths):
-                    # Get exhibit number
-                    if numbering_style == "letters":
-                        exhibit_num = chr(65 + i)  # A, B, C...
-                    elif numbering_style == "numbers":
-                        exhibit_num = str(i + 1)  # 1, 2, 3...
-                    else:  # roman
-                        exhibit_num = to_roman(i + 1)  # I, II, III...
-
-                    # Add exhibit number to PDF
-                    numbered_file = pdf_handler.add_exhibit_number(file_path, exhibit_num)
-                    numbered_files.append(numbered_file)
-
-                    # Track exhibit info
-                    exhibit_info = {
-                        'number': exhibit_num,
-                        'title': Path(file_path).stem,
-                        'filename': os.path.basename(file_path),
-                        'pages': get_pdf_page_count(file_path)
-                    }
-
-                    # Add compression info if available
-                    if i < len(compression_results) and compression_results[i]['success']:
-                        exhibit_info['compression'] = {
-                            'reduction': compression_results[i]['reduction_percent'],
-                            'method': compression_results[i]['method']
+                def describe_exhibits():
+                    """Exhibit info from the metadata index, filled by the stage that parsed each file"""
+                    exhibit_list[:] = []
+                    for i, (file_path, exhibit_num) in enumerate(zip(file_paths, exhibit_numbers)):
+                        metadata = pdf_handler.metadata.ensure(file_path)  # Parses only files no stage read
+                        exhibit_info = {
+                            'number': exhibit_num,
+                            'title': Path(file_path).stem,
+                            'filename': os.path.basename(file_path),
+                            'path': file_path,
+                            'pages': metadata.page_count,
+                            'size': metadata.byte_size,
+                            'has_text_layer': metadata.has_text_layer,
+                            'encrypted': metadata.encrypted,
+                            'readable': metadata.readable
                         }
 
-                    exhibit_list.append(exhibit_info)
-
-                    progress_bar.progress((i + 1) / len(file_paths))
-                    status_text.text(f"📝 Numbered exhibit {exhibit_num}")
+                        # Add compression info if available
+                        if compression_results[i]:
+                            exhibit_info['compression'] = {
+                                'reduction': compression_results[i]['reduction_percent'],
+                                'method': compression_results[i]['method']
+                            }
 
-                st.session_state.exhibit_list = exhibit_list
+                        exhibit_list.append(exhibit_info)
 
-                # Generate TOC if requested
-                if add_toc:
+                def table_of_contents():
+                    """TOC (if requested) and page map for the package"""
+                    if not add_toc:
+                        return {'output_path': None, 'page_map': build_page_map(exhibit_list)}
                     status_text.text("📋 Generating Table of Contents...")
-                    toc_file = pdf_handler.generate_table_of_contents(
+                    return pdf_handler.generate_toc_with_page_map(
                         exhibit_list,
                         visa_type,
                         os.path.join(tmp_dir, "TOC.pdf")
                     )
-                    numbered_files.insert(0, toc_file)
+
+                # Add exhibit numbers to PDFs (the fused pipeline stamps while merging)
+                if bates and not fused:
+                    # Merge the (compressed) exhibits as they are; stamped after the merge
+                    for file_path in file_paths:
+                        result = pdf_handler.compress_exhibit(file_path)
+                        if result and result['success'] and 'output_path' in result:
+                            numbered_files.append(result['output_path'])
+                        else:
+                            numbered_files.append(file_path)
+                    stamped_files = [None] * len(file_paths)
+                elif not fused:
+                    exhibits = list(zip(file_paths, exhibit_numbers))
+
+                    def show_stamp_progress(completed, total, number):
+                        progress_bar.progress(completed / total)
+                        status_text.text(f"📝 Numbered exhibit {number} ({completed}/{total})")
+
+                    if len(exhibits) >= PARALLEL_STAMP_EXHIBITS:
+                        numbered_files = [
+                            numbered_file for _, numbered_file in
+                            pdf_handler.stamp_exhibits(exhibits, on_progress=show_stamp_progress)
+                        ]
+                    else:
+                        for i, (file_path, exhibit_num) in enumerate(exhibits):
+                            numbered_files.append(pdf_handler.add_exhibit_number(file_path, exhibit_num))
+                            show_stamp_progress(i + 1, len(exhibits), exhibit_num)
+
+                    stamped_files = list(numbered_files)
+
+                if not fused:
+                    describe_exhibits()
+
+                    # Encrypted or corrupt files cannot be merged; they stay
+                    # listed with 0 pages
+                    numbered_files = [
+                        numbered_file if info['readable'] else None
+                        for numbered_file, info in zip(numbered_files, exhibit_list)
+                    ]
+
+                    # Generate TOC if requested, with start pages from the page
+                    # map (volumes each get their own TOC slice instead)
+                    if max_volume_bytes:
+                        page_map = build_page_map(exhibit_list)
+                    else:
+                        toc = table_of_contents()
+                        page_map = toc['page_map']
+                        if toc['output_path']:
+                            numbered_files.insert(0, toc['output_path'])
 
                 # Merge PDFs if requested
-                if merge_pdfs:
+                st.session_state.package_stats = None
+                st.session_state.volumes = None
+                st.session_state.bates_range = None
+                if max_volume_bytes:
+                    status_text.text("📚 Writing volumes...")
+                    readable = [i for i, exhibit_info in enumerate(exhibit_list) if exhibit_info['readable']]
+                    st.session_state.volumes = pdf_handler.write_volumes(
+                        [exhibit_list[i] for i in readable],
+                        [stamped_files[i] for i in readable],
+                        visa_type,
+                        tempfile.mkdtemp(prefix="exhibit_volumes_"),
+                        f"Exhibit_Package_{visa_type}",
+                        max_volume_bytes,
+                        on_progress=lambda completed, total, path: status_text.text(
+                            f"📚 Wrote {os.path.basename(path)} ({completed}/{total})"
+                        )
+                    )
+                    st.session_state.pop('output_file', None)
+                elif fused:
+                    status_text.text("📦 Building package...")
+                    merged_file = os.path.join(tmp_dir, "final_package.pdf")
+                    front = {}
+
+                    def front_matter(results):
+                        # The build has parsed every exhibit: list them and add the TOC
+                        describe_exhibits()
+                        front.update(table_of_contents())
+                        return front
+
+                    package = pdf_handler.build_package(
+                        list(zip(file_paths, exhibit_numbers)),
+                        merged_file,
+                        deduplicate_resources=True,
+                        on_progress=lambda current, total, number: status_text.text(
+                            f"📦 Added exhibit {number} ({current}/{total})"
+                        ),
+                        keep_stamped=manifest.max_bytes > 0,  # Only for reuse by later builds
+                        bates_prefix=bates_prefix if bates else None,
+                        toc=front_matter
+                    )
+                    page_map = front['page_map']
+                    stamped_files = [exhibit['stamped_path'] for exhibit in package['exhibits']]
+                    st.session_state.package_stats = {
+                        'peak_memory_mb': package['memory']['peak_rss_bytes'] / (1024 * 1024),
+                        'seconds': package['seconds']
+                    }
+                elif merge_pdfs:
                     status_text.text("📦 Merging PDFs...")
                     output_file = os.path.join(tmp_dir, "final_package.pdf")
-                    merged_file = pdf_handler.merge_pdfs(numbered_files, output_file)
+                    # A streamed package is Bates-stamped page by page while it is
+                    # copied; a second whole-package pass would load it all at once
+                    merged_file = pdf_handler.merge_pdfs(
+                        [numbered_file for numbered_file in numbered_files if numbered_file],
+                        output_file,
+                        deduplicate_resources=True,
+                        streaming=streaming,
+                        outline=outline_from_page_map(page_map),
+                        stamps=package_stamps(page_map, bates_prefix) if bates and streaming else None
+                    )
+                    if bates and not streaming:
+                        status_text.text("🔢 Stamping Bates numbers...")
+                        pdf_handler.stamp_package(merged_file, page_map, bates_prefix)
 
+                if merge_pdfs and not max_volume_bytes:
+                    for exhibit_info, entry in zip(exhibit_list, page_map['exhibits']):
+                        exhibit_info['start_page'] = entry['start_page'] if entry['pages'] else None
+
+                st.session_state.exhibit_list = exhibit_list
+
+                if bates:
+                    st.session_state.bates_range = (
+                        f"{bates_text(1, bates_prefix)}–{bates_text(page_map['total_pages'], bates_prefix)}"
+                    )
+
+                if merge_pdfs and not max_volume_bytes:
                     # Save to session state for download
                     final_output = os.path.join(tempfile.gettempdir(), f"exhibit_package_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
                     import shutil
                     shutil.copy(merged_file, final_output)
                     st.session_state.output_file = final_output
 
+                # Remember what was built for the next rebuild
+                for i, (file_path, stamped_file) in enumerate(zip(file_paths, stamped_files)):
+                    if stamped_file and stamped_file != file_path:  # Original is returned on failure
+                        manifest.record(
+                            pdf_handler.metadata.content_hash(file_path),
+                            pdf_handler._stamp_params(exhibit_numbers[i]),
+                            i,
+                            os.path.basename(file_path),
+                            stamped_file,
+                            exhibit_list[i]['pages'],
+                            compression_results[i]
+                        )
+                manifest.save()
+
+                st.session_state.stage_stats = pdf_handler.artifacts.stats()
+                st.session_state.rebuild_stats = BuildManifest.report(build_plan)
+
                 progress_bar.progress(100)
                 status_text.text("✓ Generation complete!")
 
@@ -648,14 +955,9 @@ def generate_exhibits(
             with st.expander("Error Details"):
                 st.code(traceback.format_exc())
 
-def get_pdf_page_count(pdf_path: str) -> int:
-    """Get number of pages in PDF"""
-    try:
-        from PyPDF2 import PdfReader
-        reader = PdfReader(pdf_path)
-        return len(reader.pages)
-    except:
-        return 0
+        finally:
+            if pdf_handler:
+                pdf_handler.close()
 
 def to_roman(num: int) -> str:
     """Convert number to Roman numeral"""
@@ -0,0 +1,134 @@
+"""
+Artifact Registry - Intermediate outputs shared between pipeline stages
+Lets each stage consume the previous stage's output instead of redoing it
+
+An artifact is keyed by:
+- the source file (resolved path, size and modification time)
+- the stage that produced it ('compress', 'stamp', ...)
+- the stage parameters (preset, exhibit number, backend, ...)
+
+The registry lives for one package build. Unlike CompressionCache it keeps
+nothing on disk itself; artifacts point at files the stages wrote or hold
+bytes in memory. Per-stage produced/reused counts are kept for reporting.
+"""
+
+import os
+import json
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class ArtifactRegistry:
+    """Registry of stage outputs for one pipeline run"""
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._artifacts: Dict[str, Dict[str, Any]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(source_path: str, stage: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build the registry key for a source file and stage configuration
+
+        Args:
+            source_path: Input file of the stage chain
+            stage: Stage name
+            params: Stage parameters (must be JSON serialisable)
+
+        Returns:
+            Key string
+        """
+        real = os.path.realpath(source_path)
+        stat = os.stat(real)
+        return json.dumps(
+            [real, stat.st_size, stat.st_mtime_ns, stage, params or {}],
+            sort_keys=True
+        )
+
+    def get(self, source_path: str, stage: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Look up an artifact (counts as a reuse when found)
+
+        Artifacts whose output file has since been removed are dropped.
+
+        Returns:
+            The artifact dict, or None
+        """
+        key = self.make_key(source_path, stage, params)
+
+        with self._lock:
+            artifact = self._artifacts.get(key)
+            if artifact is None:
+                return None
+
+            output_path = artifact.get('output_path')
+            if output_path and not os.path.exists(output_path):
+                del self._artifacts[key]
+                return None
+
+            self._count(stage, 'reused')
+            return artifact
+
+    def put(
+        self,
+        source_path: str,
+        stage: str,
+        artifact: Dict[str, Any],
+        params: Optional[Dict[str, Any]] = None,
+        count: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Record a stage output
+
+        Args:
+            source_path: Input file of the stage chain
+            stage: Stage name
+            artifact: Result dict (typically with output_path or data)
+            params: Stage parameters
+            count: Count as produced (False for outputs of an earlier run)
+
+        Returns:
+            The stored artifact
+        """
+        key = self.make_key(source_path, stage, params)
+
+        with self._lock:
+            self._artifacts[key] = artifact
+            if count:
+                self._count(stage, 'produced')
+        return artifact
+
+    def get_or_create(
+        self,
+        source_path: str,
+        stage: str,
+        producer: Callable[[], Dict[str, Any]],
+        params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Return the registered artifact, or run producer() and register it
+
+        Args:
+            source_path: Input file of the stage chain
+            stage: Stage name
+            producer: Builds the artifact when none is registered
+            params: Stage parameters
+
+        Returns:
+            Artifact dict
+        """
+        artifact = self.get(source_path, stage, params)
+        if artifact is None:
+            artifact = self.put(source_path, stage, producer(), params)
+        return artifact
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-stage {'produced': n, 'reused': m} counts"""
+        with self._lock:
+            return {stage: dict(counts) for stage, counts in self._counts.items()}
+
+    def _count(self, stage: str, kind: str) -> None:
+        counts = self._counts.setdefault(stage, {'produced': 0, 'reused': 0})
+        counts[kind] += 1
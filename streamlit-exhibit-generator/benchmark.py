@@ -0,0 +1,1121 @@
+"""
+Benchmark Harness - Measure PDF pipeline performance on a synthetic corpus
+Produces machine-readable JSON reports that can be diffed between commits
+
+Usage:
+    python benchmark.py compression --output report.json
+    python benchmark.py compression --quick --tiers pymupdf --presets high
+    python benchmark.py stamping --output stamping.json
+    python benchmark.py merge --exhibits 25 50 100 --rss-ceiling-mb 64
+    python benchmark.py parallel --exhibits 24 --workers 1 2 4 8
+    python benchmark.py toc --exhibits 100 500 1000 2000
+    python benchmark.py bates --exhibits 25 100 --backend pymupdf
+    python benchmark.py bates --streaming-bytes 0  # skip the streaming package
+    python benchmark.py colorspace
+
+Corpus (deterministic for a given seed):
+- text_letter: born-digital award/support letters (text only)
+- scanned_gray: grayscale scans stored as JPEG page images
+- color_photo: color photos with a vector seal and signature
+- mixed: text, scans and photos in one document
+- monster: 500+ page scanned archive (skipped with --quick)
+- geometry: letter/A4/legal pages with every /Rotate value and offset
+  MediaBoxes (stamping suite only)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import functools
+import platform
+import resource
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Any, Optional
+
+import fitz  # PyMuPDF
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+from compress_handler import USCISPDFCompressor, _ghostscript_version
+from pdf_handler import PDFHandler, STREAMING_MERGE_BYTES
+from memory_monitor import RSSMonitor
+from page_map import build_page_map
+from stamping import package_stamps
+from page_analysis import optimize_page_colorspaces
+
+
+LETTER = (612, 792)
+FIXED_DATE = "D:20240101000000Z"
+
+LETTER_TEXT = (
+    "To Whom It May Concern: I am writing in strong support of the petition "
+    "filed on behalf of the beneficiary, whose original contributions to the "
+    "field have been widely recognized by peers and independent experts. "
+)
+
+CORPUS_SPEC = {
+    'text_letter': {'pages': 4},
+    'scanned_gray': {'pages': 12},
+    'color_photo': {'pages': 6},
+    'mixed': {'pages': 20},
+    'monster': {'pages': 520},
+}
+
+TIERS = ['ghostscript', 'pymupdf']
+
+GEOMETRY_PAGES = 40
+GEOMETRY_SIZES = [LETTER, (595, 842), (612, 1008)]  # letter, A4, legal
+GEOMETRY_ROTATIONS = [0, 90, 180, 270]
+
+STAMP_METHODS = ['per_page_overlay', 'single_pass_overlay', 'pymupdf']
+
+MERGE_METHODS = ['merger', 'streaming']
+MERGE_EXHIBIT_COUNTS = [25, 50, 100]
+MERGE_EXHIBIT = 'scanned_gray'
+
+PARALLEL_EXHIBIT = 'mixed'
+PARALLEL_EXHIBIT_COUNT = 24
+PARALLEL_WORKERS = [1, 2, 4, 8]
+
+TOC_LAYOUTS = ['package', 'archive']
+TOC_EXHIBIT_COUNTS = [100, 500, 1000, 2000]
+
+BATES_METHODS = ['per_exhibit', 'package']
+BATES_EXHIBIT = 'text_letter'
+BATES_EXHIBIT_COUNTS = [25, 100, 250]
+BATES_STREAMING_EXHIBIT = 'scanned_gray'  # Package just over STREAMING_MERGE_BYTES
+
+# Small content on a mostly-text page that must survive colour-space reduction:
+# case -> what the images must keep ('color' or 'gray levels')
+COLORSPACE_CASES = {
+    'seal_image': 'color',
+    'seal_in_scan': 'color',
+    'photo_image': 'gray levels',
+    'photo_in_scan': 'gray levels',
+}
+
+
+# ==========================================
+# SYNTHETIC CORPUS
+# ==========================================
+
+def _new_document() -> fitz.Document:
+    doc = fitz.open()
+    doc.set_metadata({
+        'title': 'Synthetic exhibit',
+        'creationDate': FIXED_DATE,
+        'modDate': FIXED_DATE,
+    })
+    return doc
+
+
+def _add_text_page(doc: fitz.Document, rng: random.Random, page_number: int) -> None:
+    """Born-digital letter page"""
+    page = doc.new_page(width=LETTER[0], height=LETTER[1])
+    page.insert_text((72, 72), "Global Institute of Research", fontname="hebo", fontsize=14)
+    body = " ".join(LETTER_TEXT for _ in range(rng.randint(6, 10)))
+    page.insert_textbox(fitz.Rect(72, 100, 540, 720), body, fontname="helv", fontsize=11)
+    page.insert_text((72, 750), f"Page {page_number}", fontname="helv", fontsize=9)
+
+
+def _add_scanned_page(doc: fitz.Document, rng: random.Random, dpi: int = 150) -> None:
+    """Grayscale scan: rendered text with speckle, stored as a JPEG image"""
+    source = fitz.open()
+    _add_text_page(source, rng, rng.randint(1, 99))
+    pix = source[0].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    source.close()
+
+    for _ in range(pix.width * pix.height // 400):
+        pix.set_pixel(rng.randrange(pix.width), rng.randrange(pix.height), (rng.randint(0, 160),))
+
+    page = doc.new_page(width=LETTER[0], height=LETTER[1])
+    page.insert_image(page.rect, stream=pix.tobytes("jpeg", jpg_quality=90))
+
+
+def _add_photo_page(doc: fitz.Document, rng: random.Random) -> None:
+    """Color photo with a seal and a handwritten-style signature"""
+    seed_bytes = bytes(rng.randrange(256) for _ in range(48 * 36 * 3))
+    seed = fitz.Pixmap(fitz.csRGB, 48, 36, seed_bytes, False)
+    photo = fitz.Pixmap(seed, 1200, 900)  # Smooth upscaling looks photographic
+
+    page = doc.new_page(width=LETTER[0], height=LETTER[1])
+    page.insert_image(fitz.Rect(72, 72, 540, 423), stream=photo.tobytes("jpeg", jpg_quality=92))
+
+    # Seal
+    center = fitz.Point(460, 600)
+    page.draw_circle(center, 60, color=(0.7, 0.1, 0.1), width=3)
+    page.draw_circle(center, 48, color=(0.7, 0.1, 0.1), width=1)
+    page.insert_text((415, 605), "OFFICIAL SEAL", fontname="hebo", fontsize=9, color=(0.7, 0.1, 0.1))
+
+    # Signature
+    points = [fitz.Point(90 + i * 6, 640 + rng.randint(-12, 12)) for i in range(30)]
+    page.draw_polyline(points, color=(0.05, 0.05, 0.4), width=1.5)
+    page.insert_text((90, 680), "Authorized Signature", fontname="helv", fontsize=9)
+
+
+def _build_document(name: str, pages: int, rng: random.Random) -> fitz.Document:
+    doc = _new_document()
+
+    for i in range(pages):
+        if name == 'text_letter':
+            _add_text_page(doc, rng, i + 1)
+        elif name == 'scanned_gray':
+            _add_scanned_page(doc, rng)
+        elif name == 'color_photo':
+            _add_photo_page(doc, rng)
+        elif name == 'monster':
+            _add_scanned_page(doc, rng, dpi=100)
+        elif i % 3 == 0:  # mixed
+            _add_text_page(doc, rng, i + 1)
+        elif i % 3 == 1:
+            _add_scanned_page(doc, rng)
+        else:
+            _add_photo_page(doc, rng)
+
+    return doc
+
+
+def generate_corpus(
+    corpus_dir: str,
+    seed: int = 0,
+    include_monster: bool = True
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Write the synthetic exhibit corpus (skips files that already exist)
+
+    Args:
+        corpus_dir: Output directory
+        seed: Random seed (same seed -> byte-identical files)
+        include_monster: Also build the 500+ page document
+
+    Returns:
+        Mapping of corpus name to {'path', 'pages', 'bytes', 'sha256'}
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    corpus = {}
+
+    for name, spec in CORPUS_SPEC.items():
+        if name == 'monster' and not include_monster:
+            continue
+
+        path = os.path.join(corpus_dir, f"{name}_s{seed}.pdf")
+        if not os.path.exists(path):
+            rng = random.Random(f"{seed}:{name}")
+            doc = _build_document(name, spec['pages'], rng)
+            doc.save(path, garbage=1, deflate=True, no_new_id=True)
+            doc.close()
+
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+
+        corpus[name] = {
+            'path': path,
+            'pages': spec['pages'],
+            'bytes': os.path.getsize(path),
+            'sha256': digest
+        }
+
+    return corpus
+
+
+# ==========================================
+# MEASUREMENT
+# ==========================================
+
+def _peak_rss_kb() -> int:
+    """Peak RSS of this process and its children, in KB"""
+    self_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    peak = max(self_peak, child_peak)
+    return peak // 1024 if sys.platform == 'darwin' else peak  # macOS reports bytes
+
+
+def _cpu_seconds() -> float:
+    """User + system CPU time of this process and its children"""
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (
+        usage_self.ru_utime + usage_self.ru_stime
+        + usage_children.ru_utime + usage_children.ru_stime
+    )
+
+
+def _run_compression_trial(input_path: str, output_path: str, tier: str, preset: str) -> Dict[str, Any]:
+    """Compress one file with one tier (runs in a fresh process)"""
+    compressor = USCISPDFCompressor(quality_preset=preset, skip_threshold=None)
+    tier_func = {
+        'ghostscript': compressor._compress_ghostscript,
+        'pymupdf': compressor._compress_pymupdf,
+    }[tier]
+
+    cpu_start = _cpu_seconds()
+    wall_start = time.perf_counter()
+    try:
+        result = tier_func(input_path, output_path)
+        error = None
+    except Exception as e:
+        result = {}
+        error = str(e)
+    wall = time.perf_counter() - wall_start
+    cpu = _cpu_seconds() - cpu_start
+    compressor.close()
+
+    output_size = result.get('compressed_size')
+    original_size = os.path.getsize(input_path)
+
+    return {
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        'peak_rss_kb': _peak_rss_kb(),
+        'output_bytes': output_size,
+        'ratio': round(output_size / original_size, 4) if output_size else None,
+        'error': error
+    }
+
+
+def run_in_fresh_process(func, *args) -> Any:
+    """Run func(*args) in a new spawned process so peak RSS is per trial"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(func, *args).result()
+
+
+def benchmark_compression(
+    corpus: Dict[str, Dict[str, Any]],
+    work_dir: str,
+    tiers: List[str],
+    presets: List[str],
+    on_progress: Optional[callable] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run every corpus file through every tier x preset
+
+    Returns:
+        One record per (file, tier, preset), sorted for stable diffs
+    """
+    records = []
+    trials = [(name, tier, preset) for name in corpus for tier in tiers for preset in presets]
+
+    for i, (name, tier, preset) in enumerate(trials):
+        if on_progress:
+            on_progress(i + 1, len(trials), f"{name} / {tier} / {preset}")
+
+        output_path = os.path.join(work_dir, f"{name}_{tier}_{preset}.pdf")
+        measurement = run_in_fresh_process(
+            _run_compression_trial, corpus[name]['path'], output_path, tier, preset
+        )
+        records.append({
+            'corpus': name,
+            'tier': tier,
+            'preset': preset,
+            'input_bytes': corpus[name]['bytes'],
+            'pages': corpus[name]['pages'],
+            **measurement
+        })
+
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    return sorted(records, key=lambda r: (r['corpus'], r['tier'], r['preset']))
+
+
+# ==========================================
+# STAMPING
+# ==========================================
+
+def generate_geometry_document(path: str, pages: int = GEOMETRY_PAGES) -> Dict[str, Any]:
+    """
+    Write a document cycling through page sizes, rotations and MediaBox offsets
+
+    Returns:
+        Corpus entry {'path', 'pages', 'bytes', 'sha256'}
+    """
+    if not os.path.exists(path):
+        doc = _new_document()
+        for i in range(pages):
+            width, height = GEOMETRY_SIZES[i % len(GEOMETRY_SIZES)]
+            page = doc.new_page(width=width, height=height)
+            page.insert_text((72, 120), f"Geometry page {i + 1}", fontname="helv", fontsize=12)
+            if (i // len(GEOMETRY_ROTATIONS)) % 2:
+                doc.xref_set_key(page.xref, 'MediaBox', f'[36 36 {width + 36} {height + 36}]')
+            page.set_rotation(GEOMETRY_ROTATIONS[i % len(GEOMETRY_ROTATIONS)])
+        doc.save(path, garbage=1, deflate=True, no_new_id=True)
+        doc.close()
+
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+
+    return {'path': path, 'pages': pages, 'bytes': os.path.getsize(path), 'sha256': digest}
+
+
+def _stamp_per_page_overlay(input_path: str, output_path: str, exhibit_number: str) -> None:
+    """Previous add_exhibit_number stamping: one ReportLab PDF parsed per page"""
+    reader = PdfReader(input_path)
+    writer = PdfWriter()
+
+    for page_num, page in enumerate(reader.pages):
+        packet = BytesIO()
+        can = canvas.Canvas(packet, pagesize=letter)
+        can.setFont("Helvetica-Bold", 10)
+        can.drawCentredString(letter[0] / 2, letter[1] - 0.5 * inch, f"Exhibit {exhibit_number}")
+        can.setFont("Helvetica", 9)
+        can.drawCentredString(letter[0] / 2, 0.5 * inch, f"Page {page_num + 1} of {len(reader.pages)}")
+        can.save()
+
+        packet.seek(0)
+        overlay = PdfReader(packet)
+        page.merge_page(overlay.pages[0])
+        writer.add_page(page)
+
+    with open(output_path, 'wb') as f:
+        writer.write(f)
+
+
+def _stamp_with_handler(input_path: str, output_path: str, exhibit_number: str, backend: str) -> None:
+    """Current add_exhibit_number stamping (compression disabled)"""
+    handler = PDFHandler(enable_compression=False, stamp_backend=backend)
+    handler.temp_dir = os.path.dirname(output_path)
+    stamped = handler.add_exhibit_number(input_path, exhibit_number)
+    os.replace(stamped, output_path)
+
+
+def _run_stamping_trial(input_path: str, output_path: str, method: str, pages: int) -> Dict[str, Any]:
+    """Stamp one file with one method (runs in a fresh process)"""
+    stamp = {
+        'per_page_overlay': _stamp_per_page_overlay,
+        'single_pass_overlay': functools.partial(_stamp_with_handler, backend='pypdf2'),
+        'pymupdf': functools.partial(_stamp_with_handler, backend='pymupdf'),
+    }[method]
+
+    cpu_start = _cpu_seconds()
+    wall_start = time.perf_counter()
+    try:
+        stamp(input_path, output_path, 'A')
+        error = None
+    except Exception as e:
+        error = str(e)
+    wall = time.perf_counter() - wall_start
+    cpu = _cpu_seconds() - cpu_start
+
+    return {
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        'pages_per_second': round(pages / wall, 1) if wall and not error else None,
+        'peak_rss_kb': _peak_rss_kb(),
+        'output_bytes': os.path.getsize(output_path) if not error else None,
+        'error': error
+    }
+
+
+def benchmark_stamping(
+    corpus: Dict[str, Dict[str, Any]],
+    work_dir: str,
+    methods: List[str],
+    on_progress: Optional[callable] = None
+) -> List[Dict[str, Any]]:
+    """
+    Stamp every corpus file with every method
+
+    Returns:
+        One record per (file, method), sorted for stable diffs
+    """
+    records = []
+    trials = [(name, method) for name in corpus for method in methods]
+
+    for i, (name, method) in enumerate(trials):
+        if on_progress:
+            on_progress(i + 1, len(trials), f"{name} / {method}")
+
+        output_path = os.path.join(work_dir, f"{name}_{method}.pdf")
+        measurement = run_in_fresh_process(
+            _run_stamping_trial, corpus[name]['path'], output_path, method, corpus[name]['pages']
+        )
+        records.append({
+            'corpus': name,
+            'method': method,
+            'pages': corpus[name]['pages'],
+            **measurement
+        })
+
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    return sorted(records, key=lambda r: (r['corpus'], r['method']))
+
+
+# ==========================================
+# MERGE MEMORY
+# ==========================================
+
+def _run_merge_trial(paths: List[str], work_dir: str, method: str) -> Dict[str, Any]:
+    """Merge paths with one method while sampling RSS (runs in a fresh process)"""
+    handler = PDFHandler(enable_compression=False)
+    handler.temp_dir = work_dir
+
+    wall_start = time.perf_counter()
+    with RSSMonitor(interval=0.01) as monitor:
+        output_path = handler.merge_pdfs(paths, f"merge_{method}", streaming=(method == 'streaming'))
+    wall = time.perf_counter() - wall_start
+    memory = monitor.stats()
+
+    output_bytes = os.path.getsize(output_path)
+    os.remove(output_path)
+
+    return {
+        'wall_seconds': round(wall, 3),
+        'peak_rss_kb': memory['peak_rss_bytes'] // 1024,
+        'peak_increase_kb': memory['peak_increase_bytes'] // 1024,
+        'output_bytes': output_bytes
+    }
+
+
+def benchmark_merge(
+    exhibit_path: str,
+    exhibit_pages: int,
+    work_dir: str,
+    exhibit_counts: List[int],
+    methods: List[str],
+    on_progress: Optional[callable] = None
+) -> List[Dict[str, Any]]:
+    """
+    Merge growing numbers of copies of one exhibit with every method
+
+    Returns:
+        One record per (method, exhibit count), sorted for stable diffs
+    """
+    records = []
+    trials = [(method, count) for method in methods for count in exhibit_counts]
+
+    for i, (method, count) in enumerate(trials):
+        if on_progress:
+            on_progress(i + 1, len(trials), f"{method} / {count} exhibits")
+
+        measurement = run_in_fresh_process(_run_merge_trial, [exhibit_path] * count, work_dir, method)
+        records.append({
+            'method': method,
+            'exhibits': count,
+            'pages': count * exhibit_pages,
+            **measurement
+        })
+
+    return sorted(records, key=lambda r: (r['method'], r['exhibits']))
+
+
+def check_rss_ceiling(records: List[Dict[str, Any]], ceiling_mb: float) -> List[str]:
+    """
+    Streaming merges (stamped or not) must stay under the ceiling at every
+    package size
+
+    Returns:
+        Failure messages (empty when all streaming trials pass)
+    """
+    failures = []
+    for record in records:
+        if record['method'] != 'streaming':
+            continue
+        increase_mb = record['peak_increase_kb'] / 1024
+        if increase_mb > ceiling_mb:
+            failures.append(
+                f"streaming merge of {record['pages']} pages grew RSS by "
+                f"{increase_mb:.0f} MB (ceiling {ceiling_mb:.0f} MB)"
+            )
+    return failures
+
+
+# ==========================================
+# PARALLEL STAMPING
+# ==========================================
+
+def _run_parallel_trial(paths: List[str], work_dir: str, workers: int, backend: str) -> Dict[str, Any]:
+    """Stamp a package across a worker pool (runs in a fresh process)"""
+    handler = PDFHandler(enable_compression=False, stamp_backend=backend)
+    handler.temp_dir = work_dir
+    exhibits = [(path, str(i + 1)) for i, path in enumerate(paths)]
+
+    wall_start = time.perf_counter()
+    outputs = [output_path for _, output_path in handler.stamp_exhibits(exhibits, max_workers=workers)]
+    wall = time.perf_counter() - wall_start
+
+    failed = sum(1 for output_path in outputs if output_path in paths)
+    for output_path in outputs:
+        if output_path not in paths:
+            os.remove(output_path)
+
+    return {'wall_seconds': round(wall, 3), 'failed_exhibits': failed}
+
+
+def benchmark_parallel_stamping(
+    exhibit_path: str,
+    exhibit_pages: int,
+    work_dir: str,
+    exhibit_count: int,
+    worker_counts: List[int],
+    backend: str,
+    on_progress: Optional[callable] = None
+) -> List[Dict[str, Any]]:
+    """
+    Stamp copies of one exhibit with growing worker pools
+
+    Speedup is relative to the smallest pool measured.
+
+    Returns:
+        One record per worker count, sorted for stable diffs
+    """
+    records = []
+    paths = []
+    for i in range(exhibit_count):
+        path = os.path.join(work_dir, f"parallel_exhibit_{i:03d}.pdf")
+        with open(exhibit_path, 'rb') as src, open(path, 'wb') as dst:
+            dst.write(src.read())
+        paths.append(path)
+
+    for i, workers in enumerate(sorted(worker_counts)):
+        if on_progress:
+            on_progress(i + 1, len(worker_counts), f"{workers} workers")
+
+        measurement = run_in_fresh_process(_run_parallel_trial, paths, work_dir, workers, backend)
+        records.append({
+            'workers': workers,
+            'exhibits': exhibit_count,
+            'pages': exhibit_count * exhibit_pages,
+            'pages_per_second': round(exhibit_count * exhibit_pages / measurement['wall_seconds'], 1),
+            **measurement
+        })
+
+    for path in paths:
+        os.remove(path)
+
+    baseline = records[0]['wall_seconds'] if records else None
+    for record in records:
+        record['speedup'] = round(baseline / record['wall_seconds'], 2) if baseline else None
+
+    return records
+
+
+# ==========================================
+# PACKAGE (BATES) STAMPING
+# ==========================================
+
+def _run_bates_trial(paths: List[str], work_dir: str, method: str, backend: str) -> Dict[str, Any]:
+    """
+    Stamp and merge a package per exhibit, in one package pass, or while
+    streaming the merge (runs in a fresh process, sampling RSS)
+    """
+    handler = PDFHandler(enable_compression=False, stamp_backend=backend)
+    handler.temp_dir = work_dir
+    page_counts: Dict[str, int] = {}
+    for path in paths:
+        if path not in page_counts:
+            page_counts[path] = len(PdfReader(path).pages)
+    exhibits = [{'number': str(i + 1), 'title': str(i + 1), 'pages': page_counts[path]}
+                for i, path in enumerate(paths)]
+
+    stamped = []
+    wall_start = time.perf_counter()
+    with RSSMonitor(interval=0.01) as monitor:
+        if method == 'per_exhibit':
+            stamped = [handler.add_exhibit_number(path, exhibit['number']) for path, exhibit in zip(paths, exhibits)]
+            output_path = handler.merge_pdfs(stamped, f"bates_{method}")
+        elif method == 'streaming':
+            output_path = handler.merge_pdfs(
+                paths, f"bates_{method}", streaming=True, stamps=package_stamps(build_page_map(exhibits))
+            )
+        else:
+            output_path = handler.merge_pdfs(paths, f"bates_{method}")
+            handler.stamp_package(output_path, build_page_map(exhibits))
+    wall = time.perf_counter() - wall_start
+    memory = monitor.stats()
+
+    output_bytes = os.path.getsize(output_path)
+    for path in stamped + [output_path]:
+        os.remove(path)
+
+    return {
+        'wall_seconds': round(wall, 3),
+        'peak_increase_kb': memory['peak_increase_bytes'] // 1024,
+        'output_bytes': output_bytes
+    }
+
+
+def benchmark_bates(
+    exhibit_path: str,
+    exhibit_pages: int,
+    work_dir: str,
+    exhibit_counts: List[int],
+    methods: List[str],
+    backend: str,
+    on_progress: Optional[callable] = None
+) -> List[Dict[str, Any]]:
+    """
+    Stamp-and-merge packages of growing size, per exhibit vs one package pass
+
+    Returns:
+        One record per (method, exhibit count), sorted for stable diffs
+    """
+    records = []
+    trials = [(method, count) for method in methods for count in exhibit_counts]
+    paths = []
+    for i in range(max(exhibit_counts)):
+        path = os.path.join(work_dir, f"bates_exhibit_{i:03d}.pdf")
+        with open(exhibit_path, 'rb') as src, open(path, 'wb') as dst:
+            dst.write(src.read())
+        paths.append(path)
+
+    for i, (method, count) in enumerate(trials):
+        if on_progress:
+            on_progress(i + 1, len(trials), f"{method} / {count} exhibits")
+
+        measurement = run_in_fresh_process(_run_bates_trial, paths[:count], work_dir, method, backend)
+        records.append({
+            'method': method,
+            'exhibits': count,
+            'pages': count * exhibit_pages,
+            'pages_per_second': round(count * exhibit_pages / measurement['wall_seconds'], 1),
+            **measurement
+        })
+
+    for path in paths:
+        os.remove(path)
+
+    return sorted(records, key=lambda r: (r['method'], r['exhibits']))
+
+
+def benchmark_bates_streaming(
+    exhibit_path: str,
+    exhibit_pages: int,
+    work_dir: str,
+    package_bytes: int,
+    backend: str
+) -> Dict[str, Any]:
+    """
+    Bates-stamp a package larger than package_bytes the way the app does:
+    stamped page by page during the streaming merge
+
+    Returns:
+        One 'streaming' record (check it with check_rss_ceiling)
+    """
+    count = package_bytes // os.path.getsize(exhibit_path) + 1
+    measurement = run_in_fresh_process(_run_bates_trial, [exhibit_path] * count, work_dir, 'streaming', backend)
+    return {
+        'method': 'streaming',
+        'exhibits': count,
+        'pages': count * exhibit_pages,
+        'source_bytes': count * os.path.getsize(exhibit_path),
+        'pages_per_second': round(count * exhibit_pages / measurement['wall_seconds'], 1),
+        **measurement
+    }
+
+
+# ==========================================
+# TOC RENDERING
+# ==========================================
+
+def _toc_exhibits(count: int) -> List[Dict[str, Any]]:
+    """Exhibit dicts for both TOC layouts, every one with archived URLs"""
+    return [
+        {
+            'number': str(i + 1),
+            'title': f"Letter of support from expert reviewer {i + 1}",
+            'name': f"Letter of support from expert reviewer {i + 1}",
+            'pages': 3 + i % 7,
+            'path': f"exhibit_{i + 1}.pdf",
+            'original_url': f"https://example.org/press/coverage/{i + 1}",
+            'archive_url': f"https://web.archive.org/web/20240101000000/https://example.org/press/coverage/{i + 1}"
+        }
+        for i in range(count)
+    ]
+
+
+def _run_toc_trial(work_dir: str, layout: str, count: int) -> Dict[str, Any]:
+    """Render one TOC while sampling RSS (runs in a fresh process)"""
+    handler = PDFHandler(enable_compression=False)
+    handler.temp_dir = work_dir
+    exhibits = _toc_exhibits(count)
+
+    wall_start = time.perf_counter()
+    with RSSMonitor(interval=0.01) as monitor:
+        if layout == 'package':
+            toc = handler.generate_toc_with_page_map(exhibits, 'O-1A', os.path.join(work_dir, 'toc_package.pdf'))
+            output_path = toc['output_path']
+            renders = toc['renders']
+        else:
+            output_path = handler.generate_toc(exhibits, 'benchmark')
+            renders = 1
+    wall = time.perf_counter() - wall_start
+    memory = monitor.stats()
+
+    pages = len(PdfReader(output_path).pages)
+    os.remove(output_path)
+
+    return {
+        'wall_seconds': round(wall, 3),
+        'rows_per_second': round(count / wall, 1),
+        'renders': renders,
+        'toc_pages': pages,
+        'peak_increase_kb': memory['peak_increase_bytes'] // 1024
+    }
+
+
+def benchmark_toc(
+    work_dir: str,
+    exhibit_counts: List[int],
+    layouts: List[str],
+    on_progress: Optional[callable] = None
+) -> List[Dict[str, Any]]:
+    """
+    Render TOCs of growing length with every layout
+
+    'package' is generate_toc_with_page_map (start pages, re-rendered until
+    its length is stable);
+    'archive' is generate_toc with an archived-URL row per exhibit.
+
+    Returns:
+        One record per (layout, exhibit count), sorted for stable diffs
+    """
+    records = []
+    trials = [(layout, count) for layout in layouts for count in exhibit_counts]
+
+    for i, (layout, count) in enumerate(trials):
+        if on_progress:
+            on_progress(i + 1, len(trials), f"{layout} / {count} exhibits")
+
+        measurement = run_in_fresh_process(_run_toc_trial, work_dir, layout, count)
+        records.append({'layout': layout, 'exhibits': count, **measurement})
+
+    return sorted(records, key=lambda r: (r['layout'], r['exhibits']))
+
+
+# ==========================================
+# COLOUR-SPACE FIDELITY
+# ==========================================
+
+def _seal_pixmap(dpi: int = 150) -> fitz.Pixmap:
+    """50 pt red notary seal"""
+    source = fitz.open()
+    page = source.new_page(width=50, height=50)
+    page.draw_circle(fitz.Point(25, 25), 23, color=(0.75, 0.1, 0.1), width=2)
+    page.draw_circle(fitz.Point(25, 25), 17, color=(0.75, 0.1, 0.1), width=1)
+    page.insert_text((12, 28), "SEAL", fontname="hebo", fontsize=8, color=(0.75, 0.1, 0.1))
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+    source.close()
+    return pix
+
+
+def _photo_pixmap(rng: random.Random) -> fitz.Pixmap:
+    """Small grayscale photo (smoothly upscaled noise)"""
+    seed = fitz.Pixmap(fitz.csGRAY, 12, 9, bytes(rng.randrange(256) for _ in range(12 * 9)), False)
+    return fitz.Pixmap(seed, 120, 90)
+
+
+def _build_colorspace_case(case: str, rng: random.Random) -> fitz.Document:
+    """Sparse letter page with a small seal or photo, as its own image or inside a page scan"""
+    doc = _new_document()
+    page = doc.new_page(width=LETTER[0], height=LETTER[1])
+    page.insert_text((72, 72), "Global Institute of Research", fontname="hebo", fontsize=14)
+    page.insert_textbox(fitz.Rect(72, 100, 540, 160), LETTER_TEXT, fontname="helv", fontsize=11)
+    insert = _seal_pixmap() if case.startswith('seal') else _photo_pixmap(rng)
+    rect = fitz.Rect(470, 640, 520, 690) if case.startswith('seal') else fitz.Rect(440, 640, 520, 700)
+    page.insert_image(rect, stream=insert.tobytes('png'))
+
+    if case.endswith('in_scan'):
+        scan = page.get_pixmap(dpi=150, colorspace=fitz.csRGB, alpha=False)
+        doc.close()
+        doc = _new_document()
+        page = doc.new_page(width=LETTER[0], height=LETTER[1])
+        page.insert_image(page.rect, stream=scan.tobytes('jpeg', jpg_quality=90))
+
+    return doc
+
+
+def check_colorspace_fidelity(work_dir: str, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Run colour-space reduction on pages with a little colour or gray content
+
+    A seal must stay in colour and a photo must keep more than two gray
+    levels even when the rest of the page is plain black text.
+
+    Returns:
+        One record per case with the page class, conversions and a passed flag
+    """
+    records = []
+    rng = random.Random(seed)
+
+    for case, keeps in COLORSPACE_CASES.items():
+        input_path = os.path.join(work_dir, f"colorspace_{case}.pdf")
+        output_path = os.path.join(work_dir, f"colorspace_{case}_reduced.pdf")
+        doc = _build_colorspace_case(case, rng)
+        doc.save(input_path)
+        doc.close()
+
+        result = optimize_page_colorspaces(input_path, output_path)
+
+        passed = True
+        with fitz.open(output_path) as reduced:
+            for image in reduced[0].get_images(full=True):
+                pix = fitz.Pixmap(reduced, image[0])
+                if keeps == 'color' and pix.n < 3:
+                    passed = False
+                if keeps == 'gray levels' and len(set(pix.samples[::pix.n])) <= 2:
+                    passed = False
+
+        records.append({
+            'case': case,
+            'keeps': keeps,
+            'page_class': result['pages'][0]['class'],
+            'color_fraction': result['pages'][0]['color_fraction'],
+            'images_converted': result['images_converted'],
+            'images_protected': result['images_protected'],
+            'passed': passed
+        })
+
+    return records
+
+
+# ==========================================
+# REPORT
+# ==========================================
+
+def environment_info() -> Dict[str, Any]:
+    """Versions and host details recorded with every report"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pymupdf': fitz.VersionBind,
+        'ghostscript': _ghostscript_version(),
+    }
+
+
+def write_report(path: str, suite: str, params: Dict[str, Any], records: List[Dict[str, Any]], extra: Optional[Dict[str, Any]] = None) -> None:
+    """Write a stable, diff-friendly JSON report"""
+    report = {
+        'suite': suite,
+        'environment': environment_info(),
+        'params': params,
+        'results': records,
+    }
+    if extra:
+        report.update(extra)
+
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def _print_progress(current: int, total: int, label: str) -> None:
+    print(f"[{current}/{total}] {label}", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="PDF pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest='suite', required=True)
+
+    compression = subparsers.add_parser('compression', help="Tier x preset compression benchmark")
+    compression.add_argument('--corpus-dir', default=os.path.join('benchmark_data', 'corpus'))
+    compression.add_argument('--work-dir', default=os.path.join('benchmark_data', 'work'))
+    compression.add_argument('--output', default='benchmark_compression.json')
+    compression.add_argument('--seed', type=int, default=0)
+    compression.add_argument('--quick', action='store_true', help="Skip the 500+ page document")
+    compression.add_argument('--tiers', nargs='+', default=TIERS, choices=TIERS)
+    compression.add_argument('--presets', nargs='+', default=list(USCISPDFCompressor.QUALITY_PRESETS),
+                             choices=list(USCISPDFCompressor.QUALITY_PRESETS))
+
+    stamping = subparsers.add_parser('stamping', help="Exhibit stamping throughput (pages/second)")
+    stamping.add_argument('--corpus-dir', default=os.path.join('benchmark_data', 'corpus'))
+    stamping.add_argument('--work-dir', default=os.path.join('benchmark_data', 'work'))
+    stamping.add_argument('--output', default='benchmark_stamping.json')
+    stamping.add_argument('--seed', type=int, default=0)
+    stamping.add_argument('--quick', action='store_true', help="Skip the 500+ page document")
+    stamping.add_argument('--methods', nargs='+', default=STAMP_METHODS, choices=STAMP_METHODS)
+
+    merge = subparsers.add_parser('merge', help="Merge peak memory vs package size, with an RSS ceiling check")
+    merge.add_argument('--corpus-dir', default=os.path.join('benchmark_data', 'corpus'))
+    merge.add_argument('--work-dir', default=os.path.join('benchmark_data', 'work'))
+    merge.add_argument('--output', default='benchmark_merge.json')
+    merge.add_argument('--seed', type=int, default=0)
+    merge.add_argument('--exhibits', nargs='+', type=int, default=MERGE_EXHIBIT_COUNTS,
+                       help="Package sizes, in copies of a 12-page scanned exhibit")
+    merge.add_argument('--methods', nargs='+', default=MERGE_METHODS, choices=MERGE_METHODS)
+    merge.add_argument('--rss-ceiling-mb', type=float, default=64,
+                       help="Fail if a streaming merge grows RSS by more than this")
+
+    parallel = subparsers.add_parser('parallel', help="Parallel exhibit stamping speedup vs worker count")
+    parallel.add_argument('--corpus-dir', default=os.path.join('benchmark_data', 'corpus'))
+    parallel.add_argument('--work-dir', default=os.path.join('benchmark_data', 'work'))
+    parallel.add_argument('--output', default='benchmark_parallel.json')
+    parallel.add_argument('--seed', type=int, default=0)
+    parallel.add_argument('--exhibits', type=int, default=PARALLEL_EXHIBIT_COUNT,
+                          help="Package size, in copies of a 20-page mixed exhibit")
+    parallel.add_argument('--workers', nargs='+', type=int, default=PARALLEL_WORKERS)
+    parallel.add_argument('--backend', default='pypdf2', choices=['pypdf2', 'pymupdf'])
+
+    toc = subparsers.add_parser('toc', help="TOC build time vs exhibit count")
+    toc.add_argument('--work-dir', default=os.path.join('benchmark_data', 'work'))
+    toc.add_argument('--output', default='benchmark_toc.json')
+    toc.add_argument('--exhibits', nargs='+', type=int, default=TOC_EXHIBIT_COUNTS)
+    toc.add_argument('--layouts', nargs='+', default=TOC_LAYOUTS, choices=TOC_LAYOUTS)
+
+    bates = subparsers.add_parser('bates', help="Per-exhibit stamping vs one Bates pass over the package")
+    bates.add_argument('--corpus-dir', default=os.path.join('benchmark_data', 'corpus'))
+    bates.add_argument('--work-dir', default=os.path.join('benchmark_data', 'work'))
+    bates.add_argument('--output', default='benchmark_bates.json')
+    bates.add_argument('--seed', type=int, default=0)
+    bates.add_argument('--exhibits', nargs='+', type=int, default=BATES_EXHIBIT_COUNTS,
+                       help="Package sizes, in copies of a 4-page letter exhibit")
+    bates.add_argument('--methods', nargs='+', default=BATES_METHODS, choices=BATES_METHODS)
+    bates.add_argument('--backend', default='pymupdf', choices=['pypdf2', 'pymupdf'])
+    bates.add_argument('--streaming-bytes', type=int, default=STREAMING_MERGE_BYTES,
+                       help="Also stamp a streamed package over this size (0 skips it)")
+    bates.add_argument('--rss-ceiling-mb', type=float, default=64,
+                       help="Fail if the streamed package grows RSS by more than this")
+
+    colorspace = subparsers.add_parser('colorspace', help="Small seals/photos on text pages keep colour and gray levels")
+    colorspace.add_argument('--work-dir', default=os.path.join('benchmark_data', 'work'))
+    colorspace.add_argument('--output', default='benchmark_colorspace.json')
+    colorspace.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args(argv)
+
+    if args.suite == 'compression':
+        corpus = generate_corpus(args.corpus_dir, args.seed, include_monster=not args.quick)
+        os.makedirs(args.work_dir, exist_ok=True)
+        records = benchmark_compression(corpus, args.work_dir, args.tiers, args.presets, _print_progress)
+        write_report(
+            args.output,
+            'compression',
+            {'seed': args.seed, 'quick': args.quick, 'tiers': args.tiers, 'presets': args.presets},
+            records,
+            {'corpus': {name: {k: v for k, v in info.items() if k != 'path'} for name, info in corpus.items()}}
+        )
+
+    elif args.suite == 'stamping':
+        corpus = generate_corpus(args.corpus_dir, args.seed, include_monster=not args.quick)
+        corpus['geometry'] = generate_geometry_document(os.path.join(args.corpus_dir, 'geometry.pdf'))
+        os.makedirs(args.work_dir, exist_ok=True)
+        records = benchmark_stamping(corpus, args.work_dir, args.methods, _print_progress)
+        write_report(
+            args.output,
+            'stamping',
+            {'seed': args.seed, 'quick': args.quick, 'methods': args.methods},
+            records,
+            {'corpus': {name: {k: v for k, v in info.items() if k != 'path'} for name, info in corpus.items()}}
+        )
+
+    elif args.suite == 'merge':
+        corpus = generate_corpus(args.corpus_dir, args.seed, include_monster=False)
+        exhibit = corpus[MERGE_EXHIBIT]
+        os.makedirs(args.work_dir, exist_ok=True)
+        records = benchmark_merge(
+            exhibit['path'], exhibit['pages'], args.work_dir, args.exhibits, args.methods, _print_progress
+        )
+        failures = check_rss_ceiling(records, args.rss_ceiling_mb)
+        write_report(
+            args.output,
+            'merge',
+            {'seed': args.seed, 'exhibits': args.exhibits, 'methods': args.methods,
+             'exhibit': MERGE_EXHIBIT, 'rss_ceiling_mb': args.rss_ceiling_mb},
+            records,
+            {'ceiling_failures': failures}
+        )
+
+        if failures:
+            for failure in failures:
+                print(f"✗ {failure}")
+            print(f"✓ Report written to {args.output}")
+            return 1
+
+    elif args.suite == 'parallel':
+        corpus = generate_corpus(args.corpus_dir, args.seed, include_monster=False)
+        exhibit = corpus[PARALLEL_EXHIBIT]
+        os.makedirs(args.work_dir, exist_ok=True)
+        records = benchmark_parallel_stamping(
+            exhibit['path'], exhibit['pages'], args.work_dir, args.exhibits,
+            args.workers, args.backend, _print_progress
+        )
+        write_report(
+            args.output,
+            'parallel',
+            {'seed': args.seed, 'exhibits': args.exhibits, 'workers': args.workers,
+             'backend': args.backend, 'exhibit': PARALLEL_EXHIBIT},
+            records
+        )
+
+    elif args.suite == 'toc':
+        os.makedirs(args.work_dir, exist_ok=True)
+        records = benchmark_toc(args.work_dir, args.exhibits, args.layouts, _print_progress)
+        write_report(
+            args.output,
+            'toc',
+            {'exhibits': args.exhibits, 'layouts': args.layouts},
+            records
+        )
+
+    elif args.suite == 'bates':
+        corpus = generate_corpus(args.corpus_dir, args.seed, include_monster=False)
+        exhibit = corpus[BATES_EXHIBIT]
+        os.makedirs(args.work_dir, exist_ok=True)
+        records = benchmark_bates(
+            exhibit['path'], exhibit['pages'], args.work_dir, args.exhibits,
+            args.methods, args.backend, _print_progress
+        )
+        if args.streaming_bytes:
+            streamed = corpus[BATES_STREAMING_EXHIBIT]
+            _print_progress(1, 1, f"streaming / over {args.streaming_bytes // (1024 * 1024)} MB")
+            records.append(benchmark_bates_streaming(
+                streamed['path'], streamed['pages'], args.work_dir, args.streaming_bytes, args.backend
+            ))
+        failures = check_rss_ceiling(records, args.rss_ceiling_mb)
+        write_report(
+            args.output,
+            'bates',
+            {'seed': args.seed, 'exhibits': args.exhibits, 'methods': args.methods,
+             'backend': args.backend, 'exhibit': BATES_EXHIBIT,
+             'streaming_bytes': args.streaming_bytes, 'streaming_exhibit': BATES_STREAMING_EXHIBIT,
+             'rss_ceiling_mb': args.rss_ceiling_mb},
+            records,
+            {'ceiling_failures': failures}
+        )
+
+        if failures:
+            for failure in failures:
+                print(f"✗ {failure}")
+            print(f"✓ Report written to {args.output}")
+            return 1
+
+    elif args.suite == 'colorspace':
+        os.makedirs(args.work_dir, exist_ok=True)
+        records = check_colorspace_fidelity(args.work_dir, args.seed)
+        write_report(args.output, 'colorspace', {'seed': args.seed}, records)
+
+        failed = [record['case'] for record in records if not record['passed']]
+        if failed:
+            for case in failed:
+                print(f"✗ {case}: content was reduced past its own colour class")
+            print(f"✓ Report written to {args.output}")
+            return 1
+
+    print(f"✓ Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
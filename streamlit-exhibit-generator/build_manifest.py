@@ -0,0 +1,276 @@
+"""
+Build Manifest - Incremental package rebuilds
+Remembers what each exhibit was built from so unchanged exhibits are reused
+
+For every stamped exhibit the manifest records:
+- the source content hash (SHA-256) and original filename
+- its position and exhibit number in the package
+- the stamp parameters (backend and compression preset)
+- the derived artifacts (stamped PDF, page count, compression summary)
+
+On the next build an exhibit whose content, number and parameters all match
+an entry is not compressed or stamped again: its stamped PDF is registered
+in the ArtifactRegistry and every stage picks it up from there. Moving an
+exhibit keeps it reusable as long as its number is unchanged. The TOC and
+the merge are always redone (they depend on the whole package).
+
+The manifest is a JSON file in a per-session build directory, which also
+holds the stamped outputs. Saving prunes the directory: PDFs no entry
+refers to are deleted, and the least recently used stamped outputs are
+evicted once their total size exceeds the cap.
+"""
+
+import os
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+from artifact_registry import ArtifactRegistry
+
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024  # Stamped outputs kept for reuse
+
+COMPRESSION_SUMMARY_KEYS = ('success', 'original_size', 'compressed_size', 'reduction_percent', 'method')
+
+
+class BuildManifest:
+    """Per-exhibit build records for one session's build directory"""
+
+    def __init__(self, build_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Load the manifest from a build directory (created if missing)
+
+        Args:
+            build_dir: Directory holding manifest.json and stamped outputs
+            max_bytes: Size cap for the stamped outputs kept for reuse
+                (0 keeps none)
+        """
+        self.build_dir = build_dir
+        self.max_bytes = max_bytes
+        self.path = os.path.join(build_dir, MANIFEST_NAME)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(build_dir, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def make_key(sha256: str, params: Dict[str, Any]) -> str:
+        """
+        Build the entry key for an exhibit's content and stamp parameters
+
+        Args:
+            sha256: Source content hash
+            params: Stamp parameters (exhibit number, backend, compression)
+
+        Returns:
+            Key string
+        """
+        return json.dumps([sha256, params], sort_keys=True)
+
+    def plan(self, exhibits: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Decide which exhibits can be reused and why the others are rebuilt
+
+        Args:
+            exhibits: One dict per exhibit in package order, with sha256 and
+                params (as passed to PDFHandler's stamp stage)
+
+        Returns:
+            Dictionary with reuse ({index: entry}) and rebuild ({index:
+            'new' | 'renumbered' | 'settings_changed'})
+        """
+        reuse = {}
+        rebuild = {}
+
+        with self._lock:
+            known_hashes = {}
+            for entry in self._entries.values():
+                known_hashes.setdefault(entry['sha256'], []).append(entry['params'])
+
+            for i, exhibit in enumerate(exhibits):
+                entry = self._entries.get(self.make_key(exhibit['sha256'], exhibit['params']))
+                if entry and os.path.exists(entry['stamped_path']):
+                    reuse[i] = entry
+                    continue
+
+                previous = known_hashes.get(exhibit['sha256'], [])
+                if not previous:
+                    rebuild[i] = 'new'
+                elif any(p['exhibit_number'] != exhibit['params']['exhibit_number'] for p in previous):
+                    rebuild[i] = 'renumbered'
+                else:
+                    rebuild[i] = 'settings_changed'
+
+        return {'reuse': reuse, 'rebuild': rebuild}
+
+    def seed(self, registry: ArtifactRegistry, source_paths: List[str], plan: Dict[str, Any]) -> None:
+        """
+        Register reusable stamped outputs so the stamp stage finds them
+
+        Args:
+            registry: The run's artifact registry
+            source_paths: This run's source paths, aligned with the plan
+            plan: Result of plan()
+        """
+        for i, entry in plan['reuse'].items():
+            try:
+                os.utime(entry['stamped_path'], None)  # Recently used, for eviction
+            except OSError:
+                pass
+            registry.put(
+                source_paths[i], 'stamp',
+                {
+                    'output_path': entry['stamped_path'],
+                    'exhibit_number': entry['params']['exhibit_number'],
+                    'compression': entry.get('compression')
+                },
+                entry['params'],
+                count=False
+            )
+
+    def record(
+        self,
+        sha256: str,
+        params: Dict[str, Any],
+        position: int,
+        filename: str,
+        stamped_path: str,
+        pages: int,
+        compression: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Record (or refresh) the build of one exhibit
+
+        An entry whose stamped file was overwritten by this build is dropped.
+
+        Args:
+            sha256: Source content hash
+            params: Stamp parameters
+            position: Index in the package
+            filename: Original filename (for reporting)
+            stamped_path: Stamped PDF in the build directory
+            pages: Page count
+            compression: Compression result (only the summary is kept)
+
+        Returns:
+            The stored entry
+        """
+        entry = {
+            'sha256': sha256,
+            'params': params,
+            'position': position,
+            'filename': filename,
+            'stamped_path': stamped_path,
+            'pages': pages,
+            'compression': {k: compression[k] for k in COMPRESSION_SUMMARY_KEYS if k in compression}
+            if compression else None
+        }
+        key = self.make_key(sha256, params)
+
+        with self._lock:
+            for other_key, other in list(self._entries.items()):
+                if other_key != key and other['stamped_path'] == stamped_path:
+                    del self._entries[other_key]
+            self._entries[key] = entry
+        return entry
+
+    def save(self) -> None:
+        """Prune the build directory and write the manifest atomically"""
+        self.prune()
+
+        with self._lock:
+            data = {'version': MANIFEST_VERSION, 'exhibits': list(self._entries.values())}
+
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def prune(self) -> Dict[str, int]:
+        """
+        Delete build outputs no entry refers to and evict over the size cap
+
+        Intermediate PDFs of a build (compressed copies, stamped exhibits
+        that were not recorded) are removed. Entries are then evicted least
+        recently used first (by stamped file mtime) until the stamped outputs
+        fit in max_bytes.
+
+        Returns:
+            Dictionary with removed (unreferenced files) and evicted (entries)
+        """
+        removed = 0
+        evicted = 0
+
+        with self._lock:
+            referenced = {os.path.abspath(entry['stamped_path']) for entry in self._entries.values()}
+            for name in os.listdir(self.build_dir):
+                path = os.path.abspath(os.path.join(self.build_dir, name))
+                if name.endswith('.pdf') and path not in referenced and _remove_quietly(path):
+                    removed += 1
+
+            sized = []
+            for key, entry in list(self._entries.items()):
+                try:
+                    stat = os.stat(entry['stamped_path'])
+                except OSError:
+                    del self._entries[key]
+                    continue
+                sized.append((stat.st_mtime, stat.st_size, key))
+
+            total = sum(size for _, size, _ in sized)
+            for _, size, key in sorted(sized):
+                if total <= self.max_bytes:
+                    break
+                entry = self._entries.pop(key)
+                if os.path.dirname(os.path.abspath(entry['stamped_path'])) == os.path.abspath(self.build_dir):
+                    _remove_quietly(entry['stamped_path'])
+                total -= size
+                evicted += 1
+
+        return {'removed': removed, 'evicted': evicted}
+
+    @staticmethod
+    def report(plan: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Summarise the work a plan skips
+
+        Returns:
+            Dictionary with exhibits, reused, rebuilt, pages_skipped and
+            reasons (rebuild count per reason)
+        """
+        reasons: Dict[str, int] = {}
+        for reason in plan['rebuild'].values():
+            reasons[reason] = reasons.get(reason, 0) + 1
+
+        return {
+            'exhibits': len(plan['reuse']) + len(plan['rebuild']),
+            'reused': len(plan['reuse']),
+            'rebuilt': len(plan['rebuild']),
+            'pages_skipped': sum(entry['pages'] for entry in plan['reuse'].values()),
+            'reasons': reasons
+        }
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get('version') != MANIFEST_VERSION:
+            return
+
+        for entry in data.get('exhibits', []):
+            self._entries[self.make_key(entry['sha256'], entry['params'])] = entry
+
+
+def _remove_quietly(path: str) -> bool:
+    """Delete a file, ignoring errors; True if it was removed"""
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
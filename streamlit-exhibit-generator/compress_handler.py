@@ -13,16 +13,59 @@ Maintains legal document quality:
 """
 
 import os
+import time
+import signal
 import subprocess
 import logging
+import functools
+import shutil
+import tempfile
+import uuid
+import multiprocessing
+from multiprocessing.connection import wait as wait_for_connections
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict, Any, Literal
 import requests
+from requests.adapters import HTTPAdapter
+
+from compression_cache import CompressionCache
+from ghostscript_pool import GhostscriptWorkerPool, GhostscriptWorkerError, probe_ghostscript
+from page_analysis import (
+    optimize_page_colorspaces,
+    sample_pages,
+    score_pages,
+    NUMPY_AVAILABLE,
+    PYMUPDF_AVAILABLE
+)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# SmallPDF API (Tier 3)
+SMALLPDF_BASE_URL = "https://api.smallpdf.com/v2"
+SMALLPDF_RETRY_STATUS = {429, 500, 502, 503, 504}
+SMALLPDF_CONNECT_TIMEOUT = 10  # seconds
+SMALLPDF_READ_TIMEOUT = 300  # seconds, unless the compressor has a timeout
+SMALLPDF_CHUNK_SIZE = 1024 * 1024  # 1 MB download chunks
+
+# USCIS-safe PyMuPDF save settings (Tier 2, file and in-memory)
+PYMUPDF_SAVE_OPTIONS = {
+    'garbage': 4,  # Maximum garbage collection
+    'deflate': True,  # Maximum compression
+    'deflate_images': True,
+    'deflate_fonts': True,
+    'clean': True,  # Clean up redundant objects
+}
+
+# Suggested skip_threshold: pass files through when the pre-scan predicts < 5% saving
+SKIP_THRESHOLD = 0.05
+
+# Page count above which the UI's "split large PDFs" option chunks a file
+CHUNK_PAGE_THRESHOLD = 300
+
 
 class USCISPDFCompressor:
     """
@@ -63,7 +106,26 @@ class USCISPDFCompressor:
     def __init__(
         self,
         quality_preset: Literal['high', 'balanced', 'maximum'] = 'high',
-        smallpdf_api_key: Optional[str] = None
+        smallpdf_api_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[CompressionCache] = None,
+        persistent_ghostscript: bool = False,
+        ghostscript_workers: Optional[int] = None,
+        ghostscript_max_jobs: int = 50,
+        skip_threshold: Optional[float] = None,
+        race: bool = False,
+        race_deadline: float = 120.0,
+        chunk_page_threshold: Optional[int] = None,
+        chunk_pages: int = 100,
+        chunk_workers: Optional[int] = None,
+        smallpdf_base_url: str = SMALLPDF_BASE_URL,
+        smallpdf_max_retries: int = 3,
+        smallpdf_backoff: float = 1.0,
+        classify_pages: bool = False,
+        verify_fidelity: bool = False,
+        fidelity_sample_rate: float = 0.1,
+        fidelity_threshold: float = 0.92,
+        fidelity_dpi: int = 72
     ):
         """
         Initialize PDF compressor
@@ -71,10 +133,68 @@ class USCISPDFCompressor:
         Args:
             quality_preset: Quality level ('high', 'balanced', 'maximum')
             smallpdf_api_key: Optional SmallPDF API key for Tier 3 fallback
+            timeout: Optional per-file time limit in seconds for external tiers
+            cache: Optional CompressionCache to reuse earlier results
+            persistent_ghostscript: Reuse long-lived Ghostscript workers
+                instead of starting one process per file
+            ghostscript_workers: Worker count for the persistent pool
+            ghostscript_max_jobs: Restart each worker after this many jobs
+            skip_threshold: Pass files through untouched when the pre-scan
+                predicts a smaller saving than this fraction (None, the
+                default, compresses every file; see SKIP_THRESHOLD)
+            race: Run the free tiers (Ghostscript, PyMuPDF) concurrently and
+                keep the smallest valid output
+            race_deadline: Shared deadline in seconds for race mode
+            chunk_page_threshold: Split PDFs with more pages than this into
+                ranges compressed in parallel by Ghostscript (None disables;
+                CHUNK_PAGE_THRESHOLD is the UI's value)
+            chunk_pages: Pages per chunk
+            chunk_workers: Parallel chunks (default: CPU count)
+            smallpdf_base_url: SmallPDF API base URL (override for testing)
+            smallpdf_max_retries: Retries on 429/5xx and connection errors
+            smallpdf_backoff: Initial retry delay in seconds (doubles each try)
+            classify_pages: Classify pages as color/grayscale/bitonal first and
+                convert their images to the cheapest faithful colour space
+            verify_fidelity: Render sampled pages of input and output and
+                redo pages scoring below the threshold at a higher preset
+            fidelity_sample_rate: Share of pages to check (at least one)
+            fidelity_threshold: Minimum SSIM score a checked page must reach
+            fidelity_dpi: Render resolution for the check
         """
         self.quality_preset = quality_preset
         self.smallpdf_api_key = smallpdf_api_key
         self.preset_config = self.QUALITY_PRESETS[quality_preset]
+        self.timeout = timeout
+        self.cache = cache
+        self.persistent_ghostscript = persistent_ghostscript
+        self.ghostscript_workers = ghostscript_workers
+        self.ghostscript_max_jobs = ghostscript_max_jobs
+        self.skip_threshold = skip_threshold
+        self.race = race
+        self.race_deadline = race_deadline
+        self.chunk_page_threshold = chunk_page_threshold
+        self.chunk_pages = chunk_pages
+        self.chunk_workers = chunk_workers
+        self.smallpdf_base_url = smallpdf_base_url.rstrip('/')
+        self.smallpdf_max_retries = smallpdf_max_retries
+        self.smallpdf_backoff = smallpdf_backoff
+        self.classify_pages = classify_pages
+        self.verify_fidelity = verify_fidelity
+        self.fidelity_sample_rate = fidelity_sample_rate
+        self.fidelity_threshold = fidelity_threshold
+        self.fidelity_dpi = fidelity_dpi
+        self._smallpdf_session: Optional[requests.Session] = None
+        self._gs_pool: Optional[GhostscriptWorkerPool] = None
+
+    @property
+    def cache_hits(self) -> int:
+        """Number of compressions served from the cache"""
+        return self.cache.hits if self.cache else 0
+
+    @property
+    def cache_misses(self) -> int:
+        """Number of cache lookups that had to compress"""
+        return self.cache.misses if self.cache else 0
 
     def compress(
         self,
@@ -95,7 +215,10 @@ class USCISPDFCompressor:
             - original_size: int
             - compressed_size: int
             - reduction_percent: float
-            - method: str ('ghostscript', 'pymupdf', 'smallpdf', 'none')
+            - method: str ('ghostscript', 'pymupdf', 'smallpdf', 'skipped', 'none')
+            - predicted_ratio / actual_ratio: float (when the pre-scan ran)
+            - page_classification: dict (when classify_pages is enabled)
+            - fidelity: dict (when verify_fidelity is enabled)
         """
         if not output_path:
             output_path = self._get_temp_path(input_path)
@@ -103,6 +226,224 @@ class USCISPDFCompressor:
         logger.info(f"Compressing: {input_path}")
         logger.info(f"Quality preset: {self.preset_config['name']}")
 
+        # Reuse an earlier result for identical input + settings
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.make_key(
+                input_path,
+                self.quality_preset,
+                {
+                    **self.preset_config,
+                    'classify_pages': self.classify_pages,
+                    'fidelity': self._fidelity_settings(),
+                    'race_deadline': self.race_deadline if self.race else None
+                },
+                self._backend_version()
+            )
+            cached = self.cache.get(cache_key, output_path)
+            if cached:
+                logger.info(f"✓ Cache hit ({cached['method']}): {input_path}")
+                return cached
+
+        # Skip files where compression would save almost nothing
+        analysis = None
+        if self.skip_threshold is not None:
+            analysis = analyze_compressibility(input_path)
+
+        if analysis and analysis['predicted_reduction'] < self.skip_threshold:
+            logger.info(
+                f"↷ Skipping compression: predicted "
+                f"{analysis['predicted_reduction'] * 100:.1f}% reduction"
+            )
+            original_size = os.path.getsize(input_path)
+            return {
+                'success': True,
+                'output_path': input_path,
+                'original_size': original_size,
+                'compressed_size': original_size,
+                'reduction_percent': 0.0,
+                'method': 'skipped',
+                'quality_preset': self.quality_preset,
+                'predicted_ratio': round(1 - analysis['predicted_reduction'], 4),
+                'actual_ratio': 1.0,
+                'analysis': analysis
+            }
+
+        # Store each page's images in the cheapest faithful colour space
+        classification = None
+        source_path = input_path
+        if self.classify_pages:
+            prepared_path = f"{output_path}.classified.tmp"
+            classification = optimize_page_colorspaces(input_path, prepared_path)
+            if classification:
+                source_path = prepared_path
+                logger.info(
+                    f"Classified {len(classification['pages'])} pages in "
+                    f"{classification['classification_seconds']:.2f}s"
+                )
+
+        try:
+            result = self._compress_tiers(source_path, output_path)
+        finally:
+            if source_path != input_path:
+                _remove_quietly(source_path)
+
+        if not result['success']:
+            if source_path != input_path:
+                # The prepared copy is gone - point back at the caller's file
+                result.update(self._original_result(input_path, result.get('error', '')))
+            return result
+
+        if source_path != input_path:
+            # Report against the caller's file, not the prepared copy
+            original_size = os.path.getsize(input_path)
+            result['original_size'] = original_size
+            result['reduction_percent'] = round(
+                (1 - result['compressed_size'] / original_size) * 100, 2
+            )
+        if classification:
+            result['page_classification'] = classification
+
+        if self._fidelity_settings():
+            result['fidelity'] = self._verify_fidelity(input_path, result)
+
+        self._finish_result(result, analysis, cache_key)
+        return result
+
+    def _fidelity_settings(self) -> Optional[Dict[str, Any]]:
+        """Fidelity check parameters, or None when the check is off"""
+        if not self.verify_fidelity:
+            return None
+        return {
+            'sample_rate': self.fidelity_sample_rate,
+            'threshold': self.fidelity_threshold,
+            'dpi': self.fidelity_dpi
+        }
+
+    def _verify_fidelity(self, input_path: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Compare sampled pages of input and output; redo failing pages
+
+        Pages scoring below fidelity_threshold are compressed again at each
+        higher preset in turn (e.g. maximum -> balanced -> high). A page that
+        fails at every preset keeps its original content. Replacement pages
+        are spliced into result['output_path'] and the sizes updated.
+        """
+        if not (NUMPY_AVAILABLE and PYMUPDF_AVAILABLE):
+            return {'error': 'NumPy and PyMuPDF are required for the fidelity check'}
+
+        start = time.perf_counter()
+        output_path = result['output_path']
+        page_count = count_pdf_pages(input_path)
+
+        if count_pdf_pages(output_path) != page_count:
+            return {'error': 'Compressed output has a different page count'}
+
+        sampled = sample_pages(page_count, self.fidelity_sample_rate)
+        scores = score_pages(input_path, output_path, sampled, self.fidelity_dpi)
+        failing = [page for page, score in scores.items() if score < self.fidelity_threshold]
+
+        replaced: Dict[int, str] = {}
+        if failing:
+            logger.info(
+                f"Fidelity check: {len(failing)} of {len(sampled)} sampled pages "
+                f"below {self.fidelity_threshold}"
+            )
+            replaced = self._fidelity_fallback(input_path, output_path, failing)
+
+            compressed_size = os.path.getsize(output_path)
+            result['compressed_size'] = compressed_size
+            result['reduction_percent'] = round(
+                (1 - compressed_size / result['original_size']) * 100, 2
+            )
+
+        return {
+            'sampled_pages': sampled,
+            'scores': scores,
+            'min_score': min(scores.values()) if scores else None,
+            'threshold': self.fidelity_threshold,
+            'replaced_pages': replaced,
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+
+    def _fidelity_fallback(
+        self,
+        input_path: str,
+        output_path: str,
+        failing: list[int]
+    ) -> Dict[int, str]:
+        """Recompress failing pages at higher presets and splice them in"""
+        import fitz  # PyMuPDF
+
+        work_dir = tempfile.mkdtemp(prefix='fidelity_')
+        higher = PRESET_ORDER[:PRESET_ORDER.index(self.quality_preset)][::-1]
+        sources: Dict[int, tuple] = {}  # page -> (path, page index, preset)
+
+        try:
+            remaining = list(failing)
+            for preset in higher:
+                if not remaining:
+                    break
+
+                subset_path = os.path.join(work_dir, f'{preset}_input.pdf')
+                subset_out = os.path.join(work_dir, f'{preset}_output.pdf')
+                with fitz.open(input_path) as src, fitz.open() as subset:
+                    for page in remaining:
+                        subset.insert_pdf(src, from_page=page - 1, to_page=page - 1)
+                    subset.save(subset_path)
+
+                compressor = USCISPDFCompressor(
+                    quality_preset=preset,
+                    timeout=self.timeout,
+                    skip_threshold=None,
+                    chunk_page_threshold=None
+                )
+                attempt = compressor.compress(subset_path, subset_out)
+                compressor.close()
+                if not attempt['success']:
+                    continue
+
+                scores = score_pages(
+                    subset_path, subset_out,
+                    list(range(1, len(remaining) + 1)), self.fidelity_dpi
+                )
+                still_failing = []
+                for index, page in enumerate(remaining):
+                    if scores[index + 1] >= self.fidelity_threshold:
+                        sources[page] = (subset_out, index, preset)
+                    else:
+                        still_failing.append(page)
+                remaining = still_failing
+
+            for page in remaining:
+                sources[page] = (input_path, page - 1, 'original')
+
+            spliced_path = os.path.join(work_dir, 'spliced.pdf')
+            _splice_pages(output_path, sources, spliced_path)
+            os.replace(spliced_path, output_path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        for page, (_, _, preset) in sorted(sources.items()):
+            logger.info(f"  Page {page} replaced with {preset} version")
+
+        return {page: preset for page, (_, _, preset) in sorted(sources.items())}
+
+    def _compress_tiers(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """Run race mode or the tier fallback chain on one file"""
+        if self.race:
+            result = self._compress_race(input_path, output_path)
+            if result['success'] or not self.smallpdf_api_key:
+                return result
+            # Neither free tier beat the original - try the paid tier
+            try:
+                result = self._compress_smallpdf(input_path, output_path)
+                if result['success'] and result['compressed_size'] < result['original_size']:
+                    return result
+            except Exception as e:
+                logger.warning(f"✗ smallpdf compression failed: {e}")
+            return self._original_result(input_path, 'No compression tier produced a smaller file')
+
         # Try compression methods in order of preference
         methods = [
             ('ghostscript', self._compress_ghostscript),
@@ -131,6 +472,25 @@ class USCISPDFCompressor:
 
         # All methods failed - return original file
         logger.warning("All compression methods failed - using original file")
+        return self._original_result(input_path, 'All compression methods failed')
+
+    def _finish_result(
+        self,
+        result: Dict[str, Any],
+        analysis: Optional[Dict[str, Any]],
+        cache_key: Optional[str]
+    ) -> None:
+        """Attach pre-scan ratios to a successful result and cache it"""
+        if analysis:
+            result['predicted_ratio'] = round(1 - analysis['predicted_reduction'], 4)
+            result['actual_ratio'] = round(
+                result['compressed_size'] / result['original_size'], 4
+            ) if result['original_size'] else 1.0
+        if cache_key:
+            self.cache.put(cache_key, result['output_path'], result)
+
+    def _original_result(self, input_path: str, error: str) -> Dict[str, Any]:
+        """Result dict pointing at the untouched original file"""
         original_size = os.path.getsize(input_path)
 
         return {
@@ -140,41 +500,172 @@ class USCISPDFCompressor:
             'compressed_size': original_size,
             'reduction_percent': 0.0,
             'method': 'none',
-            'error': 'All compression methods failed'
+            'error': error
         }
 
-    def _compress_ghostscript(
+    def _compress_race(
         self,
         input_path: str,
         output_path: str
+    ) -> Dict[str, Any]:
+        """
+        Race mode: run Ghostscript and PyMuPDF concurrently, keep the smaller
+
+        Both tiers share one deadline. PyMuPDF is not thread-safe and cannot
+        be interrupted mid-save, so it runs in its own process, which is
+        killed if it misses the deadline; Ghostscript runs here and its
+        process is killed the same way. Outputs that are not smaller than the
+        original, or that lose pages, are rejected, so the result is never
+        larger than the input. Ghostscript does not split large files here,
+        so one kill stops it.
+        """
+        original_size = os.path.getsize(input_path)
+        original_pages = _count_pages_pypdf2(input_path)
+        deadline = time.monotonic() + self.race_deadline
+        temp_paths = {name: f"{output_path}.{name}.tmp" for name in ('ghostscript', 'pymupdf')}
+
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=_race_pymupdf_worker,
+            args=(sender, input_path, temp_paths['pymupdf'], self.quality_preset),
+            daemon=True
+        )
+        process.start()
+        sender.close()
+
+        outcomes: Dict[str, Any] = {}  # name -> (result, elapsed) or error message
+        try:
+            start = time.perf_counter()
+            try:
+                result = self._compress_ghostscript(
+                    input_path, temp_paths['ghostscript'],
+                    timeout=max(deadline - time.monotonic(), 0.1),
+                    allow_chunking=False
+                )
+                outcomes['ghostscript'] = (result, time.perf_counter() - start)
+            except Exception as e:
+                outcomes['ghostscript'] = str(e)
+
+            if receiver.poll(max(deadline - time.monotonic(), 0)):
+                try:
+                    _, payload = receiver.recv()  # ('ok', (result, elapsed)) or ('error', message)
+                except EOFError:
+                    process.join()
+                    payload = f"worker exited with code {process.exitcode}"
+                outcomes['pymupdf'] = payload
+        finally:
+            if process.is_alive() and 'pymupdf' not in outcomes:
+                process.kill()
+            process.join()
+            receiver.close()
+
+        tier_timings: Dict[str, Optional[float]] = {}
+        candidates = []
+
+        for name, path in temp_paths.items():
+            if name not in outcomes:
+                tier_timings[name] = None
+                logger.warning(f"✗ {name} missed the {self.race_deadline:.0f}s race deadline")
+                continue
+            if isinstance(outcomes[name], str):
+                tier_timings[name] = None
+                logger.warning(f"✗ {name} compression failed: {outcomes[name]}")
+                continue
+
+            result, elapsed = outcomes[name]
+            tier_timings[name] = round(elapsed, 3)
+            size = result['compressed_size']
+            if (
+                result['success']
+                and 0 < size < original_size
+                and _count_pages_pypdf2(path) == original_pages
+            ):
+                candidates.append((size, name, result))
+            else:
+                logger.info(f"✗ {name} output rejected ({size} bytes vs {original_size})")
+
+        winner = min(candidates, key=lambda c: c[0]) if candidates else None
+
+        for name, path in temp_paths.items():
+            if not winner or name != winner[1]:
+                _remove_quietly(path)
+
+        if not winner:
+            result = self._original_result(input_path, 'No compression tier produced a smaller file')
+            result['race'] = True
+            result['tier_timings'] = tier_timings
+            return result
+
+        size, name, result = winner
+        os.replace(temp_paths[name], output_path)
+        logger.info(f"✓ Race won by {name}: {result['reduction_percent']:.1f}% reduction")
+
+        result['output_path'] = output_path
+        result['race'] = True
+        result['tier_timings'] = tier_timings
+        return result
+
+    def _compress_ghostscript(
+        self,
+        input_path: str,
+        output_path: str,
+        timeout: Optional[float] = None,
+        allow_chunking: bool = True
     ) -> Dict[str, Any]:
         """
         Tier 1: Ghostscript compression (best compression ratio)
+        Large PDFs are split into page ranges compressed in parallel
         """
+        timeout = timeout if timeout is not None else self.timeout
+
         # Check if Ghostscript is available
         if not self._check_ghostscript():
             raise Exception("Ghostscript not available")
 
-        config = self.preset_config
+        original_size = os.path.getsize(input_path)
+        chunk_info = {}
+
+        if allow_chunking and self.chunk_page_threshold is not None:
+            page_count = count_pdf_pages(input_path)
+            if page_count > self.chunk_page_threshold:
+                chunk_info = self._ghostscript_chunked(
+                    input_path, output_path, page_count, timeout
+                )
+
+        if not chunk_info:
+            self._run_ghostscript(input_path, output_path, timeout)
+
+        compressed_size = os.path.getsize(output_path)
+        reduction = (1 - compressed_size / original_size) * 100
+
+        return {
+            'success': True,
+            'output_path': output_path,
+            'original_size': original_size,
+            'compressed_size': compressed_size,
+            'reduction_percent': round(reduction, 2),
+            'method': 'ghostscript',
+            'quality_preset': self.quality_preset,
+            **chunk_info
+        }
+
+    def _run_ghostscript(
+        self,
+        input_path: str,
+        output_path: str,
+        timeout: Optional[float]
+    ) -> None:
+        """Run one Ghostscript job (persistent worker or one-shot process)"""
+        pool = self._ghostscript_pool()
+        if pool and pool.accepts(input_path, output_path):
+            # Persistent worker with identical settings
+            pool.run(input_path, output_path, timeout=timeout)
+            return
 
         # Build Ghostscript command with USCIS-optimized settings
         cmd = [
             'gs',
-            '-sDEVICE=pdfwrite',
-            '-dCompatibilityLevel=1.4',
-            f'-dPDFSETTINGS={config["ghostscript_settings"]}',
-            f'-dColorImageResolution={config["color_dpi"]}',
-            f'-dGrayImageResolution={config["gray_dpi"]}',
-            f'-dMonoImageResolution={config["mono_dpi"]}',
-            '-dColorImageDownsampleType=/Bicubic',
-            '-dGrayImageDownsampleType=/Bicubic',
-            '-dDownsampleColorImages=true',
-            '-dDownsampleGrayImages=true',
-            '-dDownsampleMonoImages=false',  # Don't downsample text
-            '-dCompressPages=true',
-            '-dOptimize=true',
-            '-dEmbedAllFonts=true',  # Always embed fonts
-            '-dSubsetFonts=true',
+            *self._ghostscript_settings(),
             '-dNOPAUSE',
             '-dQUIET',
             '-dBATCH',
@@ -182,27 +673,96 @@ class USCISPDFCompressor:
             input_path
         ]
 
-        original_size = os.path.getsize(input_path)
-
         # Run Ghostscript
-        result = subprocess.run(
+        subprocess.run(
             cmd,
             check=True,
             capture_output=True,
-            text=True
+            text=True,
+            timeout=timeout
         )
 
-        compressed_size = os.path.getsize(output_path)
-        reduction = (1 - compressed_size / original_size) * 100
+    def _ghostscript_chunked(
+        self,
+        input_path: str,
+        output_path: str,
+        page_count: int,
+        timeout: Optional[float]
+    ) -> Dict[str, Any]:
+        """
+        Split a large PDF into page ranges, compress them in parallel and
+        reassemble with the original outline, links, page labels and metadata
+
+        The timeout covers the whole file: each chunk gets what is left of it.
+
+        Returns:
+            Chunk details for the result dict, or {} if PyMuPDF is unavailable
+        """
+        try:
+            import fitz  # PyMuPDF
+        except ImportError:
+            return {}
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        work_dir = tempfile.mkdtemp(prefix='gs_chunks_')
+        ranges = [
+            (start, min(start + self.chunk_pages, page_count) - 1)
+            for start in range(0, page_count, self.chunk_pages)
+        ]
+
+        try:
+            with fitz.open(input_path) as src:
+                # Split (links are restored from the source after reassembly)
+                chunk_paths = []
+                for i, (first, last) in enumerate(ranges):
+                    chunk_in = os.path.join(work_dir, f"chunk_{i}.pdf")
+                    with fitz.open() as part:
+                        part.insert_pdf(src, from_page=first, to_page=last, links=False)
+                        part.save(chunk_in, garbage=1)
+                    chunk_paths.append((chunk_in, os.path.join(work_dir, f"chunk_{i}_out.pdf")))
+
+                def compress_chunk(paths):
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise Exception(f"Chunked compression timed out after {timeout}s")
+                    start = time.perf_counter()
+                    self._run_ghostscript(paths[0], paths[1], remaining)
+                    return time.perf_counter() - start
+
+                # Ghostscript runs out of process, so threads give real parallelism
+                workers = min(self.chunk_workers or os.cpu_count() or 1, len(chunk_paths))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    chunk_timings = list(executor.map(compress_chunk, chunk_paths))
+
+                # Reassemble
+                with fitz.open() as out:
+                    for _, chunk_out in chunk_paths:
+                        with fitz.open(chunk_out) as part:
+                            out.insert_pdf(part, links=False)
+
+                    if out.page_count != page_count:
+                        raise Exception(
+                            f"Chunked compression lost pages ({out.page_count}/{page_count})"
+                        )
+
+                    _restore_document_structure(src, out)
+                    # Fonts and images repeated in every chunk are merged back into one
+                    out.save(output_path, garbage=4, deflate=True)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        logger.info(
+            f"Compressed {page_count} pages in {len(ranges)} chunks "
+            f"({max(chunk_timings):.1f}s slowest chunk)"
+        )
 
         return {
-            'success': True,
-            'output_path': output_path,
-            'original_size': original_size,
-            'compressed_size': compressed_size,
-            'reduction_percent': round(reduction, 2),
-            'method': 'ghostscript',
-            'quality_preset': self.quality_preset
+            'chunked': True,
+            'chunks': len(ranges),
+            'chunk_pages': self.chunk_pages,
+            'chunk_timings': [round(t, 3) for t in chunk_timings]
         }
 
     def _compress_pymupdf(
@@ -218,20 +778,9 @@ class USCISPDFCompressor:
         except ImportError:
             raise Exception("PyMuPDF not installed (pip install PyMuPDF)")
 
-        config = self.preset_config
         doc = fitz.open(input_path)
-
-        # USCIS-safe compression settings
-        doc.save(
-            output_path,
-            garbage=4,  # Maximum garbage collection
-            deflate=True,  # Maximum compression
-            deflate_images=True,
-            deflate_fonts=True,
-            image_quality=config['jpeg_quality'],  # Maintain quality
-            clean=True,  # Clean up redundant objects
-            linear=True,  # Optimize for web viewing
-        )
+        self._pymupdf_rewrite_images(doc)
+        doc.save(output_path, **PYMUPDF_SAVE_OPTIONS)
 
         original_size = os.path.getsize(input_path)
         compressed_size = os.path.getsize(output_path)
@@ -249,6 +798,150 @@ class USCISPDFCompressor:
             'quality_preset': self.quality_preset
         }
 
+    def _pymupdf_rewrite_images(self, doc) -> None:
+        """Re-encode images at the preset's DPI and JPEG quality (PyMuPDF >= 1.26)"""
+        if not hasattr(doc, 'rewrite_images'):
+            return
+
+        config = self.preset_config
+        doc.rewrite_images(
+            dpi_threshold=config['color_dpi'] + 50,
+            dpi_target=config['color_dpi'],
+            quality=config['jpeg_quality'],  # Maintain quality
+            bitonal=False  # Leave scanned text alone
+        )
+
+    def compress_bytes(
+        self,
+        source,
+        destination=None,
+        tiers: Optional[list[str]] = None,
+        chain: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Compress a PDF held in memory without touching the filesystem
+
+        Ghostscript is fed through stdin/stdout pipes and PyMuPDF through
+        memory streams, so tiers can be chained on the bytes directly.
+        Results are cached by content when a CompressionCache is set.
+
+        Args:
+            source: PDF as bytes or a binary file-like object
+            destination: Optional binary file-like object for the output
+            tiers: Tier names in order (default: ['ghostscript', 'pymupdf'])
+            chain: Apply every tier in sequence instead of first success
+
+        Returns:
+            Dictionary like compress(), without output_path and with:
+            - data: compressed bytes (only when no destination is given)
+            - method: tier name, or 'a+b' for chained tiers
+        """
+        data = bytes(source) if isinstance(source, (bytes, bytearray, memoryview)) else source.read()
+        original_size = len(data)
+
+        tier_funcs = {
+            'ghostscript': self._ghostscript_bytes,
+            'pymupdf': self._pymupdf_bytes,
+        }
+        tiers = tiers or ['ghostscript', 'pymupdf']
+
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.make_key(
+                data,
+                self.quality_preset,
+                {**self.preset_config, 'in_memory': {'tiers': tiers, 'chain': chain}},
+                self._backend_version()
+            )
+            cached = self.cache.get_bytes(cache_key)
+            if cached:
+                logger.info(f"✓ Cache hit ({cached['method']}): in-memory PDF")
+                if destination is not None:
+                    destination.write(cached.pop('data'))
+                return cached
+
+        output = data
+        applied = []
+
+        for name in tiers:
+            try:
+                logger.info(f"Attempting in-memory compression with: {name}")
+                output = tier_funcs[name](output)
+                applied.append(name)
+            except Exception as e:
+                logger.warning(f"✗ {name} in-memory compression failed: {e}")
+                continue
+
+            if not chain:
+                break
+
+        if not applied:
+            result = {
+                'success': False,
+                'original_size': original_size,
+                'compressed_size': original_size,
+                'reduction_percent': 0.0,
+                'method': 'none',
+                'error': 'All compression methods failed'
+            }
+        else:
+            result = {
+                'success': True,
+                'original_size': original_size,
+                'compressed_size': len(output),
+                'reduction_percent': round((1 - len(output) / original_size) * 100, 2),
+                'method': '+'.join(applied),
+                'quality_preset': self.quality_preset
+            }
+            if cache_key:
+                self.cache.put_bytes(cache_key, output, result)
+
+        if destination is not None:
+            destination.write(output)
+        else:
+            result['data'] = output
+
+        return result
+
+    def _ghostscript_bytes(self, data: bytes) -> bytes:
+        """Ghostscript tier over pipes (PDF on stdin, PDF on stdout)"""
+        if not self._check_ghostscript():
+            raise Exception("Ghostscript not available")
+
+        cmd = [
+            'gs',
+            *self._ghostscript_settings(),
+            '-dNOPAUSE',
+            '-dQUIET',
+            '-dBATCH',
+            '-sstdout=%stderr',  # Keep interpreter messages out of the PDF
+            '-sOutputFile=-',
+            '-'
+        ]
+
+        result = subprocess.run(
+            cmd,
+            input=data,
+            check=True,
+            capture_output=True,
+            timeout=self.timeout
+        )
+
+        if not result.stdout.startswith(b'%PDF'):
+            raise Exception("Ghostscript produced no PDF output")
+        return result.stdout
+
+    def _pymupdf_bytes(self, data: bytes) -> bytes:
+        """PyMuPDF tier over memory streams"""
+        try:
+            import fitz  # PyMuPDF
+        except ImportError:
+            raise Exception("PyMuPDF not installed (pip install PyMuPDF)")
+
+        with fitz.open(stream=data, filetype='pdf') as doc:
+            self._pymupdf_rewrite_images(doc)
+            return doc.tobytes(**PYMUPDF_SAVE_OPTIONS)
+
     def _compress_smallpdf(
         self,
         input_path: str,
@@ -261,20 +954,16 @@ class USCISPDFCompressor:
         if not self.smallpdf_api_key:
             raise Exception("SmallPDF API key not provided")
 
-        base_url = "https://api.smallpdf.com/v2"
-        headers = {"Authorization": f"Bearer {self.smallpdf_api_key}"}
-
+        base_url = self.smallpdf_base_url
         original_size = os.path.getsize(input_path)
 
-        # Step 1: Upload file to SmallPDF
-        with open(input_path, 'rb') as f:
-            upload_response = requests.post(
-                f"{base_url}/files",
-                headers=headers,
-                files={"file": f}
-            )
-            upload_response.raise_for_status()
-            file_id = upload_response.json()["id"]
+        # Step 1: Upload file to SmallPDF (streamed from disk)
+        upload_response = self._smallpdf_request(
+            'POST',
+            f"{base_url}/files",
+            upload_path=input_path
+        )
+        file_id = upload_response.json()["id"]
 
         # Step 2: Compress with recommended quality (best for legal docs)
         compress_data = {
@@ -282,22 +971,22 @@ class USCISPDFCompressor:
             "compression_level": "recommended"  # Maintains readability
         }
 
-        compress_response = requests.post(
+        compress_response = self._smallpdf_request(
+            'POST',
             f"{base_url}/compress",
-            headers=headers,
             json=compress_data
         )
-        compress_response.raise_for_status()
 
-        # Step 3: Download compressed file
+        # Step 3: Download compressed file in chunks straight to disk
         download_url = compress_response.json()["files"][0]["url"]
-        compressed_content = requests.get(download_url).content
+        compressed_size = 0
 
-        # Save compressed file
-        with open(output_path, 'wb') as f:
-            f.write(compressed_content)
+        with self._smallpdf_request('GET', download_url, stream=True) as response:
+            with open(output_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=SMALLPDF_CHUNK_SIZE):
+                    f.write(chunk)
+                    compressed_size += len(chunk)
 
-        compressed_size = len(compressed_content)
         reduction = (1 - compressed_size / original_size) * 100
 
         return {
@@ -310,17 +999,161 @@ class USCISPDFCompressor:
             'quality_preset': 'recommended'
         }
 
+    def _smallpdf_request(
+        self,
+        method: str,
+        url: str,
+        upload_path: Optional[str] = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        Send a SmallPDF API request on the pooled session
+
+        Retries connection errors, 429 and 5xx responses with exponential
+        backoff (honouring Retry-After). Uploads are re-streamed from disk on
+        every attempt. The API key is only sent to the API base URL, never to
+        the storage host behind an API-returned download URL.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            upload_path: Optional file sent as a streamed multipart upload
+            **kwargs: Passed to requests.Session.request
+
+        Returns:
+            Successful response (caller closes it when stream=True)
+        """
+        session = self._get_smallpdf_session()
+        read_timeout = self.timeout or SMALLPDF_READ_TIMEOUT
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if url.startswith(self.smallpdf_base_url + '/'):
+            headers['Authorization'] = f"Bearer {self.smallpdf_api_key}"
+
+        for attempt in range(self.smallpdf_max_retries + 1):
+            body = None
+            request_kwargs = dict(kwargs, headers=dict(headers))
+            if upload_path:
+                body = _MultipartFileUpload(upload_path)
+                request_kwargs['data'] = body
+                request_kwargs['headers']['Content-Type'] = body.content_type
+
+            response = None
+            error = None
+            try:
+                response = session.request(
+                    method,
+                    url,
+                    timeout=(SMALLPDF_CONNECT_TIMEOUT, read_timeout),
+                    **request_kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            finally:
+                if body:
+                    body.close()
+
+            if response is not None and response.status_code not in SMALLPDF_RETRY_STATUS:
+                response.raise_for_status()
+                return response
+
+            if attempt == self.smallpdf_max_retries:
+                if response is not None:
+                    response.raise_for_status()
+                raise error
+
+            delay = self.smallpdf_backoff * (2 ** attempt)
+            if response is not None:
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                response.close()
+
+            logger.warning(
+                f"SmallPDF {method} {url} failed "
+                f"({response.status_code if response is not None else error}), "
+                f"retrying in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+    def _get_smallpdf_session(self) -> requests.Session:
+        """Pooled HTTP session for the SmallPDF tier (credentials are per request)"""
+        if self._smallpdf_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._smallpdf_session = session
+        return self._smallpdf_session
+
+    def _ghostscript_settings(self) -> list[str]:
+        """pdfwrite arguments for the current preset (one-shot and pooled)"""
+        config = self.preset_config
+
+        return [
+            '-sDEVICE=pdfwrite',
+            '-dCompatibilityLevel=1.4',
+            f'-dPDFSETTINGS={config["ghostscript_settings"]}',
+            f'-dColorImageResolution={config["color_dpi"]}',
+            f'-dGrayImageResolution={config["gray_dpi"]}',
+            f'-dMonoImageResolution={config["mono_dpi"]}',
+            '-dColorImageDownsampleType=/Bicubic',
+            '-dGrayImageDownsampleType=/Bicubic',
+            '-dDownsampleColorImages=true',
+            '-dDownsampleGrayImages=true',
+            '-dDownsampleMonoImages=false',  # Don't downsample text
+            '-dEncodeMonoImages=true',
+            '-dMonoImageFilter=/CCITTFaxEncode',  # G4 for bitonal scans
+            '-dCompressPages=true',
+            '-dOptimize=true',
+            '-dEmbedAllFonts=true',  # Always embed fonts
+            '-dSubsetFonts=true',
+        ]
+
+    def _ghostscript_pool(self) -> Optional[GhostscriptWorkerPool]:
+        """Lazily start the persistent worker pool (None if disabled)"""
+        if not self.persistent_ghostscript:
+            return None
+
+        if self._gs_pool is None:
+            try:
+                self._gs_pool = GhostscriptWorkerPool(
+                    self._ghostscript_settings(),
+                    size=self.ghostscript_workers,
+                    max_jobs_per_worker=self.ghostscript_max_jobs
+                )
+            except GhostscriptWorkerError as e:
+                logger.warning(f"Persistent Ghostscript unavailable: {e}")
+                self.persistent_ghostscript = False
+                return None
+
+        return self._gs_pool
+
+    def close(self) -> None:
+        """Stop persistent Ghostscript workers and the SmallPDF session, if any"""
+        if self._gs_pool:
+            self._gs_pool.close()
+            self._gs_pool = None
+        if self._smallpdf_session:
+            self._smallpdf_session.close()
+            self._smallpdf_session = None
+
     def _check_ghostscript(self) -> bool:
-        """Check if Ghostscript is installed and available"""
+        """Check if Ghostscript is installed and available (probed once)"""
+        return _ghostscript_version() is not None
+
+    def _backend_version(self) -> str:
+        """Version string of the compression backends (part of the cache key)"""
         try:
-            result = subprocess.run(
-                ['gs', '--version'],
-                capture_output=True,
-                check=True
-            )
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
+            import fitz  # PyMuPDF
+            pymupdf_version = fitz.VersionBind
+        except ImportError:
+            pymupdf_version = 'none'
+
+        parts = [f"gs={_ghostscript_version() or 'none'}", f"pymupdf={pymupdf_version}"]
+        if self.smallpdf_api_key:
+            parts.append('smallpdf')
+        return ';'.join(parts)
 
     def _get_temp_path(self, input_path: str) -> str:
         """Generate temporary output path"""
@@ -337,11 +1170,344 @@ class USCISPDFCompressor:
         return f"{bytes_size:.1f} TB"
 
 
+@functools.lru_cache(maxsize=1)
+def _ghostscript_version() -> Optional[str]:
+    """Installed Ghostscript version (probed once per process), None if missing"""
+    return probe_ghostscript()
+
+
+# Expected fraction of stream bytes a compression pass can save, by filter.
+# Already-compressed images only gain from downsampling; raw streams gain most.
+IMAGE_SAVING_BY_FILTER = {
+    '/DCTDecode': 0.5,
+    '/JPXDecode': 0.4,
+    '/JBIG2Decode': 0.05,
+    '/CCITTFaxDecode': 0.05,
+    '/FlateDecode': 0.6,
+    '/LZWDecode': 0.6,
+    '/RunLengthDecode': 0.7,
+    None: 0.8,
+}
+STREAM_SAVING_UNFILTERED = 0.6
+STREAM_SAVING_FILTERED = 0.05
+
+
+def analyze_compressibility(pdf_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Fast pre-scan estimating how much a compression pass can save
+
+    Reads object dictionaries only (no content decoding or rendering) and
+    weighs image and other stream bytes by their existing filters.
+
+    Args:
+        pdf_path: Path to PDF file
+
+    Returns:
+        Dictionary with total_bytes, image_bytes, image_ratio, page_count,
+        filters (image filter -> count) and predicted_reduction (0-1),
+        or None if PyMuPDF is unavailable or the file cannot be parsed
+    """
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        return None
+
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception:
+        return None
+
+    try:
+        total_bytes = os.path.getsize(pdf_path)
+        image_bytes = 0
+        predicted_saving = 0.0
+        filters: Dict[str, int] = {}
+
+        for xref in range(1, doc.xref_length()):
+            if not doc.xref_is_stream(xref):
+                continue
+
+            length = _xref_stream_length(doc, xref)
+            filter_name = _xref_primary_filter(doc, xref)
+
+            if doc.xref_get_key(xref, 'Subtype')[1] == '/Image':
+                image_bytes += length
+                filters[filter_name or 'none'] = filters.get(filter_name or 'none', 0) + 1
+                predicted_saving += length * IMAGE_SAVING_BY_FILTER.get(filter_name, 0.3)
+            elif filter_name is None:
+                predicted_saving += length * STREAM_SAVING_UNFILTERED
+            else:
+                predicted_saving += length * STREAM_SAVING_FILTERED
+
+        return {
+            'total_bytes': total_bytes,
+            'image_bytes': image_bytes,
+            'image_ratio': round(image_bytes / total_bytes, 4) if total_bytes else 0.0,
+            'page_count': doc.page_count,
+            'filters': filters,
+            'predicted_reduction': round(min(predicted_saving / total_bytes, 1.0), 4) if total_bytes else 0.0
+        }
+    except Exception:
+        return None
+    finally:
+        doc.close()
+
+
+def _xref_stream_length(doc, xref: int) -> int:
+    """Encoded stream length from /Length, reading the stream only if indirect"""
+    kind, value = doc.xref_get_key(xref, 'Length')
+    if kind == 'int':
+        return int(value)
+    if kind == 'xref':
+        return int(doc.xref_object(int(value.split()[0])).strip() or 0)
+    return len(doc.xref_stream_raw(xref) or b'')
+
+
+def _xref_primary_filter(doc, xref: int) -> Optional[str]:
+    """Last (innermost) filter applied to a stream, e.g. '/DCTDecode'"""
+    kind, value = doc.xref_get_key(xref, 'Filter')
+    if kind == 'name':
+        return value
+    if kind == 'array':
+        names = value.strip('[]').replace('/', ' /').split()
+        return names[-1] if names else None
+    return None
+
+
+class _MultipartFileUpload:
+    """
+    multipart/form-data body that streams a file from disk
+
+    Exposes read() and __len__() so requests sends it with a Content-Length
+    header without loading the file into memory.
+    """
+
+    def __init__(self, path: str, field: str = 'file'):
+        self.boundary = uuid.uuid4().hex
+        filename = os.path.basename(path).replace('"', '%22')
+        head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n'
+        ).encode()
+        tail = f'\r\n--{self.boundary}--\r\n'.encode()
+
+        self._file = open(path, 'rb')
+        self._length = len(head) + os.path.getsize(path) + len(tail)
+        self._parts = [BytesIO(head), self._file, BytesIO(tail)]
+
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            data = self._parts[0].read(size)
+            if not data:
+                self._parts.pop(0)
+                continue
+            chunks.append(data)
+            if size > 0:
+                size -= len(data)
+        return b''.join(chunks)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _restore_document_structure(src, out) -> None:
+    """Copy outline, links, page labels and metadata from src onto out (PyMuPDF)"""
+    toc = src.get_toc(simple=False)
+    if toc:
+        try:
+            out.set_toc(toc)
+        except Exception:
+            out.set_toc(src.get_toc(simple=True))
+
+    labels = src.get_page_labels()
+    if labels:
+        out.set_page_labels(labels)
+
+    for page_number, page in enumerate(src):
+        target = out[page_number]
+        for link in page.get_links():
+            try:
+                target.insert_link(link)
+            except Exception as e:
+                logger.warning(f"Could not restore link on page {page_number + 1}: {e}")
+
+    if src.metadata:
+        out.set_metadata({k: v for k, v in src.metadata.items() if v})
+
+
+def _splice_pages(base_path: str, sources: Dict[int, tuple], output_path: str) -> None:
+    """
+    Write base_path with some pages taken from other PDFs
+
+    Args:
+        base_path: PDF providing every page not listed in sources
+        sources: 1-based page number -> (pdf path, 0-based page index, label)
+        output_path: Where to write the spliced PDF
+    """
+    import fitz  # PyMuPDF
+
+    base = fitz.open(base_path)
+    donors = {path: fitz.open(path) for path, _, _ in sources.values()}
+    out = fitz.open()
+
+    try:
+        for number in range(1, base.page_count + 1):
+            if number in sources:
+                path, index, _ = sources[number]
+                out.insert_pdf(donors[path], from_page=index, to_page=index, links=False)
+            else:
+                out.insert_pdf(base, from_page=number - 1, to_page=number - 1, links=False)
+
+        _restore_document_structure(base, out)
+        out.save(output_path, garbage=3, deflate=True)
+    finally:
+        out.close()
+        for donor in donors.values():
+            donor.close()
+        base.close()
+
+
+def _remove_quietly(path: str) -> None:
+    """Delete a file if it exists"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _count_pages_pypdf2(pdf_path: str) -> int:
+    """Count pages with PyPDF2 only (safe while PyMuPDF runs elsewhere)"""
+    try:
+        from PyPDF2 import PdfReader
+        return len(PdfReader(pdf_path).pages)
+    except Exception:
+        return 0
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Count pages in a PDF (PyMuPDF first, PyPDF2 fallback), 0 if unreadable"""
+    try:
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+    except Exception:
+        pass
+
+    try:
+        from PyPDF2 import PdfReader
+        return len(PdfReader(pdf_path).pages)
+    except Exception:
+        return 0
+
+
+def _compress_batch_item(
+    file_path: str,
+    quality_preset: str,
+    smallpdf_api_key: Optional[str],
+    timeout: Optional[float],
+    cache_dir: Optional[str]
+) -> Dict[str, Any]:
+    """Compress a single file inside a worker process (must be picklable)"""
+    cache = CompressionCache(cache_dir) if cache_dir else None
+    compressor = USCISPDFCompressor(
+        quality_preset, smallpdf_api_key, timeout=timeout, cache=cache
+    )
+    result = compressor.compress(file_path)
+    result['pages'] = count_pdf_pages(file_path)
+    return result
+
+
+def _race_pymupdf_worker(connection, input_path: str, output_path: str, quality_preset: str) -> None:
+    """Race mode's PyMuPDF tier in its own process: send back (result, elapsed)"""
+    try:
+        start = time.perf_counter()
+        result = USCISPDFCompressor(quality_preset)._compress_pymupdf(input_path, output_path)
+        connection.send(('ok', (result, time.perf_counter() - start)))
+    except Exception as e:
+        connection.send(('error', str(e)))
+    finally:
+        connection.close()
+
+
+def _compress_batch_worker(connection, *args) -> None:
+    """Worker process entry point: compress one file and send back the result"""
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()  # Own process group, so a timeout also stops Ghostscript children
+    try:
+        connection.send(('ok', _compress_batch_item(*args)))
+    except Exception as e:
+        connection.send(('error', str(e)))
+    finally:
+        connection.close()
+
+
+def _kill_batch_worker(process) -> None:
+    """Kill a worker process and everything it started"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, OSError):
+        process.kill()
+    process.join()
+
+
+def _failed_batch_result(file_path: str, error: str) -> Dict[str, Any]:
+    """Result dict for a file whose worker crashed or timed out"""
+    original_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+    return {
+        'success': False,
+        'output_path': file_path,
+        'original_size': original_size,
+        'compressed_size': original_size,
+        'reduction_percent': 0.0,
+        'method': 'none',
+        'error': error,
+        'pages': 0
+    }
+
+
+def batch_throughput(results: list[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    """
+    Aggregate throughput for a batch run
+
+    Args:
+        results: Compression results (with 'original_size' and 'pages')
+        wall_time: Elapsed wall-clock seconds for the whole batch
+
+    Returns:
+        Dictionary with files, bytes, pages, wall_time, mb_per_sec, pages_per_sec
+    """
+    total_bytes = sum(r.get('original_size', 0) for r in results)
+    total_pages = sum(r.get('pages', 0) for r in results)
+
+    return {
+        'files': len(results),
+        'bytes': total_bytes,
+        'pages': total_pages,
+        'wall_time': round(wall_time, 3),
+        'mb_per_sec': round(total_bytes / (1024 * 1024) / wall_time, 3) if wall_time > 0 else 0.0,
+        'pages_per_sec': round(total_pages / wall_time, 3) if wall_time > 0 else 0.0
+    }
+
+
 def compress_pdf_batch(
     file_paths: list[str],
     quality_preset: str = 'high',
     smallpdf_api_key: Optional[str] = None,
-    on_progress: Optional[callable] = None
+    on_progress: Optional[callable] = None,
+    parallel: bool = False,
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    on_stats: Optional[callable] = None,
+    cache_dir: Optional[str] = None
 ) -> list[Dict[str, Any]]:
     """
     Batch compress multiple PDF files
@@ -351,23 +1517,259 @@ def compress_pdf_batch(
         quality_preset: Quality level
         smallpdf_api_key: Optional SmallPDF API key
         on_progress: Optional callback(current, total, filename)
+        parallel: Compress files concurrently in a process pool
+        max_workers: Worker processes for parallel mode (default: CPU count)
+        timeout: Optional per-file time limit in seconds (in parallel mode
+            it covers every tier and the worker is killed when it expires)
+        on_stats: Optional callback(stats) with aggregate throughput
+            (MB/s and pages/s, see batch_throughput)
+        cache_dir: Optional CompressionCache directory shared by all workers
 
     Returns:
-        List of compression results for each file
+        List of compression results for each file, in input order
     """
-    compressor = USCISPDFCompressor(quality_preset, smallpdf_api_key)
-    results = []
+    start = time.perf_counter()
 
-    for i, file_path in enumerate(file_paths):
+    if parallel and len(file_paths) > 1:
+        results = _compress_batch_parallel(
+            file_paths, quality_preset, smallpdf_api_key,
+            on_progress, max_workers, timeout, cache_dir
+        )
+    else:
+        cache = CompressionCache(cache_dir) if cache_dir else None
+        compressor = USCISPDFCompressor(
+            quality_preset, smallpdf_api_key, timeout=timeout, cache=cache
+        )
+        results = []
+
+        for i, file_path in enumerate(file_paths):
+            if on_progress:
+                on_progress(i + 1, len(file_paths), os.path.basename(file_path))
+
+            result = compressor.compress(file_path)
+            result['pages'] = count_pdf_pages(file_path)
+            results.append(result)
+
+    stats = batch_throughput(results, time.perf_counter() - start)
+    logger.info(
+        f"Batch throughput: {stats['files']} files, "
+        f"{stats['mb_per_sec']:.2f} MB/s, {stats['pages_per_sec']:.1f} pages/s"
+    )
+    if on_stats:
+        on_stats(stats)
+
+    return results
+
+
+def _compress_batch_parallel(
+    file_paths: list[str],
+    quality_preset: str,
+    smallpdf_api_key: Optional[str],
+    on_progress: Optional[callable],
+    max_workers: Optional[int],
+    timeout: Optional[float],
+    cache_dir: Optional[str]
+) -> list[Dict[str, Any]]:
+    """
+    Process-per-file implementation of compress_pdf_batch (results in input order)
+
+    The timeout covers the whole file, every tier included, and starts when
+    its worker starts. A worker past its deadline is killed with its process
+    group and the file gets a failed result with timed_out set.
+    """
+    workers = min(max_workers or os.cpu_count() or 1, len(file_paths))
+    results: list[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+    pending = list(range(len(file_paths)))
+    running: Dict[Any, tuple] = {}  # connection -> (index, process, deadline)
+    completed = 0
+
+    def finish(i: int, result: Dict[str, Any]) -> None:
+        nonlocal completed
+        results[i] = result
+        completed += 1
         if on_progress:
-            on_progress(i + 1, len(file_paths), os.path.basename(file_path))
+            on_progress(completed, len(file_paths), os.path.basename(file_paths[i]))
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                i = pending.pop(0)
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(
+                    target=_compress_batch_worker,
+                    args=(sender, file_paths[i], quality_preset, smallpdf_api_key, timeout, cache_dir),
+                    daemon=True
+                )
+                process.start()
+                sender.close()
+                running[receiver] = (i, process, time.monotonic() + timeout if timeout else None)
+
+            deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+            wait_time = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+
+            for connection in wait_for_connections(list(running), timeout=wait_time):
+                i, process, _ = running.pop(connection)
+                try:
+                    status, payload = connection.recv()
+                except EOFError:
+                    process.join()
+                    status, payload = 'error', f"worker exited with code {process.exitcode}"
+                connection.close()
+                process.join()
 
-        result = compressor.compress(file_path)
-        results.append(result)
+                if status == 'ok':
+                    finish(i, payload)
+                else:
+                    logger.warning(f"✗ Worker failed for {file_paths[i]}: {payload}")
+                    finish(i, _failed_batch_result(file_paths[i], payload))
+
+            now = time.monotonic()
+            for connection, (i, process, deadline) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    del running[connection]
+                    _kill_batch_worker(process)
+                    connection.close()
+                    logger.warning(f"✗ Compression of {file_paths[i]} timed out after {timeout}s")
+                    result = _failed_batch_result(file_paths[i], f"Timed out after {timeout}s")
+                    result['timed_out'] = True
+                    finish(i, result)
+    finally:
+        for connection, (_, process, _) in running.items():
+            _kill_batch_worker(process)
+            connection.close()
 
     return results
 
 
+PRESET_ORDER = ['high', 'balanced', 'maximum']
+
+
+def compress_to_budget(
+    file_paths: list[str],
+    budget_bytes: int,
+    smallpdf_api_key: Optional[str] = None,
+    overhead_bytes: int = 0,
+    cache_dir: Optional[str] = None,
+    on_progress: Optional[callable] = None
+) -> Dict[str, Any]:
+    """
+    Compress a package so the merged result fits a byte budget
+
+    Every exhibit starts at the highest quality preset. While the package is
+    over budget, the currently largest exhibit that can still be downgraded
+    moves to the next preset in PRESET_ORDER. Each (exhibit, preset) attempt
+    is compressed at most once and reused for later decisions.
+
+    Args:
+        file_paths: List of PDF file paths, in package order
+        budget_bytes: Size cap for the final merged package
+        smallpdf_api_key: Optional SmallPDF API key
+        overhead_bytes: Expected size added by TOC, stamps and merging
+        cache_dir: Optional CompressionCache directory (reuse across runs)
+        on_progress: Optional callback(attempts, filename, preset)
+
+    Returns:
+        Dictionary with:
+        - fits: bool
+        - total_size: int (estimated package size incl. overhead)
+        - results: chosen compression result per file, in input order,
+          each with 'selected_preset' and its output at
+          compressed_<name> beside the source (other attempts are deleted)
+        - downgraded: list of exhibits moved below the top preset
+        - attempts: number of compressions actually run
+    """
+    cache = CompressionCache(cache_dir) if cache_dir else None
+    compressors = {
+        preset: USCISPDFCompressor(preset, smallpdf_api_key, cache=cache)
+        for preset in PRESET_ORDER
+    }
+    attempts: Dict[tuple, Dict[str, Any]] = {}
+
+    # Attempts live in a scratch directory; only the chosen ones leave it
+    work_dir = tempfile.TemporaryDirectory(prefix='budget_')
+
+    def attempt(index: int, preset: str) -> Dict[str, Any]:
+        key = (index, preset)
+        if key not in attempts:
+            path = Path(file_paths[index])
+            if on_progress:
+                on_progress(len(attempts) + 1, path.name, preset)
+            output_path = os.path.join(work_dir.name, f"{index}_{preset}_{path.name}")
+            result = compressors[preset].compress(str(path), output_path)
+            result['selected_preset'] = preset
+            attempts[key] = result
+        return attempts[key]
+
+    def discard(result: Dict[str, Any]) -> None:
+        # Free a superseded attempt now rather than at cleanup
+        if os.path.dirname(result['output_path']) == work_dir.name:
+            _remove_quietly(result['output_path'])
+
+    try:
+        levels = [0] * len(file_paths)
+        chosen = [attempt(i, PRESET_ORDER[0]) for i in range(len(file_paths))]
+        total = sum(r['compressed_size'] for r in chosen) + overhead_bytes
+
+        while total > budget_bytes:
+            candidates = [i for i in range(len(file_paths)) if levels[i] < len(PRESET_ORDER) - 1]
+            if not candidates:
+                break
+
+            # Biggest offender first
+            index = max(candidates, key=lambda i: chosen[i]['compressed_size'])
+            levels[index] += 1
+            result = attempt(index, PRESET_ORDER[levels[index]])
+
+            # Keep the higher-quality artifact unless the downgrade actually helps
+            if result['compressed_size'] < chosen[index]['compressed_size']:
+                total -= chosen[index]['compressed_size'] - result['compressed_size']
+                discard(chosen[index])
+                chosen[index] = result
+            else:
+                discard(result)
+
+        # Move each chosen attempt next to its source (as compress() names it)
+        for i, result in enumerate(chosen):
+            if os.path.dirname(result['output_path']) == work_dir.name:
+                path = Path(file_paths[i])
+                final_path = str(path.parent / f"compressed_{path.name}")
+                shutil.move(result['output_path'], final_path)
+                result['output_path'] = final_path
+    finally:
+        work_dir.cleanup()
+        for compressor in compressors.values():
+            compressor.close()
+
+    downgraded = [
+        {
+            'index': i,
+            'file': os.path.basename(file_paths[i]),
+            'preset': chosen[i]['selected_preset'],
+            'size_at_top_preset': attempts[(i, PRESET_ORDER[0])]['compressed_size'],
+            'size': chosen[i]['compressed_size']
+        }
+        for i in range(len(file_paths))
+        if chosen[i]['selected_preset'] != PRESET_ORDER[0]
+    ]
+
+    fits = total <= budget_bytes
+    logger.info(
+        f"Target size {USCISPDFCompressor.format_bytes(budget_bytes)}: "
+        f"{'fits' if fits else 'over budget'} at "
+        f"{USCISPDFCompressor.format_bytes(total)}, "
+        f"{len(downgraded)} exhibits downgraded, {len(attempts)} compressions"
+    )
+
+    return {
+        'fits': fits,
+        'budget_bytes': budget_bytes,
+        'total_size': total,
+        'results': chosen,
+        'downgraded': downgraded,
+        'attempts': len(attempts)
+    }
+
+
 # Example usage
 if __name__ == "__main__":
     # Example: Compress a single file
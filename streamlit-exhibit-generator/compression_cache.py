@@ -0,0 +1,321 @@
+"""
+Compression Cache - Content-addressed on-disk cache for compressed PDFs
+Lets repeated package builds reuse earlier compression results
+
+Entries are keyed by:
+- SHA-256 of the input bytes
+- Quality preset name and its QUALITY_PRESETS settings
+- Compression backend version (Ghostscript / PyMuPDF)
+
+Each entry is a compressed PDF plus the JSON result dict that produced it.
+Total size is capped; least recently used entries are evicted first.
+
+The temp directory can be RAM-backed (e.g. Cloud Run), so the default cap
+is a small share of the container's memory limit. EXHIBIT_CACHE_DIR and
+EXHIBIT_CACHE_MAX_MB override the location and the cap (e.g. to point the
+cache at a disk-backed volume).
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Optional, Dict, Any, Union
+
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "exhibit_compression_cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # Upper bound for the default cap
+MEMORY_LIMIT_FRACTION = 0.1  # Default cap as a share of the memory limit
+
+CACHE_DIR_ENV = 'EXHIBIT_CACHE_DIR'
+CACHE_MAX_MB_ENV = 'EXHIBIT_CACHE_MAX_MB'
+
+CGROUP_MEMORY_LIMITS = (
+    '/sys/fs/cgroup/memory.max',  # cgroup v2
+    '/sys/fs/cgroup/memory/memory.limit_in_bytes',  # cgroup v1
+)
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def memory_limit_bytes() -> Optional[int]:
+    """Container memory limit from the cgroup, or None when unlimited/unknown"""
+    for path in CGROUP_MEMORY_LIMITS:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:  # v1 reports "unlimited" as a huge number
+            return int(value)
+        return None
+    return None
+
+
+def default_max_bytes() -> int:
+    """Cache cap: EXHIBIT_CACHE_MAX_MB, else a share of the memory limit (at most 256 MB)"""
+    configured = os.environ.get(CACHE_MAX_MB_ENV)
+    if configured:
+        return int(float(configured) * 1024 * 1024)
+
+    limit = memory_limit_bytes()
+    if limit:
+        return min(DEFAULT_MAX_BYTES, int(limit * MEMORY_LIMIT_FRACTION))
+    return DEFAULT_MAX_BYTES
+
+
+class CompressionCache:
+    """Persistent LRU cache of compression artifacts"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None
+    ):
+        """
+        Initialize compression cache
+
+        Args:
+            cache_dir: Directory holding cached artifacts (default:
+                EXHIBIT_CACHE_DIR, else DEFAULT_CACHE_DIR)
+            max_bytes: Size cap for all cached PDFs, LRU eviction above it
+                (default: see default_max_bytes)
+        """
+        self.cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else default_max_bytes()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(
+        self,
+        input_path: Union[str, bytes],
+        quality_preset: str,
+        preset_config: Dict[str, Any],
+        backend_version: str
+    ) -> str:
+        """
+        Build cache key for an input file and compression configuration
+
+        Args:
+            input_path: Path to input PDF, or the PDF bytes
+            quality_preset: Preset name ('high', 'balanced', 'maximum')
+            preset_config: Settings of the preset from QUALITY_PRESETS
+            backend_version: Version string of the compression backends
+
+        Returns:
+            Hex digest identifying the cache entry
+        """
+        settings = json.dumps(
+            {
+                'preset': quality_preset,
+                'config': preset_config,
+                'backend': backend_version
+            },
+            sort_keys=True
+        )
+        digest = hashlib.sha256()
+        if isinstance(input_path, str):
+            digest.update(hash_file(input_path).encode())
+        else:
+            digest.update(hashlib.sha256(input_path).hexdigest().encode())
+        digest.update(settings.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str, output_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cache entry and copy its artifact to output_path
+
+        Args:
+            key: Cache key from make_key
+            output_path: Where to place the cached compressed PDF
+
+        Returns:
+            Stored result dict (with output_path updated) or None on miss
+        """
+        pdf_path, meta_path = self._entry_paths(key)
+
+        with self._lock:
+            if not (os.path.exists(pdf_path) and os.path.exists(meta_path)):
+                self.misses += 1
+                return None
+
+            try:
+                with open(meta_path, 'r') as f:
+                    result = json.load(f)
+                if os.path.abspath(pdf_path) != os.path.abspath(output_path):
+                    shutil.copyfile(pdf_path, output_path)
+                # Touch entry so eviction treats it as recently used
+                os.utime(pdf_path, None)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+        result['output_path'] = output_path
+        result['cache_hit'] = True
+        return result
+
+    def put(self, key: str, artifact_path: str, result: Dict[str, Any]) -> None:
+        """
+        Store a compressed artifact and its result dict
+
+        Args:
+            key: Cache key from make_key
+            artifact_path: Path to the compressed PDF
+            result: Result dict returned by the compressor
+        """
+        pdf_path, meta_path = self._entry_paths(key)
+        stored = {k: v for k, v in result.items() if k not in ('output_path', 'cache_hit')}
+
+        def write_pdf(f):
+            with open(artifact_path, 'rb') as source:
+                shutil.copyfileobj(source, f)
+
+        self._store(pdf_path, meta_path, write_pdf, stored)
+
+    def get_bytes(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cache entry and read its artifact into memory
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Stored result dict with the compressed PDF under 'data', or None on miss
+        """
+        pdf_path, meta_path = self._entry_paths(key)
+
+        with self._lock:
+            try:
+                with open(meta_path, 'r') as f:
+                    result = json.load(f)
+                with open(pdf_path, 'rb') as f:
+                    result['data'] = f.read()
+                os.utime(pdf_path, None)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+        result['cache_hit'] = True
+        return result
+
+    def put_bytes(self, key: str, data: bytes, result: Dict[str, Any]) -> None:
+        """
+        Store compressed PDF bytes and their result dict
+
+        Args:
+            key: Cache key from make_key
+            data: Compressed PDF
+            result: Result dict returned by the compressor
+        """
+        pdf_path, meta_path = self._entry_paths(key)
+        stored = {k: v for k, v in result.items() if k not in ('data', 'cache_hit')}
+
+        self._store(pdf_path, meta_path, lambda f: f.write(data), stored)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current cache size"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total * 100) if total > 0 else 0.0,
+            'size_bytes': self._total_size()
+        }
+
+    def clear(self) -> None:
+        """Remove every cached entry"""
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def _store(self, pdf_path: str, meta_path: str, write_pdf, stored: Dict[str, Any]) -> None:
+        """
+        Write an entry atomically, then evict
+
+        Both files are written to unique temp files in the cache directory
+        and renamed into place, so readers never see partial entries, even
+        with several processes sharing the cache.
+        """
+        with self._lock:
+            temp_paths = []
+            try:
+                fd, temp_pdf = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+                temp_paths.append(temp_pdf)
+                with os.fdopen(fd, 'wb') as f:
+                    write_pdf(f)
+
+                fd, temp_meta = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+                temp_paths.append(temp_meta)
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(stored, f)
+
+                os.replace(temp_pdf, pdf_path)
+                os.replace(temp_meta, meta_path)
+            except OSError:
+                for path in temp_paths:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                return
+
+            self._evict()
+
+    def _entry_paths(self, key: str) -> tuple:
+        """Artifact and metadata paths for a key"""
+        base = os.path.join(self.cache_dir, key)
+        return base + '.pdf', base + '.json'
+
+    def _total_size(self) -> int:
+        """Total bytes of cached PDFs"""
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pdf'):
+                try:
+                    total += os.path.getsize(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        return total
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until under max_bytes (lock held)"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.pdf'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for stale in (path, path[:-len('.pdf')] + '.json'):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
@@ -0,0 +1,243 @@
+"""
+Exhibit Metadata - Per-exhibit facts gathered once per source PDF
+Page counts, page sizes, byte size, content hash, encryption and text layer
+
+The index is filled the first time a stage parses an exhibit. Later
+consumers (page counts, TOC, Results tab) read from it instead of opening
+the PDF again.
+
+Encrypted (password-protected) and corrupt files do not raise: they get a
+record with readable=False and no pages, so later stages can skip them or
+fall back to the original file.
+"""
+
+import os
+import hashlib
+import threading
+from io import BytesIO
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+from PyPDF2.errors import DependencyError, PyPdfError
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+
+@dataclass
+class ExhibitMetadata:
+    """Facts about one source PDF"""
+    path: str
+    page_count: int
+    byte_size: int
+    sha256: str
+    encrypted: bool
+    has_text_layer: bool  # Any page uses fonts (born-digital or OCR'd)
+    page_sizes: List[Tuple[float, float]] = field(default_factory=list)  # Displayed width x height, points
+    readable: bool = True  # False when the file could not be opened (password or corrupt)
+
+
+def _displayed_size(width: float, height: float, rotation: int) -> Tuple[float, float]:
+    if rotation % 180:
+        width, height = height, width
+    return round(width, 2), round(height, 2)
+
+
+def metadata_from_document(path: str, doc, data: bytes) -> ExhibitMetadata:
+    """
+    Build metadata from an open PyMuPDF document and its bytes
+
+    Args:
+        path: Source path the document was read from
+        doc: Open PyMuPDF document
+        data: The bytes the document was opened from
+    """
+    page_sizes = []
+    has_text_layer = False
+    for page in doc:
+        page_sizes.append((round(page.rect.width, 2), round(page.rect.height, 2)))  # Already rotated
+        if not has_text_layer and page.get_fonts():
+            has_text_layer = True
+
+    return ExhibitMetadata(
+        path=path,
+        page_count=doc.page_count,
+        byte_size=len(data),
+        sha256=hashlib.sha256(data).hexdigest(),
+        encrypted=bool(doc.metadata.get('encryption') or doc.needs_pass),
+        has_text_layer=has_text_layer,
+        page_sizes=page_sizes
+    )
+
+
+def unreadable_metadata(path: str, data: bytes, encrypted: bool) -> ExhibitMetadata:
+    """Record for a file that cannot be opened (needs a password or is corrupt)"""
+    return ExhibitMetadata(
+        path=path,
+        page_count=0,
+        byte_size=len(data),
+        sha256=hashlib.sha256(data).hexdigest(),
+        encrypted=encrypted,
+        has_text_layer=False,
+        readable=False
+    )
+
+
+def open_exhibit(path: str, data: bytes, pymupdf: bool = PYMUPDF_AVAILABLE) -> Tuple[ExhibitMetadata, Any]:
+    """
+    Parse an exhibit once: its metadata plus the open document
+
+    Args:
+        path: Source path the bytes were read from
+        data: The file's bytes
+        pymupdf: Open with PyMuPDF (fitz.Document) rather than PyPDF2 (PdfReader)
+
+    Returns:
+        (metadata, document); document is None when the file needs a
+        password or cannot be parsed (metadata.readable is then False).
+        The caller closes a PyMuPDF document.
+    """
+    name = os.path.basename(path)
+
+    if pymupdf:
+        try:
+            doc = fitz.open(stream=data, filetype='pdf')
+        except (fitz.FileDataError, RuntimeError, ValueError) as e:
+            print(f"✗ Cannot open {name}: {e}")
+            return unreadable_metadata(path, data, encrypted=False), None
+
+        if doc.needs_pass:
+            doc.close()
+            print(f"✗ {name} is password-protected")
+            return unreadable_metadata(path, data, encrypted=True), None
+
+        try:
+            return metadata_from_document(path, doc, data), doc
+        except (RuntimeError, ValueError) as e:
+            encrypted = doc.is_encrypted
+            doc.close()
+            print(f"✗ Cannot read {name}: {e}")
+            return unreadable_metadata(path, data, encrypted=encrypted), None
+
+    try:
+        reader = PdfReader(BytesIO(data))
+        if reader.is_encrypted:
+            try:
+                decrypted = reader.decrypt('')
+            except (DependencyError, NotImplementedError):
+                decrypted = False
+            if not decrypted:
+                print(f"✗ {name} is password-protected")
+                return unreadable_metadata(path, data, encrypted=True), None
+        return metadata_from_reader(path, reader, data), reader
+    except DependencyError:
+        # Decrypting (even with an empty password) needs a crypto library
+        print(f"✗ {name} is encrypted")
+        return unreadable_metadata(path, data, encrypted=True), None
+    except (PyPdfError, ValueError, KeyError, NotImplementedError) as e:
+        print(f"✗ Cannot open {name}: {e}")
+        return unreadable_metadata(path, data, encrypted=False), None
+
+
+def metadata_from_reader(path: str, reader: PdfReader, data: bytes) -> ExhibitMetadata:
+    """
+    Build metadata from a PyPDF2 reader and its bytes
+
+    Args:
+        path: Source path the reader was opened on
+        reader: PyPDF2 reader
+        data: The bytes the reader was opened from
+    """
+    page_sizes = []
+    has_text_layer = False
+    for page in reader.pages:
+        box = page.mediabox
+        page_sizes.append(_displayed_size(float(box.width), float(box.height), page.rotation or 0))
+        if not has_text_layer:
+            resources = page['/Resources'] if '/Resources' in page else {}
+            has_text_layer = '/Font' in resources
+
+    return ExhibitMetadata(
+        path=path,
+        page_count=len(reader.pages),
+        byte_size=len(data),
+        sha256=hashlib.sha256(data).hexdigest(),
+        encrypted=reader.is_encrypted,
+        has_text_layer=has_text_layer,
+        page_sizes=page_sizes
+    )
+
+
+class MetadataIndex:
+    """Metadata for every exhibit of a run, keyed by resolved path"""
+
+    def __init__(self):
+        """Initialize an empty index"""
+        self._entries: Dict[str, ExhibitMetadata] = {}
+        self._hashes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.parses = 0  # Times a PDF was opened just to fill the index
+
+    def get(self, path: str) -> Optional[ExhibitMetadata]:
+        """Indexed metadata for a path, or None"""
+        with self._lock:
+            return self._entries.get(os.path.realpath(path))
+
+    def record(self, metadata: ExhibitMetadata) -> ExhibitMetadata:
+        """Add metadata gathered by a stage's own parse (first one wins)"""
+        with self._lock:
+            return self._entries.setdefault(os.path.realpath(metadata.path), metadata)
+
+    def content_hash(self, path: str) -> str:
+        """
+        SHA-256 of a file's bytes, without parsing it as a PDF
+
+        Args:
+            path: Source file
+
+        Returns:
+            Hex digest (from the index when the file is already recorded)
+        """
+        metadata = self.get(path)
+        if metadata:
+            return metadata.sha256
+
+        key = os.path.realpath(path)
+        with self._lock:
+            if key in self._hashes:
+                return self._hashes[key]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+
+        with self._lock:
+            return self._hashes.setdefault(key, digest.hexdigest())
+
+    def ensure(self, path: str) -> ExhibitMetadata:
+        """
+        Indexed metadata for a path, parsing the file only if no stage has yet
+
+        Args:
+            path: Source PDF
+
+        Returns:
+            ExhibitMetadata (readable=False for encrypted or corrupt files)
+        """
+        metadata = self.get(path)
+        if metadata:
+            return metadata
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        self.parses += 1
+        metadata, document = open_exhibit(path, data)
+        if PYMUPDF_AVAILABLE and document is not None:
+            document.close()
+        return self.record(metadata)
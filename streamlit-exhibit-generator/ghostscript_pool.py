@@ -0,0 +1,282 @@
+"""
+Ghostscript Worker Pool - Long-lived Ghostscript processes for PDF compression
+Avoids paying interpreter startup and font initialisation for every exhibit
+
+Each worker is a single `gs` process started with the same pdfwrite settings
+as the one-shot command line. Jobs are sent over stdin as PostScript:
+
+    << /OutputFile (out.pdf) >> setpagedevice (in.pdf) run
+
+After each job the output is switched to a per-worker scratch file, which
+closes the pdfwrite device and finalizes the job's PDF. Workers are restarted
+after a fixed number of jobs or whenever a process dies.
+"""
+
+import os
+import queue
+import select
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+JOB_DONE_MARKER = b'__GS_JOB_DONE__'
+JOB_FAILED_MARKER = b'__GS_JOB_FAILED__'
+
+
+class GhostscriptWorkerError(Exception):
+    """Raised when a worker job fails or the worker process dies"""
+
+
+def probe_ghostscript() -> Optional[str]:
+    """Return installed Ghostscript version, or None if unavailable"""
+    try:
+        result = subprocess.run(
+            ['gs', '--version'],
+            capture_output=True,
+            check=True,
+            text=True
+        )
+        return result.stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def _ps_string(value: str) -> str:
+    """Quote a path as a PostScript string literal"""
+    escaped = value.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return f'({escaped})'
+
+
+class GhostscriptWorker:
+    """A single persistent Ghostscript process"""
+
+    def __init__(self, settings: List[str], allowed_dirs: List[str]):
+        """
+        Start a Ghostscript worker
+
+        Args:
+            settings: pdfwrite arguments shared with the one-shot command
+            allowed_dirs: Directories the worker may read from and write to
+        """
+        self.jobs = 0
+        self.work_dir = tempfile.mkdtemp(prefix='gs_worker_')
+        self.idle_output = os.path.join(self.work_dir, 'idle.pdf')
+
+        permits = []
+        for directory in allowed_dirs + [self.work_dir]:
+            permits.append(f'--permit-file-read={directory}{os.sep}')
+            permits.append(f'--permit-file-write={directory}{os.sep}')
+
+        cmd = [
+            'gs',
+            *settings,
+            *permits,
+            '-dNOPAUSE',
+            '-dQUIET',
+            '-dNOPROMPT',
+            f'-sOutputFile={self.idle_output}',
+            '-'
+        ]
+
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    @property
+    def alive(self) -> bool:
+        """Whether the Ghostscript process is still running"""
+        return self.process.poll() is None
+
+    def run(self, input_path: str, output_path: str, timeout: Optional[float] = None) -> None:
+        """
+        Compress one file
+
+        Args:
+            input_path: Path to input PDF
+            output_path: Path for compressed output
+            timeout: Optional time limit in seconds
+
+        Raises:
+            GhostscriptWorkerError: If the job fails, times out or the worker dies
+        """
+        if not self.alive:
+            raise GhostscriptWorkerError("Ghostscript worker is not running")
+
+        job = (
+            f"{{ << /OutputFile {_ps_string(output_path)} >> setpagedevice "
+            f"{_ps_string(input_path)} run }} stopped "
+            f"{{ (\\n{JOB_FAILED_MARKER.decode()}\\n) }} "
+            f"{{ (\\n{JOB_DONE_MARKER.decode()}\\n) }} ifelse "
+            f"<< /OutputFile {_ps_string(self.idle_output)} >> setpagedevice "
+            f"print flush\n"
+        )
+
+        try:
+            self.process.stdin.write(job.encode())
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise GhostscriptWorkerError(f"Ghostscript worker crashed: {e}")
+
+        self.jobs += 1
+        marker = self._wait_for_marker(timeout)
+
+        if marker == JOB_FAILED_MARKER:
+            raise GhostscriptWorkerError(f"Ghostscript could not process {input_path}")
+
+    def close(self) -> None:
+        """Stop the process and remove its scratch directory"""
+        if self.alive:
+            try:
+                self.process.stdin.write(b'quit\n')
+                self.process.stdin.flush()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _wait_for_marker(self, timeout: Optional[float]) -> bytes:
+        """
+        Read stdout until a job marker appears
+
+        The timeout is one deadline for the whole job, so a job that keeps
+        printing cannot outlive it; the process is killed when it passes
+        (the pool then starts a fresh worker).
+        """
+        buffer = b''
+        stdout = self.process.stdout
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        while True:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            ready = []
+            if remaining is None or remaining > 0:
+                ready, _, _ = select.select([stdout], [], [], remaining)
+            if not ready:
+                self.process.kill()
+                self.process.wait()
+                raise GhostscriptWorkerError("Ghostscript job timed out")
+
+            chunk = os.read(stdout.fileno(), 4096)
+            if not chunk:
+                raise GhostscriptWorkerError("Ghostscript worker exited unexpectedly")
+
+            buffer += chunk
+            for marker in (JOB_DONE_MARKER, JOB_FAILED_MARKER):
+                if marker in buffer:
+                    return marker
+
+            # Only the tail can still contain a partial marker
+            buffer = buffer[-len(JOB_FAILED_MARKER):]
+
+
+class GhostscriptWorkerPool:
+    """Pool of persistent Ghostscript workers sharing one settings list"""
+
+    def __init__(
+        self,
+        settings: List[str],
+        size: Optional[int] = None,
+        max_jobs_per_worker: int = 50,
+        allowed_dirs: Optional[List[str]] = None
+    ):
+        """
+        Initialize worker pool (workers start lazily)
+
+        Args:
+            settings: pdfwrite arguments, identical to the one-shot command
+            size: Maximum concurrent workers (default: CPU count)
+            max_jobs_per_worker: Restart a worker after this many jobs
+            allowed_dirs: Directories jobs may read/write (default: system temp)
+        """
+        self.version = probe_ghostscript()
+        if not self.version:
+            raise GhostscriptWorkerError("Ghostscript not available")
+
+        self.settings = list(settings)
+        self.size = size or os.cpu_count() or 1
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.allowed_dirs = [
+            os.path.realpath(d) for d in (allowed_dirs or [tempfile.gettempdir()])
+        ]
+
+        self._idle: queue.Queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._workers: List[GhostscriptWorker] = []
+        self.restarts = 0
+
+    def accepts(self, *paths: str) -> bool:
+        """Whether all paths are inside the directories workers may access"""
+        for path in paths:
+            real = os.path.realpath(path)
+            if not any(real.startswith(d + os.sep) for d in self.allowed_dirs):
+                return False
+        return True
+
+    def run(self, input_path: str, output_path: str, timeout: Optional[float] = None) -> None:
+        """
+        Compress one file on an idle worker
+
+        Args:
+            input_path: Path to input PDF
+            output_path: Path for compressed output
+            timeout: Optional time limit in seconds
+
+        Raises:
+            GhostscriptWorkerError: If the job fails (the worker is replaced)
+        """
+        with self._slots:
+            worker = self._checkout()
+            try:
+                worker.run(input_path, output_path, timeout)
+            except GhostscriptWorkerError:
+                self._retire(worker)
+                raise
+
+            if worker.jobs >= self.max_jobs_per_worker:
+                self._retire(worker)
+            else:
+                self._idle.put(worker)
+
+    def close(self) -> None:
+        """Stop all workers"""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+
+    def _checkout(self) -> GhostscriptWorker:
+        """Get an idle live worker or start a new one"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                worker = GhostscriptWorker(self.settings, self.allowed_dirs)
+                with self._lock:
+                    self._workers.append(worker)
+                return worker
+
+            if worker.alive:
+                return worker
+            self._retire(worker)
+
+    def _retire(self, worker: GhostscriptWorker) -> None:
+        """Stop a worker and forget it"""
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            self.restarts += 1
+        logger.info(f"Restarting Ghostscript worker after {worker.jobs} jobs")
+        worker.close()
@@ -0,0 +1,89 @@
+"""
+Memory Monitor - Peak resident memory of a pipeline run
+Samples this process's RSS on a background thread
+
+Usage:
+    with RSSMonitor() as monitor:
+        build_package(...)
+    print(monitor.stats())
+
+RSS is read from /proc/self/statm on Linux. Elsewhere the process's
+lifetime peak from getrusage is used, which can only grow between runs.
+External tools (Ghostscript) run in child processes and are not included.
+"""
+
+import os
+import sys
+import threading
+import resource
+from typing import Dict, Any
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # macOS reports bytes
+
+
+class RSSMonitor:
+    """Track peak RSS between start() and stop()"""
+
+    def __init__(self, interval: float = 0.05):
+        """
+        Initialize monitor
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.baseline_bytes = 0
+        self.peak_bytes = 0
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'RSSMonitor':
+        """Record the baseline and begin sampling"""
+        self.baseline_bytes = self.peak_bytes = current_rss()
+        self.samples = 1
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop sampling and return stats()"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._record()
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        """Baseline, peak and peak increase in bytes"""
+        return {
+            'baseline_rss_bytes': self.baseline_bytes,
+            'peak_rss_bytes': self.peak_bytes,
+            'peak_increase_bytes': self.peak_bytes - self.baseline_bytes,
+            'samples': self.samples
+        }
+
+    def _record(self) -> None:
+        self.peak_bytes = max(self.peak_bytes, current_rss())
+        self.samples += 1
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._record()
+
+    def __enter__(self) -> 'RSSMonitor':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,376 @@
+"""
+Page Analysis - Per-page color / grayscale / bitonal classification
+Lets the compressor store each page's images in the cheapest faithful colour space
+
+Pages are rendered at low resolution and classified with vectorized NumPy
+statistics:
+- color: a meaningful share of pixels has visible chroma
+- grayscale: no chroma, but real mid-tones (photos, shaded scans)
+- bitonal: almost every pixel is near pure black or pure white
+
+The page class caps how far an image may be reduced, but every image is also
+classified from its own decoded pixels before it is touched: a small seal or
+photo barely moves its page's statistics, so the image check is stricter (a
+trace of colour keeps it in colour, any photo-like tile keeps its gray levels).
+An image is converted to DeviceGray, or thresholded to 1-bit so Ghostscript can
+encode it with CCITT G4, only when both its page and its own pixels allow it.
+
+The same low-resolution renders back the fidelity check: sampled pages of the
+input and the compressed output are compared with a windowed SSIM score.
+"""
+
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+
+CLASSIFY_DPI = 24
+CHROMA_THRESHOLD = 24  # Max-min channel spread that counts as coloured
+COLOR_PIXEL_FRACTION = 0.01  # Share of coloured pixels that makes a page color
+BITONAL_MARGIN = 48  # Distance from 0/255 that still counts as black/white
+BITONAL_PIXEL_FRACTION = 0.97  # Share of near-black/white pixels for bitonal
+BITONAL_THRESHOLD = 128  # Gray level separating black from white
+GRAY_JPEG_QUALITY = 90
+
+IMAGE_COLOR_PIXEL_FRACTION = 0.001  # Any trace of colour keeps an image in colour
+IMAGE_TILE = 32  # Pixels per side of the tiles scanned for photo-like regions
+IMAGE_MIDTONE_TILE_FRACTION = 0.5  # Mid-tone share that marks a tile as photo/shading
+
+FIDELITY_DPI = 72
+SSIM_WINDOW = 7
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+PAGE_CLASSES = ('color', 'grayscale', 'bitonal')
+
+
+def classify_pixels(pixels: 'np.ndarray') -> Dict[str, Any]:
+    """
+    Classify an RGB (H x W x 3) or gray (H x W) uint8 array
+
+    Returns:
+        Dictionary with class, color_fraction and bitonal_fraction
+    """
+    pixels = pixels.astype(np.int16, copy=False)
+
+    if pixels.ndim == 3 and pixels.shape[2] >= 3:
+        rgb = pixels[..., :3]
+        chroma = rgb.max(axis=2) - rgb.min(axis=2)
+        color_fraction = float(np.count_nonzero(chroma > CHROMA_THRESHOLD)) / chroma.size
+        gray = rgb.mean(axis=2)
+    else:
+        color_fraction = 0.0
+        gray = pixels.reshape(pixels.shape[0], pixels.shape[1])
+
+    near_extreme = (gray <= BITONAL_MARGIN) | (gray >= 255 - BITONAL_MARGIN)
+    bitonal_fraction = float(np.count_nonzero(near_extreme)) / gray.size
+
+    if color_fraction >= COLOR_PIXEL_FRACTION:
+        page_class = 'color'
+    elif bitonal_fraction >= BITONAL_PIXEL_FRACTION:
+        page_class = 'bitonal'
+    else:
+        page_class = 'grayscale'
+
+    return {
+        'class': page_class,
+        'color_fraction': round(color_fraction, 4),
+        'bitonal_fraction': round(bitonal_fraction, 4)
+    }
+
+
+def classify_image(pixels: 'np.ndarray') -> str:
+    """
+    Classify an image's own decoded RGB or gray uint8 pixels
+
+    Stricter than page classification: the image is color if even a small
+    share of its pixels has chroma, and it is only bitonal if no tile of it
+    is dominated by mid-tones (a photo, a shaded box, a gray stamp).
+
+    Returns:
+        One of PAGE_CLASSES
+    """
+    pixels = pixels.astype(np.int16, copy=False)
+
+    if pixels.ndim == 3 and pixels.shape[2] >= 3:
+        rgb = pixels[..., :3]
+        chroma = rgb.max(axis=2) - rgb.min(axis=2)
+        if np.count_nonzero(chroma > CHROMA_THRESHOLD) >= IMAGE_COLOR_PIXEL_FRACTION * chroma.size:
+            return 'color'
+        gray = rgb.mean(axis=2)
+    else:
+        gray = pixels.reshape(pixels.shape[0], pixels.shape[1])
+
+    midtone = (gray > BITONAL_MARGIN) & (gray < 255 - BITONAL_MARGIN)
+    if np.count_nonzero(midtone) > (1 - BITONAL_PIXEL_FRACTION) * midtone.size:
+        return 'grayscale'
+
+    # Mid-tone share per tile; edge rows/columns are padded as black/white
+    tile = IMAGE_TILE
+    height = -(-midtone.shape[0] // tile) * tile
+    width = -(-midtone.shape[1] // tile) * tile
+    padded = np.zeros((height, width), dtype=bool)
+    padded[:midtone.shape[0], :midtone.shape[1]] = midtone
+    tiles = padded.reshape(height // tile, tile, width // tile, tile).mean(axis=(1, 3))
+    if tiles.max() >= IMAGE_MIDTONE_TILE_FRACTION:
+        return 'grayscale'
+
+    return 'bitonal'
+
+
+def _pixmap_array(pix) -> 'np.ndarray':
+    """View a PyMuPDF pixmap's samples as an H x W x N array"""
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+
+def classify_pages(doc, dpi: int = CLASSIFY_DPI) -> List[Dict[str, Any]]:
+    """
+    Render each page at low resolution and classify it
+
+    Args:
+        doc: Open PyMuPDF document
+        dpi: Render resolution (low is enough for colour statistics)
+
+    Returns:
+        One dict per page: page (1-based), class, color_fraction, bitonal_fraction
+    """
+    results = []
+    for page in doc:
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+        info = classify_pixels(_pixmap_array(pix))
+        info['page'] = page.number + 1
+        results.append(info)
+    return results
+
+
+def optimize_page_colorspaces(
+    input_path: str,
+    output_path: str,
+    dpi: int = CLASSIFY_DPI
+) -> Optional[Dict[str, Any]]:
+    """
+    Classify pages and rewrite their images in the cheapest faithful colour space
+
+    An image shared by several pages is only reduced as far as its most
+    colourful page allows, and never further than its own pixels allow
+    (see classify_image). Images with transparency, stencil masks and
+    images that are already 1-bit are left alone.
+
+    Args:
+        input_path: Source PDF
+        output_path: Where to write the converted PDF
+        dpi: Classification render resolution
+
+    Returns:
+        Dictionary with pages (per-page classification), images_converted
+        (class -> count), images_protected (images kept richer than their
+        page because of their own content) and seconds, or None if
+        NumPy/PyMuPDF are missing
+    """
+    if not (NUMPY_AVAILABLE and PYMUPDF_AVAILABLE):
+        return None
+
+    start = time.perf_counter()
+    doc = fitz.open(input_path)
+
+    try:
+        pages = classify_pages(doc, dpi)
+        classification_seconds = time.perf_counter() - start
+
+        # Most colourful class among the pages using each image
+        rank = {name: i for i, name in enumerate(PAGE_CLASSES)}
+        image_class: Dict[int, str] = {}
+        for page, info in zip(doc, pages):
+            for image in page.get_images(full=True):
+                xref = image[0]
+                current = image_class.get(xref, 'bitonal')
+                image_class[xref] = min(current, info['class'], key=rank.get)
+
+        converted = {'grayscale': 0, 'bitonal': 0}
+        protected = 0
+        for xref, target in image_class.items():
+            if target == 'color':
+                continue
+            allowed, changed = _convert_image(doc, xref, target)
+            if allowed is not None and allowed != target:
+                protected += 1
+            if changed:
+                converted[allowed] += 1
+
+        doc.save(output_path, garbage=1, deflate=True)
+    finally:
+        doc.close()
+
+    return {
+        'pages': pages,
+        'images_converted': converted,
+        'images_protected': protected,
+        'classification_seconds': round(classification_seconds, 3),
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+
+def _convert_image(doc, xref: int, target: str) -> Tuple[Optional[str], bool]:
+    """
+    Rewrite one image XObject as 8-bit gray or 1-bit
+
+    The page-derived target is only a ceiling: the image's own pixels are
+    classified and the more colourful of the two classes wins.
+
+    Returns:
+        (class the image was allowed, True if it was rewritten); the class is
+        None when the image was skipped without being classified
+    """
+    if doc.xref_get_key(xref, 'ImageMask')[1] == 'true':
+        return None, False
+    if doc.xref_get_key(xref, 'SMask')[0] != 'null' or doc.xref_get_key(xref, 'Mask')[0] != 'null':
+        return None, False
+    if doc.xref_get_key(xref, 'BitsPerComponent')[1] == '1':
+        return None, False
+
+    try:
+        pix = fitz.Pixmap(doc, xref)
+    except Exception:
+        return None, False
+
+    if pix.alpha:
+        return None, False
+    if pix.n == 1 and target == 'grayscale':
+        return target, False  # Already gray
+
+    if pix.colorspace and pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)  # CMYK etc.
+
+    rank = {name: i for i, name in enumerate(PAGE_CLASSES)}
+    target = min(target, classify_image(_pixmap_array(pix)), key=rank.get)
+    if target == 'color' or (pix.n == 1 and target == 'grayscale'):
+        return target, False
+
+    pixels = _pixmap_array(pix).astype(np.float32)
+    if pixels.shape[2] >= 3:
+        gray = pixels[..., 0] * 0.299 + pixels[..., 1] * 0.587 + pixels[..., 2] * 0.114
+    else:
+        gray = pixels[..., 0]
+    gray = np.clip(gray + 0.5, 0, 255).astype(np.uint8)
+
+    if target == 'bitonal':
+        # 1 = white in DeviceGray; rows are padded to whole bytes
+        bits = np.packbits(gray >= BITONAL_THRESHOLD, axis=1)
+        doc.update_stream(xref, bits.tobytes(), compress=True)
+        bpc = '1'
+    elif doc.xref_get_key(xref, 'Filter')[1] == '/DCTDecode':
+        gray_pix = fitz.Pixmap(fitz.csGRAY, pix.width, pix.height, gray.tobytes(), False)
+        doc.update_stream(xref, gray_pix.tobytes('jpeg', jpg_quality=GRAY_JPEG_QUALITY), compress=False)
+        doc.xref_set_key(xref, 'Filter', '/DCTDecode')
+        bpc = '8'
+    else:
+        doc.update_stream(xref, gray.tobytes(), compress=True)
+        bpc = '8'
+
+    doc.xref_set_key(xref, 'ColorSpace', '/DeviceGray')
+    doc.xref_set_key(xref, 'BitsPerComponent', bpc)
+    doc.xref_set_key(xref, 'DecodeParms', 'null')
+    doc.xref_set_key(xref, 'Decode', 'null')
+    return target, True
+
+
+def _box_mean(values: 'np.ndarray', window: int) -> 'np.ndarray':
+    """Mean over every window x window block, via a summed-area table"""
+    table = np.pad(values, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    sums = (
+        table[window:, window:] - table[:-window, window:]
+        - table[window:, :-window] + table[:-window, :-window]
+    )
+    return sums / (window * window)
+
+
+def ssim(first: 'np.ndarray', second: 'np.ndarray', window: int = SSIM_WINDOW) -> float:
+    """
+    Mean structural similarity of two gray uint8 images
+
+    Uses uniform windows instead of a Gaussian so every statistic is a
+    vectorized summed-area lookup. Images of slightly different size (e.g.
+    rounding of a re-written MediaBox) are compared over their common area.
+
+    Returns:
+        Score in [-1, 1]; 1.0 means identical
+    """
+    height = min(first.shape[0], second.shape[0])
+    width = min(first.shape[1], second.shape[1])
+    x = first[:height, :width].astype(np.float64)
+    y = second[:height, :width].astype(np.float64)
+
+    window = max(1, min(window, height, width))
+    mu_x = _box_mean(x, window)
+    mu_y = _box_mean(y, window)
+    var_x = _box_mean(x * x, window) - mu_x * mu_x
+    var_y = _box_mean(y * y, window) - mu_y * mu_y
+    cov = _box_mean(x * y, window) - mu_x * mu_y
+
+    numerator = (2 * mu_x * mu_y + SSIM_C1) * (2 * cov + SSIM_C2)
+    denominator = (mu_x * mu_x + mu_y * mu_y + SSIM_C1) * (var_x + var_y + SSIM_C2)
+    return float((numerator / denominator).mean())
+
+
+def sample_pages(page_count: int, sample_rate: float) -> List[int]:
+    """
+    Evenly spaced 1-based page numbers covering sample_rate of the document
+
+    Always includes the first page; at least one page is sampled.
+    """
+    if page_count <= 0:
+        return []
+    count = min(page_count, max(1, round(page_count * sample_rate)))
+    step = page_count / count
+    return sorted({int(i * step) + 1 for i in range(count)})
+
+
+def _render_gray(page, dpi: int) -> 'np.ndarray':
+    """Render a page to an H x W gray array"""
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+
+
+def score_pages(
+    original_path: str,
+    compressed_path: str,
+    pages: List[int],
+    dpi: int = FIDELITY_DPI
+) -> Dict[int, float]:
+    """
+    SSIM of selected pages between an original and a compressed PDF
+
+    Args:
+        original_path: Reference PDF
+        compressed_path: PDF to check (same page order)
+        pages: 1-based page numbers to compare
+        dpi: Render resolution
+
+    Returns:
+        Dictionary mapping page number to SSIM score
+    """
+    original = fitz.open(original_path)
+    compressed = fitz.open(compressed_path)
+
+    try:
+        return {
+            number: round(ssim(
+                _render_gray(original[number - 1], dpi),
+                _render_gray(compressed[number - 1], dpi)
+            ), 4)
+            for number in pages
+        }
+    finally:
+        original.close()
+        compressed.close()
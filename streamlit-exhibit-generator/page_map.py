@@ -0,0 +1,110 @@
+"""
+Page Map - Where every exhibit starts in the merged package
+Computed up front from per-exhibit page counts and the TOC length
+
+The TOC lists each exhibit's start page, but its own length shifts every
+offset. The map is therefore built from an estimated TOC length; the TOC
+is rendered once with those start pages, and only if it comes out a
+different length is the map rebuilt and the TOC rendered a second time.
+The merge itself runs once, with the outline taken from the map.
+
+Outline entries use the [level, title, page] form (1-based pages) shared by
+PyMuPDF's set_toc, PdfMerger and StreamingPdfWriter:
+
+    Table of Contents
+    Exhibits
+        Exhibit A: Award letter
+            (bookmarks inside the exhibit, fused pipeline only)
+        Exhibit B: ...
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+TOC_FIRST_PAGE_ROWS = 21  # Exhibit rows below the title and case info
+TOC_ROWS_PER_PAGE = 33  # Header row repeated on every page
+
+EXHIBITS_OUTLINE_TITLE = "Exhibits"
+TOC_OUTLINE_TITLE = "Table of Contents"
+
+
+def estimate_toc_pages(exhibit_count: int) -> int:
+    """
+    Estimate the TOC's page count from its number of rows
+
+    Args:
+        exhibit_count: Exhibits listed in the TOC
+
+    Returns:
+        Estimated page count (at least 1)
+    """
+    overflow = max(exhibit_count - TOC_FIRST_PAGE_ROWS, 0)
+    return 1 + math.ceil(overflow / TOC_ROWS_PER_PAGE)
+
+
+def build_page_map(exhibits: List[Dict[str, Any]], toc_pages: int = 0) -> Dict[str, Any]:
+    """
+    Lay out the package: front matter first, then exhibits in order
+
+    Args:
+        exhibits: Exhibit dicts with number, title and pages
+        toc_pages: Pages placed before the first exhibit (0 without a TOC)
+
+    Returns:
+        Dictionary with toc_pages, total_pages and exhibits (number, title,
+        pages, start_page, end_page; pages are 1-based)
+    """
+    entries = []
+    next_page = toc_pages + 1
+
+    for exhibit in exhibits:
+        pages = exhibit['pages']
+        entries.append({
+            'number': exhibit['number'],
+            'title': exhibit['title'],
+            'pages': pages,
+            'start_page': next_page,
+            'end_page': next_page + pages - 1
+        })
+        next_page += pages
+
+    return {'toc_pages': toc_pages, 'total_pages': next_page - 1, 'exhibits': entries}
+
+
+def exhibit_outline_title(entry: Dict[str, Any]) -> str:
+    return f"Exhibit {entry['number']}: {entry['title']}"
+
+
+def outline_from_page_map(
+    page_map: Dict[str, Any],
+    children: Optional[Dict[int, List[list]]] = None
+) -> List[list]:
+    """
+    Nested outline for the package described by a page map
+
+    Args:
+        page_map: Result of build_page_map()
+        children: Optional bookmarks per exhibit index ([level, title, page]
+            with levels starting at 1 and package page numbers); they are
+            nested under the exhibit's entry
+
+    Returns:
+        [level, title, page] entries
+    """
+    outline = []
+    if page_map['toc_pages']:
+        outline.append([1, TOC_OUTLINE_TITLE, 1])
+
+    exhibits = [entry for entry in page_map['exhibits'] if entry['pages']]
+    if not exhibits:
+        return outline
+
+    outline.append([1, EXHIBITS_OUTLINE_TITLE, exhibits[0]['start_page']])
+    for i, entry in enumerate(page_map['exhibits']):
+        if not entry['pages']:
+            continue
+        outline.append([2, exhibit_outline_title(entry), entry['start_page']])
+        for level, title, page in (children or {}).get(i, []):
+            outline.append([level + 2, title, page])
+
+    return outline
@@ -4,25 +4,161 @@ Handles merging, numbering, TOC generation, compression
 """
 
 import os
-from typing import List, Dict, Optional
+import re
+import time
+import json
+import shutil
+import hashlib
+from typing import List, Dict, Optional, Tuple, Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from datetime import datetime
-from PyPDF2 import PdfReader, PdfWriter, PdfMerger
+from PyPDF2 import PdfReader, PdfMerger
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib import colors
-from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak
 from io import BytesIO
 import tempfile
+from dataclasses import replace
 
 # Import compression handler
 try:
     from compress_handler import USCISPDFCompressor
+    from compression_cache import CompressionCache
     COMPRESSION_AVAILABLE = True
 except ImportError:
     COMPRESSION_AVAILABLE = False
 
+# PyMuPDF powers merge-time optimisations
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+from stamping import (
+    get_stamp_backend, stamp_with_pypdf2, stamp_document, stamp_pages,
+    package_stamps, stamp_merged_package, bates_text
+)
+from memory_monitor import RSSMonitor
+from artifact_registry import ArtifactRegistry
+from exhibit_metadata import ExhibitMetadata, MetadataIndex, open_exhibit
+from streaming_merge import streaming_merge
+from page_map import build_page_map, estimate_toc_pages, outline_from_page_map
+from volumes import VOLUME_OVERHEAD_BYTES, plan_volumes, split_oversized_exhibits
+from toc_renderer import (
+    toc_styles,
+    PagedTable,
+    PACKAGE_TOC_STYLE,
+    CASE_INFO_STYLE,
+    EXHIBIT_LIST_STYLE,
+    ARCHIVE_URL_STYLE,
+)
+
+INDIRECT_REF = re.compile(rb'(\d+) 0 R\b')
+STREAMING_MERGE_BYTES = 200 * 1024 * 1024  # Packages above this many source bytes are streamed
+TOC_MAX_RENDERS = 4  # Re-renders until the TOC's page count matches its page map
+FONT_FILE_KEYS = ('FontFile', 'FontFile2', 'FontFile3')
+
+
+def _stamp_file(
+    source,
+    output_path: str,
+    exhibit_number: str,
+    backend: str,
+    index_metadata: bool = False
+) -> Tuple[Optional[str], Optional[ExhibitMetadata]]:
+    """
+    Stamp one exhibit with the named backend, falling back to PyPDF2
+
+    Module level so it can run in worker processes (source may be a path,
+    bytes or a binary file object).
+
+    Args:
+        source: PDF to stamp
+        output_path: Where to write the stamped PDF
+        exhibit_number: Exhibit number (A, B, C, etc.)
+        backend: Stamping backend name
+        index_metadata: source is the original file's path: gather its
+            metadata from the same parse that stamps it
+
+    Returns:
+        (output_path, metadata); output_path is None when the file is
+        encrypted or unreadable, metadata is None unless requested
+    """
+    stamp = get_stamp_backend(backend)
+    metadata = None
+
+    document = None
+    if index_metadata:
+        with open(source, 'rb') as f:
+            data = f.read()
+        metadata, document = open_exhibit(source, data, pymupdf=stamp is not stamp_with_pypdf2)
+        if document is None:
+            return None, metadata
+        source = BytesIO(data)
+    elif isinstance(source, bytes):
+        source = BytesIO(source)
+
+    try:
+        stamp(document if document is not None else source, output_path, exhibit_number)
+    except Exception as e:
+        if stamp is stamp_with_pypdf2:
+            raise
+        print(f"✗ {backend} stamping failed ({e}), retrying with PyPDF2")
+        if not isinstance(source, str):
+            source.seek(0)
+        stamp_with_pypdf2(source, output_path, exhibit_number)
+    finally:
+        if document is not None and stamp is not stamp_with_pypdf2:
+            document.close()
+
+    return output_path, metadata
+
+
+def _write_volume(job: Dict) -> Dict:
+    """
+    Write one volume: its TOC slice followed by its exhibits
+
+    Module level so volumes can be written in worker processes.
+    """
+    handler = PDFHandler()
+    handler.temp_dir = job['work_dir']
+    items = job['items']
+
+    toc = handler.generate_toc_with_page_map(
+        items, job['visa_type'],
+        os.path.join(job['work_dir'], f"volume_{job['volume']}_TOC.pdf"),
+        volume_label=f"Volume {job['volume']} of {job['volumes']}"
+    )
+    page_map = toc['page_map']
+
+    stats = streaming_merge(
+        [toc['output_path']] + [item['path'] for item in items],
+        job['output_path'],
+        outline=outline_from_page_map(page_map)
+    )
+    os.remove(toc['output_path'])
+
+    exhibits = []
+    for item, entry in zip(items, page_map['exhibits']):
+        exhibit = {
+            'number': item['number'],
+            'title': item['title'],
+            'pages': [entry['start_page'], entry['end_page']]
+        }
+        if 'part' in item:
+            exhibit.update(part=item['part'], parts=item['parts'], source_pages=item['source_pages'])
+        exhibits.append(exhibit)
+
+    return {
+        'volume': job['volume'],
+        'path': job['output_path'],
+        'bytes': stats['bytes'],
+        'pages': stats['pages'],
+        'over_cap': stats['bytes'] > job['max_bytes'],
+        'exhibits': exhibits
+    }
+
 
 class PDFHandler:
     """Handle all PDF operations including compression"""
@@ -31,7 +167,13 @@ class PDFHandler:
         self,
         enable_compression: bool = False,
         quality_preset: str = 'high',
-        smallpdf_api_key: Optional[str] = None
+        smallpdf_api_key: Optional[str] = None,
+        compression_cache: Optional['CompressionCache'] = None,
+        persistent_ghostscript: bool = False,
+        in_memory: bool = False,
+        stamp_backend: str = 'pypdf2',
+        artifacts: Optional[ArtifactRegistry] = None,
+        chunk_page_threshold: Optional[int] = None
     ):
         """
         Initialize PDF Handler
@@ -40,17 +182,135 @@ class PDFHandler:
             enable_compression: Whether to compress PDFs before processing
             quality_preset: Compression quality ('high', 'balanced', 'maximum')
             smallpdf_api_key: Optional SmallPDF API key for premium compression
+            compression_cache: Optional cache reused across package builds
+            persistent_ghostscript: Keep Ghostscript workers alive between exhibits
+            in_memory: Compress and stamp in memory instead of via temp files
+            stamp_backend: Exhibit/page number stamping backend
+                ('pypdf2' or 'pymupdf'; PyPDF2 is the fallback)
+            artifacts: Registry of stage outputs shared across the run
+                (a fresh one is created if omitted)
+            chunk_page_threshold: Compress PDFs with more pages than this in
+                parallel page ranges (None disables)
         """
         self.temp_dir = tempfile.gettempdir()
         self.enable_compression = enable_compression and COMPRESSION_AVAILABLE
         self.compressor = None
+        self.in_memory = in_memory
+        self.merge_stats: Optional[Dict] = None
+        self.artifacts = artifacts if artifacts is not None else ArtifactRegistry()
+        self.metadata = MetadataIndex()
+        self.stamp_backend = stamp_backend
+        self._stamp = get_stamp_backend(stamp_backend)
+        if stamp_backend != 'pypdf2' and self._stamp is stamp_with_pypdf2:
+            print(f"✗ {stamp_backend} stamping unavailable - using PyPDF2")
+            self.stamp_backend = 'pypdf2'
 
         if self.enable_compression:
             self.compressor = USCISPDFCompressor(
                 quality_preset=quality_preset,
-                smallpdf_api_key=smallpdf_api_key
+                smallpdf_api_key=smallpdf_api_key,
+                cache=compression_cache,
+                persistent_ghostscript=persistent_ghostscript,
+                chunk_page_threshold=chunk_page_threshold
             )
 
+    def close(self) -> None:
+        """Release long-lived resources (persistent Ghostscript workers)"""
+        if self.compressor:
+            self.compressor.close()
+
+    def compress_exhibit(self, pdf_path: str) -> Optional[Dict]:
+        """
+        Compress a source file once per run and preset
+
+        The result is registered in self.artifacts, so the compression phase,
+        stamping and the fused pipeline all share one compression per file.
+
+        Args:
+            pdf_path: Path to original PDF
+
+        Returns:
+            Compression result (with output_path, or data in in-memory mode),
+            or None if compression is disabled
+        """
+        if not (self.enable_compression and self.compressor):
+            return None
+
+        def produce() -> Dict:
+            original = None
+            if self.in_memory:
+                with open(pdf_path, 'rb') as f:
+                    original = f.read()
+                result = self.compressor.compress_bytes(original)
+            else:
+                result = self.compressor.compress(pdf_path)
+
+            if result['success']:
+                print(f"✓ Compressed {os.path.basename(pdf_path)}: "
+                      f"{result['reduction_percent']:.1f}% reduction "
+                      f"({result['method']})")
+                self._index_compressed(pdf_path, result, original)
+            return result
+
+        return self.artifacts.get_or_create(
+            pdf_path, 'compress', produce, self._compression_params()
+        )
+
+    def _index_compressed(self, pdf_path: str, result: Dict, original: Optional[bytes]) -> None:
+        """
+        Fill the metadata index from a compressed exhibit
+
+        Page count, sizes and text layer come from parsing the compressed
+        output; byte size and hash stay those of the original file.
+
+        Args:
+            pdf_path: Path to original PDF
+            result: Successful compression result (output_path or data)
+            original: Original file's bytes when already read, else None
+        """
+        if self.metadata.get(pdf_path):
+            return
+
+        data = result.get('data')
+        if data is None:
+            with open(result['output_path'], 'rb') as f:
+                data = f.read()
+
+        metadata, doc = open_exhibit(pdf_path, data)
+        if doc is None:
+            return  # Leave it to the stage that falls back to the original
+        if PYMUPDF_AVAILABLE:
+            doc.close()
+
+        self.metadata.record(replace(
+            metadata,
+            byte_size=result['original_size'],
+            sha256=(hashlib.sha256(original).hexdigest() if original is not None
+                    else self.metadata.content_hash(pdf_path))
+        ))
+
+    @staticmethod
+    def _is_compressed(compress_result: Optional[Dict]) -> bool:
+        """True when compression produced new output (not failed, disabled or skipped)"""
+        return bool(
+            compress_result and compress_result['success']
+            and compress_result.get('method') != 'skipped'
+        )
+
+    def _compression_params(self) -> Optional[Dict]:
+        """Registry parameters identifying the compression configuration"""
+        if not (self.enable_compression and self.compressor):
+            return None
+        return {'preset': self.compressor.quality_preset, 'in_memory': self.in_memory}
+
+    def _stamp_params(self, exhibit_number: str) -> Dict:
+        """Registry parameters identifying a stamped exhibit"""
+        return {
+            'exhibit_number': exhibit_number,
+            'backend': self.stamp_backend,
+            'compression': self._compression_params()
+        }
+
     def add_exhibit_number(self, pdf_path: str, exhibit_number: str) -> str:
         """
         Add exhibit number to PDF header (compresses first if enabled)
@@ -63,91 +323,706 @@ class PDFHandler:
             Path to numbered PDF with compression info
         """
         try:
-            # STEP 1: Compress PDF first if compression is enabled
-            working_path = pdf_path
-            compression_info = None
-
-            if self.enable_compression and self.compressor:
-                compress_result = self.compressor.compress(pdf_path)
-                if compress_result['success']:
-                    working_path = compress_result['output_path']
-                    compression_info = compress_result
-                    print(f"✓ Compressed {os.path.basename(pdf_path)}: "
-                          f"{compress_result['reduction_percent']:.1f}% reduction "
-                          f"({compress_result['method']})")
-
-            # STEP 2: Read PDF (compressed or original)
-            reader = PdfReader(working_path)
-            writer = PdfWriter()
-
-            # Create header with exhibit number
-            for page_num, page in enumerate(reader.pages):
-                # Create overlay with exhibit number
-                packet = BytesIO()
-                can = canvas.Canvas(packet, pagesize=letter)
-
-                # Add exhibit number at top center
-                can.setFont("Helvetica-Bold", 10)
-                can.drawCentredString(
-                    letter[0] / 2,  # Center of page
-                    letter[1] - 0.5 * inch,  # 0.5 inch from top
-                    f"Exhibit {exhibit_number}"
-                )
+            artifact = self.artifacts.get_or_create(
+                pdf_path, 'stamp',
+                lambda: self._stamp_exhibit(pdf_path, exhibit_number),
+                self._stamp_params(exhibit_number)
+            )
+            return artifact['output_path']
 
-                # Add page number at bottom
-                can.setFont("Helvetica", 9)
-                can.drawCentredString(
-                    letter[0] / 2,
-                    0.5 * inch,
-                    f"Page {page_num + 1} of {len(reader.pages)}"
-                )
+        except Exception as e:
+            print(f"Error adding exhibit number: {e}")
+            return pdf_path  # Return original if numbering fails
 
-                can.save()
+    def _stamp_exhibit(self, pdf_path: str, exhibit_number: str) -> Dict:
+        """Stamp the (compressed, if enabled) exhibit; returns the stamp artifact"""
+        # STEP 1: Reuse the compressed file if compression is enabled
+        working_path = pdf_path
+        compress_result = self.compress_exhibit(pdf_path)
+        original = not self._is_compressed(compress_result)
+
+        if not original:
+            if 'data' in compress_result:
+                working_path = BytesIO(compress_result['data'])
+            else:
+                working_path = compress_result['output_path']
+
+        # STEP 2: Stamp PDF (compressed or original); stamping the original
+        # is its first parse, so it also fills the metadata index
+        output_path = self._stamped_path(pdf_path, exhibit_number)
+        index_metadata = original and not self.metadata.get(pdf_path)
+        stamped, metadata = _stamp_file(
+            working_path, output_path, exhibit_number, self.stamp_backend, index_metadata
+        )
+        if metadata:
+            self.metadata.record(metadata)
+        if stamped is None:
+            raise ValueError(f"{os.path.basename(pdf_path)} is encrypted or unreadable")
 
-                # Merge overlay with original page
-                packet.seek(0)
-                overlay = PdfReader(packet)
-                page.merge_page(overlay.pages[0])
-                writer.add_page(page)
+        return {'output_path': output_path, 'exhibit_number': exhibit_number}
 
-            # Save numbered PDF
-            output_path = os.path.join(
-                self.temp_dir,
-                f"Exhibit_{exhibit_number}_{os.path.basename(pdf_path)}"
-            )
+    def _stamped_path(self, pdf_path: str, exhibit_number: str) -> str:
+        return os.path.join(
+            self.temp_dir,
+            f"Exhibit_{exhibit_number}_{os.path.basename(pdf_path)}"
+        )
 
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
+    def stamp_exhibits(
+        self,
+        exhibits: List[Tuple[str, str]],
+        max_workers: Optional[int] = None,
+        on_progress: Optional[Callable[[int, int, str], None]] = None
+    ) -> Iterator[Tuple[int, str]]:
+        """
+        Stamp many exhibits in worker processes, yielding results in order
 
-            return output_path
+        Compression runs first in this process (reusing registered
+        artifacts); only the CPU-bound stamping is distributed. Exhibit i is
+        yielded as soon as it and every exhibit before it are done, so a
+        consumer can merge while later exhibits are still being stamped.
+        on_progress is called from the consuming thread as each exhibit
+        finishes, in completion order.
 
-        except Exception as e:
-            print(f"Error adding exhibit number: {e}")
-            return pdf_path  # Return original if numbering fails
+        Args:
+            exhibits: (pdf_path, exhibit_number) pairs in package order
+            max_workers: Worker processes (default: CPU count)
+            on_progress: Optional callback (completed, total, exhibit_number)
+
+        Yields:
+            (index, stamped_path) in input order; the original path when
+            stamping an exhibit failed
+        """
+        total = len(exhibits)
+        stamped: Dict[int, str] = {}
+        futures = {}
+        params = [self._stamp_params(number) for _, number in exhibits]
 
-    def merge_pdfs(self, pdf_paths: List[str], output_name: str) -> str:
+        workers = min(max_workers or os.cpu_count() or 1, max(total, 1))
+        executor = ProcessPoolExecutor(max_workers=workers)
+
+        try:
+            for i, (pdf_path, exhibit_number) in enumerate(exhibits):
+                artifact = self.artifacts.get(pdf_path, 'stamp', params[i])
+                if artifact:
+                    stamped[i] = artifact['output_path']
+                    continue
+
+                source = pdf_path
+                compress_result = self.compress_exhibit(pdf_path)
+                original = not self._is_compressed(compress_result)
+                if not original:
+                    source = compress_result.get('data') or compress_result['output_path']
+
+                future = executor.submit(
+                    _stamp_file, source, self._stamped_path(pdf_path, exhibit_number),
+                    exhibit_number, self.stamp_backend,
+                    original and not self.metadata.get(pdf_path)
+                )
+                futures[future] = i
+
+            completed = len(stamped)
+            next_index = 0
+            pending = set(futures)
+
+            while next_index < total:
+                # Hand out everything that is ready in order
+                while next_index in stamped:
+                    yield next_index, stamped.pop(next_index)
+                    next_index += 1
+                if next_index >= total:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = futures[future]
+                    pdf_path, exhibit_number = exhibits[i]
+                    try:
+                        output_path, metadata = future.result()
+                        if metadata:
+                            self.metadata.record(metadata)
+                        if output_path is None:
+                            raise ValueError(f"{os.path.basename(pdf_path)} is encrypted or unreadable")
+                        self.artifacts.put(
+                            pdf_path, 'stamp',
+                            {'output_path': output_path, 'exhibit_number': exhibit_number},
+                            params[i]
+                        )
+                    except Exception as e:
+                        print(f"Error adding exhibit number: {e}")
+                        output_path = pdf_path  # Original if numbering fails
+                    stamped[i] = output_path
+
+                    completed += 1
+                    if on_progress:
+                        on_progress(completed, total, exhibit_number)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def merge_pdfs(
+        self,
+        pdf_paths: List[str],
+        output_name: str,
+        deduplicate_resources: bool = False,
+        streaming: bool = False,
+        outline: Optional[List[list]] = None,
+        stamps: Optional[List[Tuple]] = None
+    ) -> str:
         """
         Merge multiple PDFs into single file
 
         Args:
             pdf_paths: List of PDF file paths
             output_name: Name for output file
+            deduplicate_resources: Store identical images and embedded font
+                programs only once across exhibits (stats in self.merge_stats)
+            streaming: Write pages incrementally and release each source once
+                copied, so memory stays flat for very large packages. Source
+                bookmarks are not carried over and deduplication is skipped
+                (it would load the whole package).
+            outline: Bookmarks to add, as [level, title, page] entries with
+                1-based package pages (see page_map.outline_from_page_map)
+            stamps: (header, footer, bates) per package page, drawn while
+                the pages are copied (streaming only; e.g. package_stamps()
+                for Bates numbers without a second whole-package pass)
 
         Returns:
             Path to merged PDF
         """
+        if stamps and not streaming:
+            raise ValueError("stamps are applied by the streaming merge; use stamp_package otherwise")
+
+        output_path = os.path.join(self.temp_dir, f"{output_name}_Complete.pdf")
+        existing = [pdf_path for pdf_path in pdf_paths if os.path.exists(pdf_path)]
+        self.merge_stats = None
+
+        if streaming:
+            stats = streaming_merge(existing, output_path, outline=outline, stamps=stamps)
+            print(f"✓ Streamed {stats['pages']} pages into {os.path.basename(output_path)}")
+            return output_path
+
         merger = PdfMerger()
 
-        for pdf_path in pdf_paths:
-            if os.path.exists(pdf_path):
-                merger.append(pdf_path)
+        for pdf_path in existing:
+            merger.append(pdf_path)
+
+        # Nest each entry under the closest preceding entry one level up
+        parents = {}
+        for level, title, page in outline or []:
+            parents[level] = merger.add_outline_item(title, page - 1, parent=parents.get(level - 1))
 
-        output_path = os.path.join(self.temp_dir, f"{output_name}_Complete.pdf")
         merger.write(output_path)
         merger.close()
 
+        if deduplicate_resources and PYMUPDF_AVAILABLE:
+            self.merge_stats = self._deduplicate_resources(output_path)
+            print(f"✓ Deduplicated {self.merge_stats['duplicates_removed']} shared resources: "
+                  f"{self.merge_stats['bytes_saved'] / 1024:.1f} KB saved")
+
         return output_path
 
+    def stamp_package(
+        self,
+        package_path: str,
+        page_map: Dict,
+        bates_prefix: str = '',
+        bates_start: int = 1
+    ) -> Dict:
+        """
+        Stamp a merged, unstamped package in place in one pass
+
+        Every exhibit page gets its exhibit label and "Page n of N" (from the
+        page map) plus a package-wide Bates number; front matter gets only
+        the Bates number. The package is parsed and written once instead of
+        once per exhibit.
+
+        Args:
+            package_path: Merged package (e.g. from merge_pdfs)
+            page_map: Package layout from build_page_map()
+            bates_prefix: Text before each sequential number
+            bates_start: Number of the first package page
+
+        Returns:
+            Dictionary with output_path, pages, first and last (Bates
+            numbers) and seconds
+        """
+        start = time.perf_counter()
+        temp_path = package_path + '.stamping'
+
+        stamp_merged_package(
+            package_path, temp_path, page_map, bates_prefix, bates_start, backend=self.stamp_backend
+        )
+        os.replace(temp_path, package_path)
+
+        pages = page_map['total_pages']
+        first = bates_text(bates_start, bates_prefix)
+        last = bates_text(bates_start + pages - 1, bates_prefix)
+        print(f"✓ Stamped {pages} pages with Bates numbers {first}-{last}")
+
+        return {
+            'output_path': package_path,
+            'pages': pages,
+            'first': first,
+            'last': last,
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+
+    def write_volumes(
+        self,
+        exhibit_list: List[Dict],
+        pdf_paths: List[str],
+        visa_type: str,
+        output_dir: str,
+        output_name: str,
+        max_bytes: int,
+        max_workers: Optional[int] = None,
+        on_progress: Optional[Callable[[int, int, str], None]] = None
+    ) -> Dict:
+        """
+        Write the package as size-capped volumes, each with its own TOC
+
+        Volumes break at exhibit boundaries; an exhibit larger than a volume
+        is cut into page-range parts. Volumes are written in parallel and a
+        manifest ({output_name}_volumes.json) maps exhibits to volumes and
+        page ranges.
+
+        Args:
+            exhibit_list: Exhibit dictionaries (number, title) in package order
+            pdf_paths: Stamped exhibit PDFs, aligned with exhibit_list
+            visa_type: Visa category (O-1A, P-1A, etc.)
+            output_dir: Where volumes and the manifest are written
+            output_name: File name prefix
+            max_bytes: Byte cap per volume
+            max_workers: Worker processes (default: CPU count)
+            on_progress: Optional callback (completed, total, volume_path)
+
+        Returns:
+            Manifest dict with max_bytes, manifest_path and volumes (volume,
+            path, bytes, pages, over_cap, exhibits with per-volume page
+            ranges and, for parts, source_pages)
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix="volumes_", dir=self.temp_dir)
+
+        items = []
+        for exhibit, pdf_path in zip(exhibit_list, pdf_paths):
+            metadata = self.metadata.get(pdf_path)
+            items.append({
+                'number': exhibit['number'],
+                'title': exhibit['title'],
+                'path': pdf_path,
+                'pages': metadata.page_count if metadata else len(PdfReader(pdf_path).pages),
+                'bytes': os.path.getsize(pdf_path)
+            })
+
+        items = split_oversized_exhibits(items, max_bytes - VOLUME_OVERHEAD_BYTES, work_dir)
+        planned = plan_volumes(items, max_bytes)
+
+        jobs = [
+            {
+                'volume': i + 1,
+                'volumes': len(planned),
+                'items': volume_items,
+                'visa_type': visa_type,
+                'output_path': os.path.join(output_dir, f"{output_name}_Vol{i + 1:02d}.pdf"),
+                'work_dir': work_dir,
+                'max_bytes': max_bytes
+            }
+            for i, volume_items in enumerate(planned)
+        ]
+
+        volumes = [None] * len(jobs)
+        workers = min(max_workers or os.cpu_count() or 1, max(len(jobs), 1))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_write_volume, job): i for i, job in enumerate(jobs)}
+
+            for completed, future in enumerate(as_completed(futures), 1):
+                volume = future.result()
+                volumes[futures[future]] = volume
+                if volume['over_cap']:
+                    print(f"✗ Volume {volume['volume']} is {volume['bytes'] / (1024 * 1024):.1f} MB, "
+                          f"over the {max_bytes / (1024 * 1024):.1f} MB cap")
+                if on_progress:
+                    on_progress(completed, len(jobs), volume['path'])
+
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+        manifest = {
+            'max_bytes': max_bytes,
+            'manifest_path': os.path.join(output_dir, f"{output_name}_volumes.json"),
+            'volumes': volumes
+        }
+        with open(manifest['manifest_path'], 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        print(f"✓ Wrote {len(volumes)} volumes (cap {max_bytes / (1024 * 1024):.1f} MB)")
+        return manifest
+
+    def build_package(
+        self,
+        exhibits: List[Tuple[str, str]],
+        output_path: str,
+        front_matter: Optional[List[str]] = None,
+        deduplicate_resources: bool = False,
+        on_progress: Optional[Callable[[int, int, str], None]] = None,
+        keep_stamped: bool = False,
+        page_map: Optional[Dict] = None,
+        bates_prefix: Optional[str] = None,
+        toc: Optional[Callable[[List[Dict]], Dict]] = None
+    ) -> Dict:
+        """
+        Fused pipeline: compress, stamp and merge with no intermediate files
+
+        Each exhibit is compressed once (or its registered compression
+        artifact reused), parsed once, stamped in place (PyMuPDF backend) and
+        appended straight into the output document, which is written once at
+        the end. Exhibits with a registered stamp artifact are appended as
+        they are. Bookmarks inside the exhibits are kept, shifted to their
+        position in the package (nested under each exhibit when a page map
+        is given).
+
+        With bates_prefix the exhibits are appended unstamped and the whole
+        package is stamped in one pass before the save: exhibit labels plus
+        package-wide sequential numbers (see stamping.package_stamps).
+
+        Building the package is each exhibit's first parse, so it fills the
+        metadata index. Encrypted or unreadable exhibits are left out (with
+        0 pages). A TOC that needs the page counts is passed as the toc
+        callback and inserted in front once every exhibit has been read.
+
+        Args:
+            exhibits: (pdf_path, exhibit_number) pairs in package order
+            output_path: Where to write the complete package
+            front_matter: PDFs placed before the exhibits (e.g. the TOC)
+            deduplicate_resources: Store identical images and font programs
+                once (stats in self.merge_stats)
+            on_progress: Optional callback (current, total, exhibit_number)
+            keep_stamped: Also save each newly stamped exhibit to temp_dir
+                and register it, for incremental rebuilds
+            page_map: Package layout from build_page_map(); adds the
+                "Exhibits" outline (front_matter must span toc_pages)
+            bates_prefix: Stamp package-wide Bates numbers with this prefix
+                ('' for bare numbers) instead of stamping each exhibit;
+                keep_stamped is ignored
+            toc: Called with the exhibit results (number, pages) after the
+                last exhibit; returns a generate_toc_with_page_map() result,
+                whose pages go first and whose page map gives the outline
+                (replaces front_matter and page_map)
+
+        Returns:
+            Dictionary with output_path, exhibits (number, path, pages,
+            start_page, compression, stamped_path, readable), merge_stats,
+            memory (peak RSS) and seconds
+        """
+        if not PYMUPDF_AVAILABLE:
+            raise ImportError("PyMuPDF not installed (pip install PyMuPDF)")
+        if toc and (front_matter or page_map):
+            raise ValueError("toc replaces front_matter and page_map")
+
+        bates = bates_prefix is not None
+        keep_stamped = keep_stamped and not bates
+        start = time.perf_counter()
+        monitor = RSSMonitor().start()
+        out = fitz.open()
+        bookmarks: Dict[int, List[list]] = {}  # Source bookmarks per exhibit
+        exhibit_results = []
+
+        try:
+            for path in front_matter or []:
+                with fitz.open(path) as doc:
+                    out.insert_pdf(doc)
+
+            for i, (pdf_path, exhibit_number) in enumerate(exhibits):
+                if on_progress:
+                    on_progress(i + 1, len(exhibits), exhibit_number)
+
+                start_page = out.page_count + 1
+                stamped = None
+                if not bates:
+                    stamped = self.artifacts.get(pdf_path, 'stamp', self._stamp_params(exhibit_number))
+                if stamped:
+                    with fitz.open(stamped['output_path']) as doc:
+                        bookmarks[i] = self._shifted_outline(doc, start_page)
+                        out.insert_pdf(doc)
+                        page_count = doc.page_count
+
+                    exhibit_results.append({
+                        'number': exhibit_number,
+                        'path': pdf_path,
+                        'pages': page_count,
+                        'start_page': start_page,
+                        'compression': stamped.get('compression'),
+                        'stamped_path': stamped['output_path'],
+                        'readable': True
+                    })
+                    continue
+
+                # Reuse the compression phase's output when there was one
+                compression_info = None
+                compress_result = self.compress_exhibit(pdf_path)
+                original = not self._is_compressed(compress_result)
+                if compress_result and compress_result['success']:
+                    compression_info = {k: v for k, v in compress_result.items() if k != 'data'}
+                if not original:
+                    data = compress_result.get('data')
+                    if data is None:
+                        with open(compress_result['output_path'], 'rb') as f:
+                            data = f.read()
+                else:
+                    with open(pdf_path, 'rb') as f:
+                        data = f.read()
+
+                stamped_path = None
+                metadata, doc = open_exhibit(pdf_path, data)
+                if original and not self.metadata.get(pdf_path):
+                    self.metadata.record(metadata)
+                if doc is None:
+                    print(f"✗ Left Exhibit {exhibit_number} out of the package")
+                    exhibit_results.append({
+                        'number': exhibit_number,
+                        'path': pdf_path,
+                        'pages': 0,
+                        'start_page': start_page,
+                        'compression': compression_info,
+                        'stamped_path': None,
+                        'readable': False
+                    })
+                    continue
+
+                with doc:
+                    if not bates:
+                        stamp_document(doc, exhibit_number)
+                    if keep_stamped:
+                        stamped_path = self._stamped_path(pdf_path, exhibit_number)
+                        doc.save(stamped_path, garbage=1, deflate=True)
+                        self.artifacts.put(
+                            pdf_path, 'stamp',
+                            {'output_path': stamped_path, 'exhibit_number': exhibit_number,
+                             'compression': compression_info},
+                            self._stamp_params(exhibit_number)
+                        )
+                    bookmarks[i] = self._shifted_outline(doc, start_page)
+                    out.insert_pdf(doc)
+                    page_count = doc.page_count
+
+                exhibit_results.append({
+                    'number': exhibit_number,
+                    'path': pdf_path,
+                    'pages': page_count,
+                    'start_page': start_page,
+                    'compression': compression_info,
+                    'stamped_path': stamped_path,
+                    'readable': True
+                })
+
+            if toc:
+                # Page counts are known now: render the TOC and put it first
+                toc_result = toc(exhibit_results)
+                with fitz.open(toc_result['output_path']) as doc:
+                    out.insert_pdf(doc, start_at=0)
+                    shift = doc.page_count
+                for result in exhibit_results:
+                    result['start_page'] += shift
+                bookmarks = {
+                    i: [[level, title, page + shift] for level, title, page in items]
+                    for i, items in bookmarks.items()
+                }
+                page_map = toc_result['page_map']
+
+            if bates:
+                # Stamp from where the exhibits actually landed
+                layout = {'total_pages': out.page_count, 'exhibits': exhibit_results}
+                stamp_pages(out, package_stamps(layout, bates_prefix))
+
+            if page_map:
+                self._check_page_map(page_map, exhibit_results)
+                outline = outline_from_page_map(page_map, bookmarks)
+            else:
+                outline = [item for i in sorted(bookmarks) for item in bookmarks[i]]
+            if outline:
+                out.set_toc(outline)
+
+            self.merge_stats = self._deduplicate_document(out) if deduplicate_resources else None
+            out.save(output_path, garbage=1, deflate=True)
+        finally:
+            out.close()
+            memory = monitor.stop()
+
+        print(f"✓ Built package with {len(exhibits)} exhibits: "
+              f"peak memory {memory['peak_rss_bytes'] / (1024 * 1024):.1f} MB")
+
+        return {
+            'output_path': output_path,
+            'exhibits': exhibit_results,
+            'merge_stats': self.merge_stats,
+            'memory': memory,
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+
+    @staticmethod
+    def _check_page_map(page_map: Dict, exhibit_results: List[Dict]) -> None:
+        """Warn when exhibits did not land where the page map (and TOC) says"""
+        for planned, built in zip(page_map['exhibits'], exhibit_results):
+            if planned['start_page'] != built['start_page']:
+                print(f"✗ Exhibit {built['number']} starts on page {built['start_page']}, "
+                      f"page map says {planned['start_page']}")
+
+    @staticmethod
+    def _shifted_outline(doc, start_page: int) -> List[list]:
+        """An exhibit's bookmarks moved to its position in the package"""
+        return [
+            [level, title, page + start_page - 1]
+            for level, title, page in doc.get_toc(simple=True)
+            if page > 0
+        ]
+
+    def _deduplicate_resources(self, pdf_path: str) -> Dict:
+        """
+        Store each unique image XObject and font program once (in place)
+
+        Each object is hashed once over its raw stream bytes plus dictionary
+        (with references replaced by the referenced object's hash), so the
+        pass is linear in the number of objects. References to duplicates are
+        rewritten to the first copy and the unreferenced copies are dropped
+        on save.
+
+        Args:
+            pdf_path: Merged PDF to optimise
+
+        Returns:
+            Dictionary with images/fonts deduplicated, bytes_saved, seconds
+        """
+        start = time.perf_counter()
+        original_size = os.path.getsize(pdf_path)
+        doc = fitz.open(pdf_path)
+        stats = self._deduplicate_document(doc)
+
+        if stats['duplicates_removed']:
+            temp_path = pdf_path + '.dedup'
+            doc.save(temp_path, garbage=1, deflate=True)
+            doc.close()
+            os.replace(temp_path, pdf_path)
+        else:
+            doc.close()
+
+        stats['bytes_saved'] = original_size - os.path.getsize(pdf_path)
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+        return stats
+
+    def _deduplicate_document(self, doc) -> Dict:
+        """
+        Rewrite references to duplicate images/font programs in an open document
+
+        The duplicates become unreferenced; saving with garbage >= 1 drops them.
+
+        Returns:
+            Dictionary with images/fonts deduplicated and objects scanned
+        """
+        xref_count = doc.xref_length()
+
+        # Pass 1: find image XObjects and font programs
+        images, font_programs = set(), set()
+        for xref in range(1, xref_count):
+            if doc.xref_get_key(xref, 'Type')[1] == '/FontDescriptor':
+                for key in FONT_FILE_KEYS:
+                    kind, value = doc.xref_get_key(xref, key)
+                    if kind == 'xref':
+                        font_programs.add(int(value.split()[0]))
+            elif doc.xref_is_stream(xref) and doc.xref_get_key(xref, 'Subtype')[1] == '/Image':
+                images.add(xref)
+
+        # Pass 2: content-hash them together with their dependencies (soft
+        # masks, ICC profiles, colour space arrays), each object once
+        digests: Dict[int, Optional[str]] = {}
+        for xref in sorted(images | font_programs):
+            self._resource_digest(doc, xref, digests, set())
+
+        remap: Dict[int, int] = {}
+        canonical: Dict[str, int] = {}
+        counts = {'image': 0, 'font': 0}
+
+        for xref in sorted(digests):
+            digest = digests[xref]
+            if digest is None:
+                continue
+            if digest in canonical:
+                remap[xref] = canonical[digest]
+                if xref in images:
+                    counts['image'] += 1
+                elif xref in font_programs:
+                    counts['font'] += 1
+            else:
+                canonical[digest] = xref
+
+        # Pass 3: point every reference at the canonical copy
+        if remap:
+            for xref in range(1, xref_count):
+                if xref not in remap:
+                    self._rewrite_references(doc, xref, remap)
+
+        return {
+            'images_deduplicated': counts['image'],
+            'fonts_deduplicated': counts['font'],
+            'duplicates_removed': len(remap),
+            'objects_scanned': xref_count - 1
+        }
+
+    def _resource_digest(
+        self,
+        doc,
+        xref: int,
+        digests: Dict[int, Optional[str]],
+        visiting: set
+    ) -> Optional[str]:
+        """
+        Content hash of an object with references replaced by their own hashes
+
+        Memoised in digests. Page-tree objects and reference cycles yield None
+        (never deduplicated); parents then fall back to the literal number.
+        """
+        if xref in digests:
+            return digests[xref]
+        if xref in visiting or doc.xref_get_key(xref, 'Type')[1] in ('/Page', '/Pages', '/Catalog'):
+            return None
+
+        visiting.add(xref)
+
+        def child(match):
+            ref = int(match.group(1))
+            digest = self._resource_digest(doc, ref, digests, visiting)
+            return b'@' + digest.encode() if digest else match.group(0)
+
+        header = INDIRECT_REF.sub(child, doc.xref_object(xref, compressed=True).encode())
+        raw = doc.xref_stream_raw(xref) if doc.xref_is_stream(xref) else b''
+        digest = hashlib.sha256(header + b'\0' + (raw or b'')).hexdigest()
+
+        visiting.discard(xref)
+        digests[xref] = digest
+        return digest
+
+    @staticmethod
+    def _rewrite_references(doc, xref: int, remap: Dict[int, int]) -> None:
+        """Replace indirect references to remapped objects inside one object"""
+        def substitute(text: str) -> str:
+            return INDIRECT_REF.sub(
+                lambda m: b'%d 0 R' % remap.get(int(m.group(1)), int(m.group(1))),
+                text.encode()
+            ).decode()
+
+        source = doc.xref_object(xref, compressed=True)
+        if not any(int(ref) in remap for ref in INDIRECT_REF.findall(source.encode())):
+            return
+
+        if doc.xref_is_stream(xref):
+            # update_object would drop the stream data; rewrite keys instead
+            for key in doc.xref_get_keys(xref):
+                kind, value = doc.xref_get_key(xref, key)
+                if kind in ('xref', 'dict', 'array'):
+                    new_value = substitute(value)
+                    if new_value != value:
+                        doc.xref_set_key(xref, key, new_value)
+        else:
+            doc.update_object(xref, substitute(source))
+
     def generate_toc(
         self,
         exhibits: List[Dict],
@@ -178,30 +1053,11 @@ class PDFHandler:
 
         # Container for elements
         elements = []
-        styles = getSampleStyleSheet()
-
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1f77b4'),
-            spaceAfter=30,
-            alignment=1  # Center
-        )
-
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#333333'),
-            spaceAfter=12,
-            spaceBefore=12
-        )
+        styles = toc_styles()
 
         # Title
-        elements.append(Paragraph("EXHIBIT PACKAGE", title_style))
-        elements.append(Paragraph("TABLE OF CONTENTS", title_style))
+        elements.append(Paragraph("EXHIBIT PACKAGE", styles['title']))
+        elements.append(Paragraph("TABLE OF CONTENTS", styles['title']))
         elements.append(Spacer(1, 0.3 * inch))
 
         # Case information box
@@ -214,32 +1070,17 @@ class PDFHandler:
         if beneficiary_name:
             case_info.insert(1, ["Beneficiary:", beneficiary_name])
 
-        info_table = Table(case_info, colWidths=[2 * inch, 4 * inch])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0f0f0')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 12),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
+        info_table = Table(case_info, colWidths=[2 * inch, 4 * inch], style=CASE_INFO_STYLE)
 
         elements.append(info_table)
         elements.append(Spacer(1, 0.5 * inch))
 
         # Exhibit List heading
-        elements.append(Paragraph("Exhibit List", heading_style))
+        elements.append(Paragraph("Exhibit List", styles['heading']))
         elements.append(Spacer(1, 0.2 * inch))
 
         # Exhibit table
-        exhibit_data = [["Exhibit", "Title/Description", "Status"]]
+        exhibit_data = []
 
         for exhibit in exhibits:
             status = "✓ Generated" if exhibit.get('path') or exhibit.get('pdf_path') else "✗ Failed"
@@ -249,38 +1090,13 @@ class PDFHandler:
                 status
             ])
 
-        exhibit_table = Table(
+        exhibit_table = PagedTable(
+            ["Exhibit", "Title/Description", "Status"],
             exhibit_data,
-            colWidths=[1.2 * inch, 4.3 * inch, 1 * inch]
+            [1.2 * inch, 4.3 * inch, 1 * inch],
+            EXHIBIT_LIST_STYLE
         )
 
-        exhibit_table.setStyle(TableStyle([
-            # Header row
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f77b4')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-
-            # Data rows
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-            ('ALIGN', (2, 1), (2, -1), 'CENTER'),
-
-            # Grid
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
-
-            # Padding
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-
         elements.append(exhibit_table)
 
         # Archive URLs section (if any exhibits have URLs)
@@ -288,10 +1104,10 @@ class PDFHandler:
 
         if archived_exhibits:
             elements.append(Spacer(1, 0.5 * inch))
-            elements.append(Paragraph("Archived URLs (archive.org)", heading_style))
+            elements.append(Paragraph("Archived URLs (archive.org)", styles['heading']))
             elements.append(Spacer(1, 0.2 * inch))
 
-            url_data = [["Exhibit", "Original URL", "Archived URL"]]
+            url_data = []
 
             for exhibit in archived_exhibits:
                 url_data.append([
@@ -300,41 +1116,24 @@ class PDFHandler:
                     exhibit.get('archive_url', 'N/A')[:40] + "..."
                 ])
 
-            url_table = Table(url_data, colWidths=[1 * inch, 2.5 * inch, 2.5 * inch])
-            url_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f77b4')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 9),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ]))
+            url_table = PagedTable(
+                ["Exhibit", "Original URL", "Archived URL"],
+                url_data,
+                [1 * inch, 2.5 * inch, 2.5 * inch],
+                ARCHIVE_URL_STYLE
+            )
 
             elements.append(url_table)
 
         # Footer
         elements.append(Spacer(1, 0.5 * inch))
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=colors.grey,
-            alignment=1  # Center
-        )
-
         elements.append(Paragraph(
             "This exhibit package was generated automatically.",
-            footer_style
+            styles['footer']
         ))
         elements.append(Paragraph(
             "All source URLs have been archived to archive.org for preservation.",
-            footer_style
+            styles['footer']
         ))
 
         # Build PDF
@@ -342,6 +1141,64 @@ class PDFHandler:
 
         return output_path
 
+    def generate_toc_with_page_map(
+        self,
+        exhibit_list: List[Dict],
+        visa_type: str,
+        output_path: str,
+        volume_label: Optional[str] = None
+    ) -> Dict:
+        """
+        Generate the TOC with each exhibit's start page in the package
+
+        The page map is laid out from the exhibits' page counts and an
+        estimated TOC length. If the rendered TOC has a different length the
+        map is rebuilt and the TOC rendered again, until the length is stable
+        (at most TOC_MAX_RENDERS renders), so the package itself is only
+        merged once.
+
+        Args:
+            exhibit_list: Exhibit dictionaries in package order
+            visa_type: Visa category (O-1A, P-1A, etc.)
+            output_path: Path for output PDF
+            volume_label: Optional line under the title (volume TOCs)
+
+        Returns:
+            Dictionary with output_path, page_map and renders
+
+        Raises:
+            RuntimeError: If the TOC length does not settle within TOC_MAX_RENDERS
+        """
+        exhibits = [
+            {'number': exhibit['number'], 'title': exhibit['title'], 'pages': self._exhibit_pages(exhibit)}
+            for exhibit in exhibit_list
+        ]
+        toc_pages = estimate_toc_pages(len(exhibits))
+
+        for renders in range(1, TOC_MAX_RENDERS + 1):
+            page_map = build_page_map(exhibits, toc_pages)
+            self.generate_table_of_contents(
+                exhibit_list, visa_type, output_path,
+                start_pages=[entry['start_page'] if entry['pages'] else '-' for entry in page_map['exhibits']],
+                volume_label=volume_label
+            )
+            toc_pages = len(PdfReader(output_path).pages)
+            if toc_pages == page_map['toc_pages']:
+                return {'output_path': output_path, 'page_map': page_map, 'renders': renders}
+            print(f"✓ TOC is {toc_pages} pages, not {page_map['toc_pages']} - renumbering")
+
+        raise RuntimeError(
+            f"TOC length did not settle after {TOC_MAX_RENDERS} renders "
+            f"(last render: {toc_pages} pages)"
+        )
+
+    def _exhibit_pages(self, exhibit: Dict):
+        """Page count from the metadata index (by exhibit 'path'), else the dict"""
+        metadata = self.metadata.get(exhibit['path']) if exhibit.get('path') else None
+        if metadata:
+            return metadata.page_count
+        return exhibit.get('pages', '-')
+
     def url_to_pdf(self, url: str) -> Optional[str]:
         """
         Convert URL to PDF (requires external service or API2PDF)
@@ -361,75 +1218,64 @@ class PDFHandler:
         self,
         exhibit_list: List[Dict],
         visa_type: str,
-        output_path: str
+        output_path: str,
+        start_pages: Optional[List[int]] = None,
+        volume_label: Optional[str] = None
     ) -> str:
         """
         Generate Table of Contents PDF
 
         Args:
-            exhibit_list: List of exhibit dictionaries with number, title, pages
+            exhibit_list: List of exhibit dictionaries with number, title and
+                either path (page count read from self.metadata) or pages
             visa_type: Visa category (O-1A, P-1A, etc.)
             output_path: Path for output PDF
+            start_pages: Optional package page each exhibit starts on
+                (adds a "Page" column)
+            volume_label: Optional line under the title (e.g. "Volume 2 of 3")
 
         Returns:
             Path to generated TOC PDF
         """
         doc = SimpleDocTemplate(output_path, pagesize=letter)
         story = []
-        styles = getSampleStyleSheet()
+        styles = toc_styles()
 
         # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1f77b4'),
-            spaceAfter=30,
-            alignment=1  # Center
-        )
-        story.append(Paragraph("EXHIBIT PACKAGE", title_style))
-        story.append(Paragraph("TABLE OF CONTENTS", title_style))
+        story.append(Paragraph("EXHIBIT PACKAGE", styles['title']))
+        story.append(Paragraph("TABLE OF CONTENTS", styles['title']))
+        if volume_label:
+            story.append(Paragraph(volume_label, styles['heading']))
         story.append(Spacer(1, 0.5*inch))
 
         # Case info
-        info_style = ParagraphStyle(
-            'Info',
-            parent=styles['Normal'],
-            fontSize=11,
-            spaceAfter=20
-        )
         info_text = f"""
         <b>Visa Type:</b> {visa_type}<br/>
         <b>Generated:</b> {datetime.now().strftime('%B %d, %Y')}<br/>
         <b>Total Exhibits:</b> {len(exhibit_list)}
         """
-        story.append(Paragraph(info_text, info_style))
+        story.append(Paragraph(info_text, styles['info']))
         story.append(Spacer(1, 0.3*inch))
 
         # Exhibit table
-        table_data = [['Exhibit', 'Title', 'Pages']]
-
-        for exhibit in exhibit_list:
-            table_data.append([
+        header = ['Exhibit', 'Title', 'Pages']
+        table_data = []
+        col_widths = [1.5*inch, 4*inch, 1*inch]
+        if start_pages:
+            header.append('Page')
+            col_widths = [1.3*inch, 3.6*inch, 0.8*inch, 0.8*inch]
+
+        for i, exhibit in enumerate(exhibit_list):
+            row = [
                 f"Exhibit {exhibit['number']}",
                 exhibit['title'][:50],  # Truncate long titles
-                str(exhibit.get('pages', '-'))
-            ])
+                str(self._exhibit_pages(exhibit))
+            ]
+            if start_pages:
+                row.append(str(start_pages[i]))
+            table_data.append(row)
 
-        table = Table(table_data, colWidths=[1.5*inch, 4*inch, 1*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-        ]))
+        table = PagedTable(header, table_data, col_widths, PACKAGE_TOC_STYLE)
 
         story.append(table)
 
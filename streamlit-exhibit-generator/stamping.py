@@ -0,0 +1,341 @@
+"""
+Stamping - Exhibit header and page-number footer backends
+Draws "Exhibit X" at the top and "Page n of N" at the bottom of every page
+
+Backends:
+- pypdf2: one ReportLab overlay document merged with PyPDF2 (pure Python)
+- pymupdf: text inserted directly into each page with PyMuPDF (much faster)
+
+Both place the stamp in the page's displayed orientation with the same
+fonts (Helvetica-Bold 10pt / Helvetica 9pt) and offsets (0.5 inch).
+
+Package (Bates) stamping runs once over the merged package instead: every
+page gets its exhibit label and "Page n of N" from the page map plus a
+package-wide sequential number at the bottom right. Front matter (the TOC)
+gets only the sequential number.
+"""
+
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple, Union, BinaryIO
+
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+
+STAMP_BACKENDS = ('pypdf2', 'pymupdf')
+
+STAMP_MARGIN = 0.5 * inch
+HEADER_FONT = ("Helvetica-Bold", 10)
+FOOTER_FONT = ("Helvetica", 9)
+PYMUPDF_FONTS = {"Helvetica-Bold": "hebo", "Helvetica": "helv"}  # Base-14 aliases
+
+BATES_DIGITS = 6
+
+PdfSource = Union[str, BinaryIO]
+
+# (header, footer, bates) for one page; any of them may be None
+PageStamp = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def header_text(exhibit_number: str) -> str:
+    return f"Exhibit {exhibit_number}"
+
+
+def footer_text(page_number: int, total_pages: int) -> str:
+    return f"Page {page_number} of {total_pages}"
+
+
+def bates_text(number: int, prefix: str = '') -> str:
+    return f"{prefix}{number:0{BATES_DIGITS}d}"
+
+
+def exhibit_stamps(exhibit_number: str, total_pages: int) -> List[PageStamp]:
+    """Per-exhibit stamps: label and "Page n of N" on every page"""
+    return [
+        (header_text(exhibit_number), footer_text(page + 1, total_pages), None)
+        for page in range(total_pages)
+    ]
+
+
+def package_stamps(page_map: Dict, bates_prefix: str = '', bates_start: int = 1) -> List[PageStamp]:
+    """
+    Stamps for every page of a merged package
+
+    Args:
+        page_map: Package layout from page_map.build_page_map()
+        bates_prefix: Text before the sequential number (e.g. "SMITH-")
+        bates_start: Number of the first package page
+
+    Returns:
+        One (header, footer, bates) tuple per package page
+    """
+    stamps: List[PageStamp] = [(None, None, None)] * page_map['total_pages']
+
+    for entry in page_map['exhibits']:
+        for page in range(entry['pages']):
+            stamps[entry['start_page'] - 1 + page] = (
+                header_text(entry['number']), footer_text(page + 1, entry['pages']), None
+            )
+
+    return [
+        (header, footer, bates_text(bates_start + i, bates_prefix))
+        for i, (header, footer, _) in enumerate(stamps)
+    ]
+
+
+# ==========================================
+# PYPDF2 BACKEND
+# ==========================================
+
+def build_stamp_overlay(pages, exhibit_number: str) -> PdfReader:
+    """
+    Draw the exhibit stamp for every page into a single overlay PDF
+
+    Overlay page i matches source page i's MediaBox (including a non-zero
+    origin) and is drawn in the page's displayed orientation, so the stamp
+    stays at the visual top/bottom of rotated pages.
+
+    Args:
+        pages: Source pages (PyPDF2 page objects)
+        exhibit_number: Exhibit number (A, B, C, etc.)
+
+    Returns:
+        Reader over the overlay, one page per source page
+    """
+    return build_overlay(pages, exhibit_stamps(exhibit_number, len(pages)))
+
+
+def build_overlay(pages, stamps: List[PageStamp]) -> PdfReader:
+    """
+    Draw per-page stamps into a single overlay PDF (see build_stamp_overlay)
+
+    Args:
+        pages: Source pages (PyPDF2 page objects)
+        stamps: (header, footer, bates) per page
+
+    Returns:
+        Reader over the overlay, one page per source page
+    """
+    packet = BytesIO()
+    can = canvas.Canvas(packet)
+
+    for page, (header, footer, bates) in zip(pages, stamps):
+        box = page.mediabox
+        width, height = float(box.width), float(box.height)
+        rotation = (page.rotation or 0) % 360
+
+        can.setPageSize((width, height))
+        # merge_page clips overlay content to the overlay's TrimBox
+        can.setCropBox(tuple(float(v) for v in box), name='trim')
+        can.translate(float(box.left), float(box.bottom))
+
+        # Map upright (displayed) coordinates onto the page's user space
+        if rotation == 90:
+            can.translate(width, 0)
+            can.rotate(90)
+            width, height = height, width
+        elif rotation == 180:
+            can.translate(width, height)
+            can.rotate(180)
+        elif rotation == 270:
+            can.translate(0, height)
+            can.rotate(270)
+            width, height = height, width
+
+        # Add exhibit number at top center
+        if header:
+            can.setFont(*HEADER_FONT)
+            can.drawCentredString(width / 2, height - STAMP_MARGIN, header)
+
+        # Add page number at bottom, package number at bottom right
+        can.setFont(*FOOTER_FONT)
+        if footer:
+            can.drawCentredString(width / 2, STAMP_MARGIN, footer)
+        if bates:
+            can.drawRightString(width - STAMP_MARGIN, STAMP_MARGIN, bates)
+
+        can.showPage()
+
+    can.save()
+    packet.seek(0)
+    return PdfReader(packet)
+
+
+def stamp_with_pypdf2(source: PdfSource, output_path: str, exhibit_number: str) -> None:
+    """
+    Stamp a PDF by merging a ReportLab overlay with PyPDF2
+
+    Args:
+        source: Path, binary file object or open PdfReader of the PDF to stamp
+        output_path: Where to write the stamped PDF
+        exhibit_number: Exhibit number (A, B, C, etc.)
+    """
+    _overlay_with_pypdf2(source, output_path, lambda pages: exhibit_stamps(exhibit_number, len(pages)))
+
+
+def _overlay_with_pypdf2(source: PdfSource, output_path: str, make_stamps) -> None:
+    reader = source if isinstance(source, PdfReader) else PdfReader(source)
+    writer = PdfWriter()
+
+    # Stamp every page from one overlay document, parsed once
+    overlay = build_overlay(reader.pages, make_stamps(reader.pages))
+    for page, stamp in zip(reader.pages, overlay.pages):
+        page.merge_page(stamp)
+        writer.add_page(page)
+
+    with open(output_path, 'wb') as output_file:
+        writer.write(output_file)
+
+
+# ==========================================
+# PYMUPDF BACKEND
+# ==========================================
+
+def _insert_centred(shape, text: str, baseline_from_top: float, font, right_aligned: bool = False) -> None:
+    """Add text centred (or right-aligned) on the displayed page at a displayed baseline"""
+    page = shape.page
+    fontname, fontsize = PYMUPDF_FONTS[font[0]], font[1]
+    width = fitz.get_text_length(text, fontname=fontname, fontsize=fontsize)
+    if right_aligned:
+        x = page.rect.width - STAMP_MARGIN - width
+    else:
+        x = (page.rect.width - width) / 2
+    displayed = fitz.Point(x, baseline_from_top)
+
+    shape.insert_text(
+        displayed * page.derotation_matrix,
+        text,
+        fontname=fontname,
+        fontsize=fontsize,
+        rotate=page.rotation
+    )
+
+
+def stamp_document(doc, exhibit_number: str) -> None:
+    """
+    Stamp every page of an open PyMuPDF document in place
+
+    Positions are measured on the visible page (page.rect), which equals
+    the MediaBox unless the page sets a smaller CropBox.
+
+    Args:
+        doc: Open PyMuPDF document
+        exhibit_number: Exhibit number (A, B, C, etc.)
+    """
+    stamp_pages(doc, exhibit_stamps(exhibit_number, doc.page_count))
+
+
+def stamp_pages(doc, stamps: List[PageStamp]) -> None:
+    """
+    Insert per-page stamps into an open PyMuPDF document in place
+
+    Args:
+        doc: Open PyMuPDF document
+        stamps: (header, footer, bates) per page
+    """
+    for page, (header, footer, bates) in zip(doc, stamps):
+        # One content stream per page for all of its stamps
+        shape = page.new_shape()
+        height = page.rect.height
+        if header:
+            _insert_centred(shape, header, STAMP_MARGIN, HEADER_FONT)
+        if footer:
+            _insert_centred(shape, footer, height - STAMP_MARGIN, FOOTER_FONT)
+        if bates:
+            _insert_centred(shape, bates, height - STAMP_MARGIN, FOOTER_FONT, right_aligned=True)
+        shape.commit()
+
+
+def stamp_with_pymupdf(source: PdfSource, output_path: str, exhibit_number: str) -> None:
+    """
+    Stamp a PDF by inserting text directly into each page with PyMuPDF
+
+    Args:
+        source: Path, binary file object or open document of the PDF to
+            stamp (an open document is stamped in place and left open)
+        output_path: Where to write the stamped PDF
+        exhibit_number: Exhibit number (A, B, C, etc.)
+    """
+    if isinstance(source, fitz.Document):
+        stamp_document(source, exhibit_number)
+        source.save(output_path, garbage=1, deflate=True)
+        return
+
+    if isinstance(source, str):
+        doc = fitz.open(source)
+    else:
+        doc = fitz.open(stream=source.read(), filetype='pdf')
+
+    try:
+        stamp_document(doc, exhibit_number)
+        doc.save(output_path, garbage=1, deflate=True)
+    finally:
+        doc.close()
+
+
+# ==========================================
+# PACKAGE (BATES) STAMPING
+# ==========================================
+
+def stamp_merged_package(
+    source: PdfSource,
+    output_path: str,
+    page_map: Dict,
+    bates_prefix: str = '',
+    bates_start: int = 1,
+    backend: str = 'pymupdf'
+) -> None:
+    """
+    Stamp a merged package in one pass: exhibit labels plus Bates numbers
+
+    The package is parsed once and written once, however many exhibits it
+    holds.
+
+    Args:
+        source: Path or binary file object of the merged (unstamped) package
+        output_path: Where to write the stamped package
+        page_map: Package layout from page_map.build_page_map()
+        bates_prefix: Text before the sequential number
+        bates_start: Number of the first package page
+        backend: 'pymupdf' or 'pypdf2' (as for get_stamp_backend)
+    """
+    stamps = package_stamps(page_map, bates_prefix, bates_start)
+
+    if get_stamp_backend(backend) is stamp_with_pymupdf:
+        if isinstance(source, str):
+            doc = fitz.open(source)
+        else:
+            doc = fitz.open(stream=source.read(), filetype='pdf')
+        try:
+            stamp_pages(doc, stamps)
+            doc.save(output_path, garbage=1, deflate=True)
+        finally:
+            doc.close()
+    else:
+        _overlay_with_pypdf2(source, output_path, lambda pages: stamps)
+
+
+def get_stamp_backend(name: str) -> Callable[[PdfSource, str, str], None]:
+    """
+    Resolve a backend name to its stamping function
+
+    Args:
+        name: 'pypdf2' or 'pymupdf' ('pymupdf' falls back to 'pypdf2'
+            when PyMuPDF is not installed)
+
+    Returns:
+        Function (source, output_path, exhibit_number) -> None
+    """
+    if name not in STAMP_BACKENDS:
+        raise ValueError(f"Unknown stamp backend '{name}' (choose from {', '.join(STAMP_BACKENDS)})")
+
+    if name == 'pymupdf' and PYMUPDF_AVAILABLE:
+        return stamp_with_pymupdf
+    return stamp_with_pypdf2
@@ -0,0 +1,344 @@
+"""
+Streaming Merge - Bounded-memory PDF concatenation
+Writes each page's objects to disk as soon as they are copied
+
+PdfMerger keeps every appended document alive until write(), so memory grows
+with the package. StreamingPdfWriter instead:
+- opens one source at a time
+- copies each page and everything it references under new object numbers
+- writes those objects straight to the output file
+- forgets the source (and its object map) before opening the next one
+
+Only the xref offsets and the list of page references are kept for the whole
+run, so peak memory is bounded by the largest single exhibit. An outline
+(bookmarks) can be written with the page tree when the writer is closed.
+
+Pages can be stamped as they are copied (exhibit labels, Bates numbers): each
+source's stamps are drawn into one ReportLab overlay and merged into its
+pages before they are written, so a stamped package stays within the same
+memory bound.
+"""
+
+import os
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (
+    ArrayObject,
+    ContentStream,
+    DecodedStreamObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    StreamObject,
+    TextStringObject,
+)
+
+PDF_HEADER = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"
+TREE_TYPES = ('/Pages', '/Catalog')  # Never copied; references become null
+
+from stamping import PageStamp, build_overlay
+
+PdfSource = Union[str, BinaryIO]
+
+
+class StreamingPdfWriter:
+    """Concatenate PDFs into one file, writing objects incrementally"""
+
+    CATALOG = 1
+    PAGES = 2
+
+    def __init__(self, output_path: str):
+        """
+        Open the output file and reserve the catalog and page tree objects
+
+        Args:
+            output_path: Where to write the merged PDF
+        """
+        self.output_path = output_path
+        self._file = open(output_path, 'wb')
+        self._file.write(PDF_HEADER)
+        self._offsets: Dict[int, int] = {}
+        self._next_number = self.PAGES + 1
+        self._page_refs: List[IndirectObject] = []
+        self._closed = False
+
+    @property
+    def page_count(self) -> int:
+        """Pages appended so far"""
+        return len(self._page_refs)
+
+    def append(self, source: PdfSource, stamps: Optional[List[PageStamp]] = None) -> int:
+        """
+        Copy every page of a PDF to the output
+
+        Inherited page attributes (Resources, MediaBox, CropBox, Rotate) are
+        copied onto each page. Links between pages of the same source are
+        kept; references to other page trees become null.
+
+        Args:
+            source: Path or binary file object
+            stamps: Optional (header, footer, bates) per page of this
+                source, drawn onto the pages as they are copied (extra
+                entries are ignored)
+
+        Returns:
+            Number of pages appended
+        """
+        if isinstance(source, str):
+            # A file object is read lazily; a path would be loaded whole
+            with open(source, 'rb') as f:
+                return self.append(f, stamps)
+
+        reader = PdfReader(source)
+        if reader.is_encrypted:
+            reader.decrypt('')
+
+        pages = reader.pages
+        overlay = build_overlay(pages, stamps) if stamps else None
+        id_map: Dict[tuple, int] = {}
+        pending: List[tuple] = []
+
+        # Reserve page numbers first so intra-document links resolve to them
+        for page in pages:
+            id_map[self._key(page.indirect_reference)] = self._allocate()
+
+        for i, page in enumerate(pages):
+            number = id_map[self._key(page.indirect_reference)]
+            if overlay and i < len(overlay.pages):
+                page.merge_page(overlay.pages[i])
+
+            copy = DictionaryObject()
+            for key, value in dict.items(page):
+                if key == '/Parent':
+                    continue
+                value = self._remap(value, id_map, pending)
+                if isinstance(value, StreamObject):
+                    # Merged content is a direct stream; streams must be indirect
+                    stream_number = self._allocate()
+                    self._write_object(stream_number, value)
+                    value = IndirectObject(stream_number, 0, self)
+                copy[NameObject(key)] = value
+            copy[NameObject('/Parent')] = IndirectObject(self.PAGES, 0, self)
+
+            self._write_object(number, copy)
+            self._page_refs.append(IndirectObject(number, 0, self))
+
+            # Write everything this page pulled in before moving on
+            while pending:
+                source_ref, target = pending.pop()
+                self._write_object(target, self._remap(source_ref.get_object(), id_map, pending))
+
+        page_count = len(pages)
+
+        # The readers sit in reference cycles (their objects point back at
+        # them), so release the parsed objects now rather than at a later
+        # collection
+        for parsed in (reader, overlay):
+            if parsed:
+                parsed.resolved_objects.clear()
+                parsed.flattened_pages = None
+        return page_count
+
+    def close(self, outline: Optional[List[list]] = None) -> Dict[str, Any]:
+        """
+        Write the page tree, outline, catalog, xref table and trailer
+
+        Args:
+            outline: Optional bookmarks as [level, title, page] entries
+                (1-based pages of the merged output)
+
+        Returns:
+            Dictionary with output_path, pages, objects and bytes written
+        """
+        if self._closed:
+            return self._stats()
+
+        pages = DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(self._page_refs),
+            NameObject('/Count'): NumberObject(len(self._page_refs)),
+        })
+        self._write_object(self.PAGES, pages)
+
+        catalog = DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(self.PAGES, 0, self),
+        })
+        if outline:
+            catalog[NameObject('/Outlines')] = self._write_outline(outline)
+            catalog[NameObject('/PageMode')] = NameObject('/UseOutlines')
+        self._write_object(self.CATALOG, catalog)
+
+        xref_offset = self._file.tell()
+        size = self._next_number
+        self._file.write(f"xref\n0 {size}\n".encode())
+        self._file.write(b"0000000000 65535 f \n")
+        for number in range(1, size):
+            offset = self._offsets.get(number)
+            if offset is None:
+                self._file.write(b"0000000000 65535 f \n")
+            else:
+                self._file.write(f"{offset:010d} 00000 n \n".encode())
+
+        trailer = DictionaryObject({
+            NameObject('/Size'): NumberObject(size),
+            NameObject('/Root'): IndirectObject(self.CATALOG, 0, self),
+        })
+        self._file.write(b"trailer\n")
+        trailer.write_to_stream(self._file, None)
+        self._file.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+        self._file.close()
+        self._closed = True
+        return self._stats()
+
+    def _stats(self) -> Dict[str, Any]:
+        return {
+            'output_path': self.output_path,
+            'pages': len(self._page_refs),
+            'objects': len(self._offsets),
+            'bytes': os.path.getsize(self.output_path)
+        }
+
+    def _write_outline(self, outline: List[list]) -> IndirectObject:
+        """Write the outline tree and return a reference to its root"""
+        root = {'number': self._allocate(), 'children': []}
+        stack = [root]  # stack[level] is the most recent item at that level
+
+        for level, title, page in outline:
+            item = {
+                'number': self._allocate(),
+                'title': title,
+                'page': min(max(page, 1), len(self._page_refs)) - 1,
+                'children': []
+            }
+            del stack[level:]
+            stack[-1]['children'].append(item)
+            stack.append(item)
+
+        def write(node, parent: Optional[int], prev: Optional[int], following: Optional[int]) -> int:
+            """Write node and its subtree; returns the descendant count"""
+            children = node['children']
+            count = 0
+            for i, child in enumerate(children):
+                count += 1 + write(
+                    child,
+                    node['number'],
+                    children[i - 1]['number'] if i else None,
+                    children[i + 1]['number'] if i + 1 < len(children) else None
+                )
+
+            entry = DictionaryObject()
+            if parent is None:
+                entry[NameObject('/Type')] = NameObject('/Outlines')
+            else:
+                entry[NameObject('/Title')] = TextStringObject(node['title'])
+                entry[NameObject('/Parent')] = IndirectObject(parent, 0, self)
+                entry[NameObject('/Dest')] = ArrayObject([self._page_refs[node['page']], NameObject('/Fit')])
+            if prev:
+                entry[NameObject('/Prev')] = IndirectObject(prev, 0, self)
+            if following:
+                entry[NameObject('/Next')] = IndirectObject(following, 0, self)
+            if children:
+                entry[NameObject('/First')] = IndirectObject(children[0]['number'], 0, self)
+                entry[NameObject('/Last')] = IndirectObject(children[-1]['number'], 0, self)
+                entry[NameObject('/Count')] = NumberObject(count)
+
+            self._write_object(node['number'], entry)
+            return count
+
+        write(root, None, None, None)
+        return IndirectObject(root['number'], 0, self)
+
+    def _allocate(self) -> int:
+        number = self._next_number
+        self._next_number += 1
+        return number
+
+    def _write_object(self, number: int, obj) -> None:
+        self._offsets[number] = self._file.tell()
+        self._file.write(f"{number} 0 obj\n".encode())
+        obj.write_to_stream(self._file, None)
+        self._file.write(b"\nendobj\n")
+
+    @staticmethod
+    def _key(ref: IndirectObject) -> tuple:
+        """Map key for a reference; stamped pages mix source and overlay objects"""
+        return (id(ref.pdf), ref.idnum, ref.generation)
+
+    def _remap(self, obj, id_map: Dict[tuple, int], pending: List[tuple]):
+        """
+        Copy a direct object with indirect references renumbered
+
+        Newly seen references are queued in pending as (source ref, number).
+        """
+        if isinstance(obj, IndirectObject):
+            key = self._key(obj)
+            if key not in id_map:
+                target = obj.get_object()
+                if isinstance(target, DictionaryObject) and target.get('/Type') in TREE_TYPES:
+                    return NullObject()
+                id_map[key] = self._allocate()
+                pending.append((obj, id_map[key]))
+            return IndirectObject(id_map[key], 0, self)
+
+        if isinstance(obj, ContentStream):
+            # Built by merge_page: serialise its operations, compressed
+            copy = DecodedStreamObject()
+            copy.set_data(obj.get_data())
+            return copy.flate_encode()
+
+        if isinstance(obj, StreamObject):
+            copy = obj.__class__()
+            copy._data = obj._data
+            for key, value in dict.items(obj):
+                copy[NameObject(key)] = self._remap(value, id_map, pending)
+            return copy
+
+        if isinstance(obj, DictionaryObject):
+            copy = DictionaryObject()
+            for key, value in dict.items(obj):
+                copy[NameObject(key)] = self._remap(value, id_map, pending)
+            return copy
+
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._remap(item, id_map, pending) for item in obj)
+
+        return obj
+
+    def __enter__(self) -> 'StreamingPdfWriter':
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+def streaming_merge(
+    sources: List[PdfSource],
+    output_path: str,
+    outline: Optional[List[list]] = None,
+    stamps: Optional[List[PageStamp]] = None
+) -> Dict[str, Any]:
+    """
+    Merge PDFs with bounded memory
+
+    Args:
+        sources: Paths or binary file objects, in order
+        output_path: Where to write the merged PDF
+        outline: Optional bookmarks as [level, title, page] entries
+        stamps: Optional (header, footer, bates) per page of the merged
+            output (e.g. stamping.package_stamps), applied while copying
+
+    Returns:
+        Dictionary with output_path, pages, objects and bytes written
+    """
+    with StreamingPdfWriter(output_path) as writer:
+        for source in sources:
+            writer.append(source, stamps[writer.page_count:] if stamps else None)
+        return writer.close(outline)
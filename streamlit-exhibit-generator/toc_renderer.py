@@ -0,0 +1,225 @@
+"""
+TOC Renderer - Table of contents building blocks for large exhibit lists
+Shared styles and a table flowable that paginates in linear time
+
+ReportLab splits a long Table one page at a time, and every split lays out
+all remaining rows again, so a 2,000-row table costs quadratic time.
+PagedTable measures its rows once and hands the frame one page-sized Table
+at a time, with the header row repeated on every page.
+
+Paragraph and table styles are built once per process and shared by every
+TOC rendered.
+"""
+
+import functools
+from typing import Dict, List, Optional
+
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import Flowable, Table, TableStyle
+
+
+MEASURE_BLOCK_ROWS = 100
+
+PACKAGE_TOC_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+])
+
+CASE_INFO_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0f0f0')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 12),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+])
+
+EXHIBIT_LIST_STYLE = TableStyle([
+    # Header row
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f77b4')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+
+    # Data rows
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+    ('ALIGN', (1, 1), (1, -1), 'LEFT'),
+    ('ALIGN', (2, 1), (2, -1), 'CENTER'),
+
+    # Grid
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
+
+    # Padding
+    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+ARCHIVE_URL_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f77b4')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+
+
+@functools.lru_cache(maxsize=None)
+def toc_styles() -> Dict[str, ParagraphStyle]:
+    """Paragraph styles for both TOC layouts (built on first use)"""
+    styles = getSampleStyleSheet()
+
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#1f77b4'),
+            spaceAfter=30,
+            alignment=1  # Center
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=16,
+            textColor=colors.HexColor('#333333'),
+            spaceAfter=12,
+            spaceBefore=12
+        ),
+        'info': ParagraphStyle(
+            'Info',
+            parent=styles['Normal'],
+            fontSize=11,
+            spaceAfter=20
+        ),
+        'footer': ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.grey,
+            alignment=1  # Center
+        ),
+    }
+
+
+class PagedTable(Flowable):
+    """A table of any length, split into page-sized Tables with a repeated header"""
+
+    def __init__(
+        self,
+        header: List,
+        rows: List[List],
+        col_widths: List[float],
+        style: TableStyle,
+        row_heights: Optional[List[float]] = None,
+        header_height: Optional[float] = None,
+        stripe: int = 0
+    ):
+        """
+        Initialize table
+
+        Args:
+            header: Header row, repeated at the top of every page
+            rows: Data rows
+            col_widths: Fixed column widths (required for linear layout)
+            style: Table style with the header as row 0
+            row_heights: Measured row heights (internal, for continuations)
+            header_height: Measured header height (internal)
+            stripe: Row-background offset so stripes continue across pages
+        """
+        super().__init__()
+        self.header = header
+        self.rows = rows
+        self.col_widths = col_widths
+        self.style = style
+        self.row_heights = row_heights
+        self.header_height = header_height
+        self.stripe = stripe
+        self.width = sum(col_widths)
+
+    def _measure(self) -> None:
+        """Lay out every row once to learn its height"""
+        if self.row_heights is not None:
+            return
+
+        # Table height calculation is itself superlinear, so measure in blocks
+        self.row_heights = []
+        for start in range(0, max(len(self.rows), 1), MEASURE_BLOCK_ROWS):
+            table = self._table(self.rows[start:start + MEASURE_BLOCK_ROWS])
+            table.wrap(self.width, 0)
+            self.header_height = table._rowHeights[0]
+            self.row_heights.extend(table._rowHeights[1:])
+
+    def _table(self, rows: List[List]) -> Table:
+        table = Table([self.header] + rows, colWidths=self.col_widths, style=self.style)
+        if self.stripe % 2:
+            # Keep the alternating row colours in step with the previous page
+            for command in self.style.getCommands():
+                if command[0] == 'ROWBACKGROUNDS':
+                    table.setStyle(TableStyle([command[:3] + (list(reversed(command[3])),)]))
+        return table
+
+    def wrap(self, availWidth: float, availHeight: float):
+        self._measure()
+        self.height = self.header_height + sum(self.row_heights)
+        return self.width, self.height
+
+    def split(self, availWidth: float, availHeight: float) -> List[Flowable]:
+        self._measure()
+        used = self.header_height
+        count = 0
+        for height in self.row_heights:
+            if used + height > availHeight:
+                break
+            used += height
+            count += 1
+
+        if count == 0:
+            return []  # Not even one row fits: move to the next frame
+        if count == len(self.rows):
+            return [self]
+
+        return [
+            self._table(self.rows[:count]),
+            PagedTable(
+                self.header, self.rows[count:], self.col_widths, self.style,
+                row_heights=self.row_heights[count:],
+                header_height=self.header_height,
+                stripe=self.stripe + count
+            )
+        ]
+
+    def draw(self) -> None:
+        table = self._table(self.rows)
+        table.wrap(self.width, self.height)
+        table.drawOn(self.canv, 0, 0)
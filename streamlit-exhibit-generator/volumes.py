@@ -0,0 +1,121 @@
+"""
+Volumes - Split an exhibit package into size-capped files
+For e-filing systems that reject uploads above a per-file limit
+
+Exhibits are packed into volumes greedily, in package order, breaking only
+at exhibit boundaries. An exhibit that is larger than a whole volume is cut
+into page-range parts first, each of which then packs like an exhibit.
+
+Each volume is written separately with its own TOC slice (see
+PDFHandler.write_volumes), so its size is the TOC plus the exhibits it
+holds. A fixed allowance per volume covers the TOC and PDF overhead; the
+written sizes are checked afterwards and reported.
+"""
+
+import math
+import os
+from typing import Any, Dict, List
+
+from PyPDF2 import PdfReader, PdfWriter
+
+VOLUME_OVERHEAD_BYTES = 256 * 1024  # TOC slice, page tree and xref per volume
+PART_TITLE_LENGTH = 34  # Leaves room for " (part 2 of 3)" in the TOC column
+
+
+def _write_page_range(source_path: str, start: int, end: int, output_path: str) -> int:
+    """Copy pages start..end (1-based, inclusive) to a new PDF; returns its size"""
+    reader = PdfReader(source_path)
+    writer = PdfWriter()
+    for index in range(start - 1, end):
+        writer.add_page(reader.pages[index])
+    with open(output_path, 'wb') as f:
+        writer.write(f)
+    return os.path.getsize(output_path)
+
+
+def split_oversized_exhibits(
+    items: List[Dict[str, Any]],
+    budget: int,
+    work_dir: str
+) -> List[Dict[str, Any]]:
+    """
+    Cut exhibits larger than the budget into page-range parts
+
+    Parts hold equal page counts. If any part still exceeds the budget the
+    exhibit is cut into one more part, until every part fits or holds a
+    single page.
+
+    Args:
+        items: Exhibit dicts with number, title, path, pages and bytes
+        budget: Largest size an exhibit (or part) may have
+        work_dir: Where part files are written
+
+    Returns:
+        Items in the same order; a cut exhibit is replaced by its parts,
+        which carry part, parts and source_pages ([first, last], 1-based)
+    """
+    result = []
+
+    for item in items:
+        if item['bytes'] <= budget or item['pages'] < 2:
+            result.append(item)
+            continue
+
+        stem = os.path.splitext(os.path.basename(item['path']))[0]
+        parts = min(math.ceil(item['bytes'] / budget), item['pages'])
+
+        while True:
+            per_part = math.ceil(item['pages'] / parts)
+            ranges = [
+                (start, min(start + per_part - 1, item['pages']))
+                for start in range(1, item['pages'] + 1, per_part)
+            ]
+            pieces = []
+            for k, (start, end) in enumerate(ranges):
+                part_path = os.path.join(work_dir, f"{stem}_part{k + 1}.pdf")
+                pieces.append({
+                    **item,
+                    'title': f"{item['title'][:PART_TITLE_LENGTH]} (part {k + 1} of {len(ranges)})",
+                    'path': part_path,
+                    'pages': end - start + 1,
+                    'bytes': _write_page_range(item['path'], start, end, part_path),
+                    'part': k + 1,
+                    'parts': len(ranges),
+                    'source_pages': [start, end]
+                })
+
+            if per_part == 1 or all(piece['bytes'] <= budget for piece in pieces):
+                break
+            parts += 1
+
+        print(f"✓ Split Exhibit {item['number']} ({item['bytes'] / (1024 * 1024):.1f} MB) "
+              f"into {len(pieces)} parts")
+        result.extend(pieces)
+
+    return result
+
+
+def plan_volumes(items: List[Dict[str, Any]], max_bytes: int) -> List[List[Dict[str, Any]]]:
+    """
+    Pack exhibits into volumes in order, starting a new volume when full
+
+    Args:
+        items: Exhibit dicts with bytes (after split_oversized_exhibits)
+        max_bytes: Byte cap per volume
+
+    Returns:
+        One list of items per volume
+    """
+    budget = max_bytes - VOLUME_OVERHEAD_BYTES
+    volumes: List[List[Dict[str, Any]]] = []
+    used = 0
+
+    for item in items:
+        if not volumes or used + item['bytes'] > budget:
+            if not volumes or volumes[-1]:
+                volumes.append([])
+            used = 0
+        volumes[-1].append(item)
+        used += item['bytes']
+
+    return volumes